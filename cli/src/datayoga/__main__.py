@@ -12,7 +12,7 @@ from typing import Optional
 import click
 import datayoga_core as dy
 import jsonschema
-from datayoga_core import prometheus, utils
+from datayoga_core import prometheus, tracing, utils
 from datayoga_core.connection import Connection
 
 from datayoga import cli_helpers
@@ -98,11 +98,21 @@ def validate(
 @click.argument("job_name")
 @click.option('--dir', 'directory', help="DataYoga directory", default=".", show_default=True)
 @click.option('--exporter-port', help="Enables Prometheus exporter on specified port", type=int)
+@click.option('--profile', help="Profiles the job and writes a flamegraph-compatible report at shutdown", is_flag=True)
+@click.option('--profile-output', help="File of the profile report, in collapsed stacks format",
+              default="profile.folded", show_default=True)
+@click.option('--otlp-endpoint', help="Enables tracing, exporting the spans to this OTLP/HTTP traces endpoint")
+@click.option('--trace-sample-ratio', help="Ratio of the batches traced", type=click.FloatRange(0, 1), default=1.0,
+              show_default=True)
 @cli_helpers.add_options(LOG_LEVEL_OPTION)
 def run(
     job_name: str,
     directory: str,
     exporter_port: Optional[int],
+    profile: bool,
+    profile_output: str,
+    otlp_endpoint: Optional[str],
+    trace_sample_ratio: float,
     loglevel: str
 ):
     set_logging_level(loglevel)
@@ -124,6 +134,7 @@ def run(
 
     # validate the job
     job_file = path.join(directory, "jobs", job_name.replace(".", os.sep) + ".dy.yaml")
+    job = None
     try:
         job_settings = utils.read_yaml(job_file)
         logger.debug(f"job_settings: {job_settings}")
@@ -140,15 +151,27 @@ def run(
             prometheus.start(exporter_port)
             logger.info(f"Prometheus exporter started on port {exporter_port}")
 
+        if otlp_endpoint:
+            tracing.configure(otlp_endpoint, trace_sample_ratio, service_name=f"datayoga.{Path(job_file).stem}")
+
         producer = job.producer
         logger.info(f"Producing from {producer.__module__}")
         job.init(context)
+        if profile:
+            job.start_profiler(profile_output)
+
         asyncio.run(job.run())
     except jsonschema.exceptions.ValidationError as schema_error:
         # print a validation message with the source lines
         cli_helpers.pprint_yaml_validation_error(job_file, schema_error, logger)
     except Exception as e:
         cli_helpers.handle_critical(logger, "Error while running a job", e)
+    finally:
+        # write the profile and export the remaining spans of a failed or interrupted job too
+        if job is not None:
+            job.stop_profiler()
+
+        tracing.shutdown()
 
 
 @cli.command(name="test", help="Unit test one or more job using data test definitions")
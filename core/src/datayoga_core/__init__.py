@@ -3,10 +3,14 @@ from typing import Any, Dict, List, Optional
 
 from datayoga_core.context import Context
 from datayoga_core.job import Job
+from datayoga_core.job_cache import JobCache
 from datayoga_core.result import JobResult
 
 logger = logging.getLogger("dy")
 
+# compiled jobs used by transform
+_job_cache = JobCache()
+
 
 def compile(job_settings: Dict[str, Any], whitelisted_blocks: Optional[List[str]] = None) -> Job:
     """Compiles a job in YAML.
@@ -50,6 +54,10 @@ def transform(
 ) -> JobResult:
     """Transforms data against a certain job.
 
+    The job is compiled and initialized on first use and cached by its settings, so later calls with the same
+    settings reuse it along with its connections. Concurrent calls use separate instances of the job.
+    Use `close` to release the cached jobs.
+
     Args:
         job_settings (Dict[str, Any]): Job settings.
         data (List[Dict[str, Any]]): Data to transform.
@@ -59,7 +67,11 @@ def transform(
     Returns:
         JobResult: Job result.
     """
-    job = compile(job_settings, whitelisted_blocks)
-    job.init(context)
-    logger.debug("Transforming data")
-    return job.transform(data)
+    with _job_cache.acquire(job_settings, context, whitelisted_blocks) as job:
+        logger.debug("Transforming data")
+        return job.transform(data)
+
+
+def close():
+    """Closes the jobs cached by `transform` and their connections."""
+    _job_cache.close()
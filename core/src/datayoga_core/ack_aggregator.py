@@ -0,0 +1,47 @@
+import asyncio
+import logging
+from typing import Callable, List, Optional
+
+logger = logging.getLogger("dy")
+
+
+class AckAggregator:
+    """Coalesces the acknowledgements of the pipeline into fewer, larger acknowledgements of the producer.
+
+    The steps acknowledge every processed, filtered and rejected sub-batch. The message IDs are collected
+    and passed on once `max_size` of them are pending, or `flush_ms` after the first of them arrived.
+
+    Attributes:
+        ack (Callable[[List[str]], None]): Acknowledges message IDs, e.g. `Producer.ack`.
+        max_size (int): Number of pending message IDs that triggers an acknowledgement.
+        flush_ms (int): Maximum time in milliseconds that a message ID waits for its acknowledgement.
+    """
+
+    def __init__(self, ack: Callable[[List[str]], None], max_size: int = 1000, flush_ms: int = 1000):
+        self.ack = ack
+        self.max_size = max_size
+        self.flush_ms = flush_ms
+        self.msg_ids: List[str] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def add(self, msg_ids: List[str]):
+        self.msg_ids.extend(msg_ids)
+        if len(self.msg_ids) >= self.max_size:
+            self.flush()
+        elif self.timer is None and self.msg_ids:
+            try:
+                self.timer = asyncio.get_running_loop().call_later(self.flush_ms / 1000, self.flush)
+            except RuntimeError:
+                # no event loop to wait on
+                self.flush()
+
+    def flush(self):
+        """Acknowledges the pending message IDs."""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        if self.msg_ids:
+            msg_ids, self.msg_ids = self.msg_ids, []
+            logger.debug(f"Acknowledging {len(msg_ids)} message(s)")
+            self.ack(msg_ids)
@@ -5,13 +5,14 @@ import logging
 import os
 import sys
 from abc import ABCMeta, abstractmethod
+from functools import lru_cache
 from os import path
 from typing import Any, Dict, List, Optional
 
 from datayoga_core import utils
 from datayoga_core.context import Context
 from datayoga_core.result import BlockResult
-from jsonschema import validate
+from jsonschema.protocols import Validator
 
 logger = logging.getLogger("dy")
 
@@ -21,6 +22,8 @@ class Block(metaclass=ABCMeta):
     MSG_ID_FIELD = f"{INTERNAL_FIELD_PREFIX}msg_id"
     RESULT_FIELD = f"{INTERNAL_FIELD_PREFIX}result"
     OPCODE_FIELD = f"{INTERNAL_FIELD_PREFIX}opcode"
+    # whether the block modifies the records it receives. Job.transform copies the records before such blocks only
+    MUTATES_INPUT = True
     """Block.
 
     Attributes:
@@ -39,7 +42,7 @@ class Block(metaclass=ABCMeta):
     def validate(self):
         """Validates block against its JSON Schema"""
         logger.debug(f"validating {self.properties}")
-        validate(instance=self.properties, schema=self.get_json_schema())
+        utils.validate(self.properties, get_schema_validator(self.get_json_schema_file()))
 
     def get_json_schema(self) -> Dict[str, Any]:
         """Returns the JSON Schema for this block.
@@ -47,7 +50,15 @@ class Block(metaclass=ABCMeta):
         Returns:
             Dict[str, Any]: JSON Schema.
         """
-        json_schema_file = path.join(
+        return utils.read_json_schema(self.get_json_schema_file())
+
+    def get_json_schema_file(self) -> str:
+        """Returns the path of the JSON Schema file of this block.
+
+        Returns:
+            str: JSON Schema filename.
+        """
+        return path.join(
             utils.get_bundled_dir(),
             os.path.relpath(
                 os.path.dirname(sys.modules[self.__module__].__file__),
@@ -55,8 +66,6 @@ class Block(metaclass=ABCMeta):
             "block.schema.json") if utils.is_bundled() else path.join(
             os.path.dirname(os.path.realpath(sys.modules[self.__module__].__file__)),
             "block.schema.json")
-        logger.debug(f"loading schema from {json_schema_file}")
-        return utils.read_json(json_schema_file)
 
     @abstractmethod
     def init(self, context: Optional[Context] = None):
@@ -91,3 +100,10 @@ class Block(metaclass=ABCMeta):
         module = importlib.import_module(module_name)
         block: Block = getattr(module, "Block")(properties)
         return block
+
+
+@lru_cache(maxsize=None)
+def get_schema_validator(json_schema_file: str) -> Validator:
+    """Returns the validator of a block JSON Schema file, shared by all of the instances of the block."""
+    logger.debug(f"loading schema from {json_schema_file}")
+    return utils.get_validator(utils.read_json_schema(json_schema_file))
@@ -5,7 +5,7 @@ from typing import Any, Dict, List, Optional
 from datayoga_core import expression, utils
 from datayoga_core.block import Block as DyBlock
 from datayoga_core.context import Context
-from datayoga_core.result import BlockResult, Result, Status
+from datayoga_core.result import BlockResult, Result, Status, SuccessResults
 
 logger = logging.getLogger("dy")
 
@@ -18,29 +18,31 @@ class Block(DyBlock, metaclass=ABCMeta):
 
         self.fields = {}
         for prop in self.properties["fields"]:
-            self.fields[prop["field"]] = expression.compile(prop["language"], prop["expression"])
+            self.fields[prop["field"]] = (
+                utils.FieldPath(prop["field"]), expression.compile(prop["language"], prop["expression"]))
 
     async def run(self, data: List[Dict[str, Any]]) -> BlockResult:
         logger.debug(f"Running {self.get_block_name()}")
         result = BlockResult()
 
-        for field, expr in self.fields.items():
+        for field, (field_path, expr) in self.fields.items():
             try:
                 # Try batch processing first
                 expression_results = expr.search_bulk(data)
 
                 # If successful, set fields for all records
                 for i, row in enumerate(data):
-                    utils.set_field(row, field, expression_results[i])
+                    field_path.set(row, expression_results[i])
             except Exception as e:
                 logger.debug(
                     f"Batch processing failed for field {field} with {e}, falling back to individual processing")
 
                 # Process each record individually
+                processed: List[Dict[str, Any]] = []
                 for row in data:
                     try:
                         single_result = expr.search(row)
-                        utils.set_field(row, field, single_result)
+                        field_path.set(row, single_result)
 
                     except Exception as record_error:
                         # Add to rejected list with error message
@@ -48,8 +50,9 @@ class Block(DyBlock, metaclass=ABCMeta):
                         continue
 
                     # Add to processed list if successful
-                    result.processed.append(Result(status=Status.SUCCESS, payload=row))
+                    processed.append(row)
 
+                result.processed = SuccessResults.from_payloads(processed)
                 return result
 
         # If we get here, batch processing was successful for all fields
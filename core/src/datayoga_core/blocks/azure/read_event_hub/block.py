@@ -1,12 +1,15 @@
 import asyncio
 import logging
-from typing import AsyncGenerator, List, Optional
+from collections import defaultdict
+from typing import AsyncGenerator, Dict, List, Optional
 
 import orjson
 from azure.eventhub import EventData, PartitionContext
 from azure.eventhub.aio import EventHubConsumerClient
 from azure.eventhub.extensions.checkpointstoreblobaio import \
     BlobCheckpointStore
+from datayoga_core import prometheus
+from datayoga_core.checkpoint import OffsetTracker
 from datayoga_core.context import Context
 from datayoga_core.producer import Message
 from datayoga_core.producer import Producer as DyProducer
@@ -14,6 +17,50 @@ from datayoga_core.producer import Producer as DyProducer
 logger = logging.getLogger("dy")
 
 
+class Partition:
+    """In-flight events of a partition.
+
+    Attributes:
+        context (PartitionContext): The partition context, used to update its checkpoint.
+        offsets (OffsetTracker): Unacknowledged events, the last event acknowledged together with all of the
+            events before it is the next checkpoint.
+        max_in_flight (int): Maximum number of unacknowledged events before receiving more events of the partition.
+    """
+
+    def __init__(self, context: PartitionContext, max_in_flight: int):
+        self.context = context
+        self.offsets = OffsetTracker()
+        self.max_in_flight = max_in_flight
+        self.has_room = asyncio.Event()
+        self.has_room.set()
+        self.checkpoint_lock = asyncio.Lock()
+        self.checkpoint: Optional[EventData] = None
+
+    async def wait_for_room(self, events_count: int):
+        """Waits until the unacknowledged events leave room for more events, applying backpressure to the partition."""
+        while self.offsets.pending and len(self.offsets.pending) + events_count > self.max_in_flight:
+            self.has_room.clear()
+            await self.has_room.wait()
+
+    def ack(self, msg_ids: List[str]) -> bool:
+        moved = self.offsets.ack(msg_ids)
+        if len(self.offsets.pending) < self.max_in_flight:
+            self.has_room.set()
+
+        return moved
+
+    async def update_checkpoint(self):
+        # checkpoints are updated one at a time, an update that waited writes the latest checkpoint
+        async with self.checkpoint_lock:
+            event = self.offsets.offset
+            if event is None or event is self.checkpoint:
+                return
+
+            logger.debug(f"Checkpointing partition {self.context.partition_id} at {event.sequence_number}")
+            await self.context.update_checkpoint(event)
+            self.checkpoint = event
+
+
 class Block(DyProducer):
     """Azure Event Hub block for reading events."""
 
@@ -26,6 +73,7 @@ class Block(DyProducer):
         logger.debug(f"Initializing {self.get_block_name()}")
 
         self.batch_size = self.properties.get("batch_size", 300)
+        self.max_in_flight = self.properties.get("max_in_flight", self.batch_size * 10)
 
         self.consumer_client = EventHubConsumerClient.from_connection_string(
             conn_str=self.properties["event_hub_connection_string"],
@@ -36,8 +84,9 @@ class Block(DyProducer):
                 self.properties["checkpoint_store_container_name"])
         )
 
-        self.events = {}  # Retrieved events by sequence number, used for acknowledging them once processed
-        self.messages = asyncio.Queue()
+        self.partitions: Dict[str, Partition] = {}
+        # batches of messages, each of them from a single partition
+        self.batches = asyncio.Queue()
 
     async def produce(self) -> AsyncGenerator[List[Message], None]:
         """Starts the event receiving process and yield batches of messages.
@@ -51,15 +100,7 @@ class Block(DyProducer):
         asyncio.create_task(self.receive_batch())
 
         while True:
-            if not self.messages.empty():
-                batch = []
-                while not self.messages.empty():
-                    message = await self.messages.get()
-                    batch.append(message)
-
-                yield batch
-
-            await asyncio.sleep(0.1)
+            yield await self.batches.get()
 
     async def receive_batch(self):
         """Receives events in batches from the Event Hub."""
@@ -67,41 +108,84 @@ class Block(DyProducer):
             on_event_batch=self.on_event_batch,
             max_batch_size=self.batch_size,
             starting_position="-1",  # read from the beginning of the partition.
+            # the last enqueued sequence number of each partition, for the lag metric
+            track_last_enqueued_event_properties=True
         )
 
     async def on_event_batch(self, partition_context: PartitionContext, events: List[EventData]):
         """Processes each batch of events received from the Event Hub.
 
+        The events of a partition are received one batch at a time, so waiting here for room in the in-flight
+        window holds off the next batch of the partition.
+
         Args:
             partition_context (PartitionContext): The partition context.
             events (List[EventData]): The list of events in the batch.
         """
-        logger.debug(f"Received batch of events from partition: {partition_context.partition_id}")
-
+        partition_id = partition_context.partition_id
+        logger.debug(f"Received batch of {len(events)} events from partition: {partition_id}")
+        partition = self.partitions.get(partition_id)
+        if partition is None:
+            partition = self.partitions[partition_id] = Partition(partition_context, self.max_in_flight)
+
+        partition.context = partition_context
+        await partition.wait_for_room(len(events))
+
+        batch = []
+        # events that can't be parsed are acknowledged right away, so that the checkpoint moves past them
+        skipped_msg_ids = []
         for event in events:
+            # sequence numbers are unique within a partition
+            msg_id = f"{partition_id}:{event.sequence_number}"
             try:
-                payload = orjson.loads(event.body_as_str(encoding="UTF-8"))
-                msg_id = event.system_properties[b"x-opt-sequence-number"]
-                self.events[msg_id] = (event, partition_context)
+                payload = orjson.loads(get_body(event))
                 payload[self.MSG_ID_FIELD] = msg_id
-                await self.messages.put(payload)
+                batch.append(payload)
             except Exception as e:
-                logger.error(e)
+                logger.error(f"Skipping event {msg_id}: {e}")
+                skipped_msg_ids.append(msg_id)
+
+            partition.offsets.produced(msg_id, event)
+
+        self.update_lag(partition, events)
+        if batch:
+            await self.batches.put(batch)
+
+        if skipped_msg_ids:
+            await self.complete_events(skipped_msg_ids)
+
+    def update_lag(self, partition: Partition, events: List[EventData]):
+        """Updates the number of events of the partition that haven't been acknowledged yet.
+
+        These are the events enqueued after the received batch and the received events still in flight.
+        """
+        last_enqueued_event = partition.context.last_enqueued_event_properties
+        if events and last_enqueued_event and last_enqueued_event.get("sequence_number") is not None:
+            lag = last_enqueued_event["sequence_number"] - events[-1].sequence_number + len(partition.offsets.pending)
+            prometheus.producer_lag.labels(
+                producer=self.get_block_name(), partition=partition.context.partition_id).set(lag)
 
     async def complete_events(self, msg_ids: List[str]):
-        """Completes the events and update the checkpoint.
+        """Completes the events and updates the checkpoint of each partition once.
+
+        The checkpoint of a partition is its last event that has been processed together with all of the
+        events before it.
 
         Args:
             msg_ids (List[str]): The list of message IDs to complete.
         """
+        partition_msg_ids = defaultdict(list)
         for msg_id in msg_ids:
-            logger.debug(f"Acking {msg_id} event")
-            event, partition_context = self.events.pop(msg_id, (None, None))
+            partition_msg_ids[msg_id.partition(":")[0]].append(msg_id)
+
+        for partition_id, msg_ids in partition_msg_ids.items():
+            partition = self.partitions.get(partition_id)
+            if partition is None:
+                logger.warning(f"Couldn't find partition {partition_id} for acknowledging")
+                continue
 
-            if event is not None:
-                await partition_context.update_checkpoint(event)
-            else:
-                logger.warning(f"Couldn't find event {msg_id} for acknowledging")
+            if partition.ack(msg_ids):
+                await partition.update_checkpoint()
 
     def ack(self, msg_ids: List[str]):
         """Acknowledges the completion of events.
@@ -110,3 +194,9 @@ class Block(DyProducer):
             msg_ids (List[str]): The list of message IDs to acknowledge.
         """
         asyncio.create_task(self.complete_events(msg_ids))
+
+
+def get_body(event: EventData) -> bytes:
+    """Returns the raw body of an event, which orjson parses without decoding it to a string first."""
+    body = event.body
+    return body if isinstance(body, bytes) else b"".join(body)
@@ -4,17 +4,18 @@ from typing import Any, Dict, List, Optional
 
 import cassandra.auth
 from cassandra.cluster import NoHostAvailable, PreparedStatement
-from datayoga_core import write_utils
+from datayoga_core import tracing, write_utils
 from datayoga_core.block import Block as DyBlock
 from datayoga_core.connection import Connection
 from datayoga_core.context import Context
 from datayoga_core.opcode import OpCode
-from datayoga_core.result import BlockResult, Result, Status
+from datayoga_core.result import BlockResult, Result, Status, SuccessResults
 
 logger = logging.getLogger("dy")
 
 
 class Block(DyBlock, metaclass=ABCMeta):
+    MUTATES_INPUT = False
 
     def init(self, context: Optional[Context] = None):
         logger.debug(f"Initializing {self.get_block_name()}")
@@ -42,6 +43,8 @@ class Block(DyBlock, metaclass=ABCMeta):
         self.table = self.properties.get("table")
         self.keys = self.properties.get("keys")
         self.mapping = self.properties.get("mapping")
+        self.upsert_mapper = write_utils.RecordMapper(self.keys, self.mapping)
+        self.delete_mapper = write_utils.RecordMapper(self.keys)
 
         business_key_columns = [column["column"] for column in write_utils.get_column_mapping(self.keys)]
         mapping_columns = [column["column"] for column in write_utils.get_column_mapping(self.mapping)]
@@ -65,14 +68,16 @@ class Block(DyBlock, metaclass=ABCMeta):
             ])
 
         try:
-            self.execute_upsert(opcode_groups[OpCode.CREATE] + opcode_groups[OpCode.UPDATE])
-            self.execute_delete(opcode_groups[OpCode.DELETE])
+            with tracing.start_span("cassandra.write", kind=tracing.SpanKind.CLIENT, attributes={
+                    "db.system": "cassandra", "db.cassandra.table": self.table, "datayoga.records": len(data)}):
+                self.execute_upsert(opcode_groups[OpCode.CREATE] + opcode_groups[OpCode.UPDATE])
+                self.execute_delete(opcode_groups[OpCode.DELETE])
         except NoHostAvailable as e:
             raise ConnectionError(e)
 
         return BlockResult(
-            processed=[Result(Status.SUCCESS, payload=record)
-                       for opcode in OpCode for record in opcode_groups[opcode.value]],
+            processed=SuccessResults.from_payloads(
+                record for opcode in OpCode for record in opcode_groups[opcode.value]),
             rejected=rejected_records)
 
     def get_future(self, stmt: PreparedStatement, record: Dict[str, Any]) -> Any:
@@ -85,8 +90,7 @@ class Block(DyBlock, metaclass=ABCMeta):
             logger.debug(f"Upserting {len(records)} record(s) to {self.table} table")
             stmt = self.session.prepare(self.upsert_stmt)
             futures = []
-            for record in records:
-                record_to_upsert = write_utils.map_record(record, self.keys, self.mapping)
+            for record_to_upsert in self.upsert_mapper.map_records(records):
                 futures.append(self.get_future(stmt, record_to_upsert))
 
             for future in futures:
@@ -97,8 +101,7 @@ class Block(DyBlock, metaclass=ABCMeta):
             logger.debug(f"Deleting {len(records)} record(s) from {self.table} table")
             stmt = self.session.prepare(self.delete_stmt)
             futures = []
-            for record in records:
-                record_to_delete = write_utils.map_record(record, self.keys)
+            for record_to_delete in self.delete_mapper.map_records(records):
                 futures.append(self.get_future(stmt, record_to_delete))
 
             for future in futures:
@@ -1,17 +1,29 @@
+import asyncio
+import csv
+import gzip
+import io
 import logging
 import os
 from abc import ABCMeta
-from contextlib import suppress
-from csv import DictReader
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from itertools import count, islice
-from typing import AsyncGenerator, List, Optional
+from typing import (Any, AsyncGenerator, Callable, Dict, Iterable, Iterator,
+                    List, Optional, TextIO, Tuple)
 
 from datayoga_core.context import Context
+from datayoga_core.file_utils import FileManifest, FileProgress, list_files
 from datayoga_core.producer import Message
 from datayoga_core.producer import Producer as DyProducer
 
 logger = logging.getLogger("dy")
 
+# size of the reads when scanning the file for range boundaries
+SCAN_BUFFER_SIZE = 1024 * 1024
+
+TRUE_VALUES = {"true", "t", "yes", "y", "1"}
+FALSE_VALUES = {"false", "f", "no", "n", "0"}
+
 
 class Block(DyProducer, metaclass=ABCMeta):
 
@@ -32,26 +44,332 @@ class Block(DyProducer, metaclass=ABCMeta):
         self.skip = self.properties.get("skip", 0)
         self.delimiter = self.properties.get("delimiter", ",")
         self.quotechar = self.properties.get("quotechar", "\"")
+        self.types = self.properties.get("types", {})
+        self.compression = self.properties.get("compression", "infer")
+        self.workers = self.properties.get("workers", 1)
+        self.chunk_size = self.properties.get("chunk_size", 16 * 1024 * 1024)
+
+        manifest_file = self.properties.get("manifest")
+        if manifest_file is not None and not os.path.isabs(manifest_file) and context is not None:
+            manifest_file = os.path.join(context.properties.get("data_path"), manifest_file)
+
+        self.manifest = FileManifest(manifest_file) if manifest_file is not None else None
+        self.progress: Optional[FileProgress] = None
 
     async def produce(self) -> AsyncGenerator[List[Message], None]:
-        logger.debug("Reading CSV")
+        # the file can be a directory or a glob. files that are in the manifest and haven't changed are skipped
+        files = [file for file in list_files(self.file)
+                 if self.manifest is None or not self.manifest.is_processed(file)]
+        logger.debug(f"Reading {len(files)} file(s)")
+        if not files:
+            return
 
-        with open(self.file, "r", encoding=self.encoding) as read_obj:
-            reader = DictReader(read_obj, fieldnames=self.fields, delimiter=self.delimiter, quotechar=self.quotechar)
-            counter = iter(count())
+        self.progress = FileProgress(files, self.manifest, self.checkpoint)
+        files = self.progress.files
+        if self.workers > 1:
+            async for records in self.produce_parallel(files):
+                yield records
 
-            for _ in range(self.skip):
-                with suppress(StopIteration):
-                    next(reader)
+            return
 
+        for file in files:
+            async for records in self.produce_file(file):
+                yield records
+
+    async def produce_file(self, file: str) -> AsyncGenerator[List[Message], None]:
+        """Reads a file sequentially and produces its records in batches, reading each batch in a thread."""
+        logger.debug(f"Reading CSV {file}")
+        loop = asyncio.get_running_loop()
+        batches = read_file(file, self.encoding, get_compression(file, self.compression), self.fields, self.types,
+                            self.delimiter, self.quotechar, self.get_skip(file), self.batch_size,
+                            self.progress.get_msg_id_prefix(file))
+        try:
             while True:
-                sliced = islice(reader, self.batch_size)
-                records = [{self.MSG_ID_FIELD: f"{next(counter)}", **record} for record in sliced]
+                batch = await loop.run_in_executor(None, next, batches, None)
+                if batch is None:
+                    break
 
-                if not records:
-                    logger.debug(f"Done reading {self.file}")
-                    return
+                records, skipped = batch
+                self.progress.produced(file, [record[self.MSG_ID_FIELD] for record in records], skipped)
+                if records:
+                    logger.debug(f"Producing {len(records)} records")
+                    yield records
+        finally:
+            batches.close()
 
-                logger.debug(f"Producing {len(records)} records")
+        self.progress.done_reading(file)
 
-                yield records
+    async def produce_parallel(self, files: List[str]) -> AsyncGenerator[List[Message], None]:
+        """Splits the files into byte ranges at row boundaries and parses the ranges in worker processes.
+
+        The records are produced in the order of the files. Their msg_id is made of the offset of the range
+        and the position of the record in the range, so it's stable between runs with the same chunk size.
+        Compressed files can't be split and are read sequentially, as are files that start with rows to skip,
+        since the number of rows in each range isn't known before it's parsed.
+        """
+        logger.debug(f"Reading CSV with {self.workers} workers")
+
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            # keep the workers busy while the records of the earlier ranges are produced
+            pending = deque()
+            async for file, is_last, *args in self.get_tasks(files):
+                if not args:
+                    # read the file sequentially once the parts before it are produced
+                    while pending:
+                        async for records in self.produce_part(*pending.popleft()):
+                            yield records
+
+                    async for records in self.produce_file(file):
+                        yield records
+
+                    continue
+
+                pending.append((file, is_last, loop.run_in_executor(pool, read_range, file, *args)))
+                if len(pending) < self.workers * 2:
+                    continue
+
+                async for records in self.produce_part(*pending.popleft()):
+                    yield records
+
+            while pending:
+                async for records in self.produce_part(*pending.popleft()):
+                    yield records
+
+    async def produce_part(self, file: str, is_last: bool,
+                           future: asyncio.Future) -> AsyncGenerator[List[Message], None]:
+        """Produces the records of a part of a file once a worker has read them, in batches."""
+        records, skipped = await future
+        for i in range(0, len(records), self.batch_size):
+            batch = records[i:i + self.batch_size]
+            logger.debug(f"Producing {len(batch)} records")
+            self.progress.produced(file, [record[self.MSG_ID_FIELD] for record in batch])
+            yield batch
+
+        if skipped:
+            self.progress.produced(file, [], skipped)
+
+        if is_last:
+            self.progress.done_reading(file)
+
+    async def get_tasks(self, files: List[str]) -> AsyncGenerator[Tuple, None]:
+        """Yields the file, whether it's the last part of the file, and the arguments to read the range of a part.
+
+        Files that are read sequentially are yielded without arguments.
+        """
+        loop = asyncio.get_running_loop()
+        for file in files:
+            if get_compression(file, self.compression) is not None or self.get_skip(file) > 0:
+                yield file, True
+                continue
+
+            # scanning the file for row boundaries reads all of it, so it runs in a thread rather than the event loop
+            quotechar = self.quotechar.encode(self.encoding)
+            fields, data_start = self.fields, 0
+            if fields is None:
+                fields, data_start = await loop.run_in_executor(None, read_header, file, self.encoding,
+                                                                self.delimiter, quotechar)
+
+            ranges = await loop.run_in_executor(None, split_ranges, file, data_start, self.chunk_size, quotechar)
+            logger.debug(f"Split {file} into {len(ranges)} ranges")
+            if not ranges:
+                self.progress.done_reading(file)
+
+            msg_id_prefix = self.progress.get_msg_id_prefix(file)
+            for i, (start, end) in enumerate(ranges):
+                yield file, i == len(ranges) - 1, start, end, self.encoding, fields, self.types, self.delimiter, \
+                    self.quotechar, msg_id_prefix
+
+    def get_skip(self, file: str) -> int:
+        """Returns the number of rows to skip at the start of a file, including the records of an earlier run."""
+        return self.skip + self.progress.resume_records.get(file, 0)
+
+    def ack(self, msg_ids: List[str]):
+        if self.progress is not None:
+            self.progress.ack(msg_ids)
+
+
+def read_file(file: str, encoding: str, compression: Optional[str], fields: Optional[List[str]],
+              types: Dict[str, str], delimiter: str, quotechar: str, skip: int, batch_size: int,
+              msg_id_prefix: str = "") -> Iterator[Tuple[List[Dict[str, Any]], int]]:
+    """Reads a CSV file sequentially in batches of records, along with the number of rows skipped in each batch."""
+    with open_csv(file, encoding, compression) as read_obj:
+        # parse into lists and build each record in one go, rather than through DictReader
+        rows = filter(None, csv.reader(read_obj, delimiter=delimiter, quotechar=quotechar))
+        fields = fields if fields is not None else next(rows, [])
+        converters = get_converters(fields, types)
+        rows = islice(rows, skip, None)
+        msg_ids = (f"{msg_id_prefix}{i}" for i in count())
+
+        while True:
+            records, skipped = get_records(islice(rows, batch_size), msg_ids, fields, converters)
+            if not records and not skipped:
+                return
+
+            yield records, skipped
+
+
+def read_header(file: str, encoding: str, delimiter: str, quotechar: bytes) -> Tuple[List[str], int]:
+    """Reads the header row of a CSV file.
+
+    Returns:
+        Tuple[List[str], int]: The field names and the offset of the first data row.
+    """
+    with open(file, "rb") as read_obj:
+        header = b""
+        # a quoted field name may contain a newline, so read until the quotes are balanced
+        for line in read_obj:
+            header += line
+            if header.count(quotechar) % 2 == 0:
+                break
+
+    fields = next(csv.reader(io.StringIO(header.decode(encoding)), delimiter=delimiter,
+                             quotechar=quotechar.decode(encoding)), [])
+    return fields, len(header)
+
+
+def split_ranges(file: str, start: int, chunk_size: int, quotechar: bytes) -> List[Tuple[int, int]]:
+    """Splits a file into byte ranges of about chunk_size bytes that end at a row boundary.
+
+    A newline is a row boundary only outside of a quoted field, that is when an even number of quote
+    characters precedes it (escaped quotes are doubled, so they keep the count even).
+
+    Returns:
+        List[Tuple[int, int]]: Start and end offsets of the ranges.
+    """
+    size = os.path.getsize(file)
+    ranges = []
+    range_start = start
+    target = start + chunk_size
+    # whether the current position is inside a quoted field
+    in_quotes = False
+    with open(file, "rb") as read_obj:
+        read_obj.seek(start)
+        position = start
+        while position < size and target < size:
+            buffer = read_obj.read(SCAN_BUFFER_SIZE)
+            if not buffer:
+                break
+
+            search_from = 0
+            while target < position + len(buffer):
+                newline = buffer.find(b"\n", max(target - position, search_from))
+                if newline == -1:
+                    break
+
+                if in_quotes ^ (buffer.count(quotechar, 0, newline) % 2 == 1):
+                    # the newline is part of a quoted field, look for the next one
+                    search_from = newline + 1
+                    continue
+
+                range_end = position + newline + 1
+                ranges.append((range_start, range_end))
+                range_start = range_end
+                target = range_end + chunk_size
+                search_from = newline + 1
+
+            in_quotes ^= buffer.count(quotechar) % 2 == 1
+            position += len(buffer)
+
+    if range_start < size:
+        ranges.append((range_start, size))
+
+    return ranges
+
+
+def read_range(file: str, start: int, end: int, encoding: str, fields: List[str], types: Dict[str, str],
+               delimiter: str, quotechar: str, msg_id_prefix: str = "") -> Tuple[List[Dict[str, Any]], int]:
+    """Parses the rows of a byte range of a CSV file, runs in a worker process."""
+    with open(file, "rb") as read_obj:
+        read_obj.seek(start)
+        data = read_obj.read(end - start).decode(encoding)
+
+    rows = filter(None, csv.reader(io.StringIO(data, newline=""), delimiter=delimiter, quotechar=quotechar))
+    return get_records(rows, (f"{msg_id_prefix}{start}:{i}" for i in count()), fields, get_converters(fields, types))
+
+
+def get_compression(file: str, compression: str) -> Optional[str]:
+    """Returns the compression of the file, inferring it from the file extension when set to `infer`."""
+    if compression == "infer":
+        extension = os.path.splitext(file)[1].lower()
+        return {".gz": "gzip", ".zst": "zstd", ".zstd": "zstd"}.get(extension)
+
+    return None if compression == "none" else compression
+
+
+def open_csv(file: str, encoding: str, compression: Optional[str]) -> TextIO:
+    """Opens a CSV file for reading, decompressing it while streaming."""
+    if compression == "gzip":
+        return gzip.open(file, "rt", encoding=encoding, newline="")
+
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("the zstandard package is required to read zstd compressed files, install the zstd extra")
+
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(file, "rb")), encoding=encoding,
+                                newline="")
+
+    return open(file, "r", encoding=encoding, newline="")
+
+
+def to_boolean(value: str) -> bool:
+    value = value.strip().lower()
+    if value in TRUE_VALUES:
+        return True
+
+    if value in FALSE_VALUES:
+        return False
+
+    raise ValueError(f"invalid boolean value '{value}'")
+
+
+TYPE_CONVERTERS: Dict[str, Callable[[str], Any]] = {
+    "integer": int,
+    "number": float,
+    "boolean": to_boolean
+}
+
+
+def get_converters(fields: List[str], types: Dict[str, str]) -> List[Tuple[int, str, Callable[[str], Any]]]:
+    """Returns the position, name and converter of each field with a declared type other than string."""
+    return [(i, field, TYPE_CONVERTERS[types[field]]) for i, field in enumerate(fields)
+            if types.get(field, "string") != "string"]
+
+
+def get_records(rows: Iterable[List[str]], msg_ids: Iterator[str], fields: List[str],
+                converters: List[Tuple[int, str, Callable[[str], Any]]]) -> Tuple[List[Dict[str, Any]], int]:
+    """Builds records out of parsed rows, like DictReader does, converting the fields with declared types.
+
+    Empty values of typed fields become None. Missing values are None and extra values are
+    collected in a list under the None key. Rows with a value that can't be converted are logged and skipped.
+
+    Returns:
+        Tuple[List[Dict[str, Any]], int]: The records and the number of skipped rows.
+    """
+    keys = (DyProducer.MSG_ID_FIELD, *fields)
+    fields_count = len(fields)
+    records = []
+    skipped = 0
+    # take the row first, so that no msg_id is consumed once the rows run out
+    for row, msg_id in zip(rows, msg_ids):
+        try:
+            for i, field, converter in converters:
+                if i < len(row):
+                    value = row[i]
+                    row[i] = converter(value) if value != "" else None
+        except ValueError as e:
+            logger.error(f"Skipping record {msg_id}, cannot convert field '{field}': {e}")
+            skipped += 1
+            continue
+
+        record = dict(zip(keys, (msg_id, *row)))
+        if len(row) < fields_count:
+            record.update(dict.fromkeys(fields[len(row):]))
+        elif len(row) > fields_count:
+            record[None] = row[fields_count:]
+
+        records.append(record)
+
+    return records, skipped
@@ -0,0 +1,235 @@
+import csv
+import gzip
+import shutil
+import threading
+from unittest import mock
+
+import pytest
+from datayoga_core.block import Block as DyBlock
+from datayoga_core.blocks.files.read_csv import block
+from datayoga_core.blocks.files.read_csv.block import Block, split_ranges
+from datayoga_core.checkpoint import (Checkpoint, CheckpointStoreType,
+                                      create_store)
+
+ROWS = [{"id": f"{i}", "name": f"name {i}", "notes": f"line 1\nline 2, \"quoted\" {i}" if i % 3 == 0 else ""}
+        for i in range(200)]
+
+
+@pytest.fixture
+def csv_file(tmp_path):
+    file = tmp_path / "data.csv"
+    with open(file, "w", encoding="utf-8", newline="") as write_obj:
+        writer = csv.DictWriter(write_obj, fieldnames=["id", "name", "notes"])
+        writer.writeheader()
+        writer.writerows(ROWS)
+
+    return f"{file}"
+
+
+async def read_all(properties):
+    block = Block(properties)
+    block.init()
+    return [record async for records in block.produce() for record in records]
+
+
+def without_msg_id(records):
+    return [{key: value for key, value in record.items() if key != DyBlock.MSG_ID_FIELD} for record in records]
+
+
+def test_split_ranges_at_row_boundaries(csv_file):
+    ranges = split_ranges(csv_file, 0, 100, b"\"")
+    assert len(ranges) > 10
+    assert ranges[0][0] == 0
+    assert all(end == next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+
+    # every range parses into whole rows
+    with open(csv_file, "rb") as read_obj:
+        data = read_obj.read()
+
+    rows = []
+    for start, end in ranges:
+        rows.extend(csv.reader(data[start:end].decode().splitlines(keepends=True)))
+
+    assert rows[1:] == [list(row.values()) for row in ROWS]
+
+
+@pytest.mark.asyncio
+async def test_read_csv_parallel(csv_file):
+    sequential = await read_all({"file": csv_file})
+    parallel = await read_all({"file": csv_file, "workers": 2, "chunk_size": 500, "batch_size": 7})
+
+    assert without_msg_id(parallel) == without_msg_id(sequential) == ROWS
+    msg_ids = [record[DyBlock.MSG_ID_FIELD] for record in parallel]
+    assert len(set(msg_ids)) == len(ROWS)
+
+    # msg_ids are stable between runs
+    parallel = await read_all({"file": csv_file, "workers": 3, "chunk_size": 500})
+    assert [record[DyBlock.MSG_ID_FIELD] for record in parallel] == msg_ids
+
+
+@pytest.mark.asyncio
+async def test_read_csv_parallel_scans_in_thread(csv_file, monkeypatch):
+    threads = []
+
+    def split_ranges_in_thread(*args):
+        threads.append(threading.current_thread())
+        return split_ranges(*args)
+
+    monkeypatch.setattr(block, "split_ranges", split_ranges_in_thread)
+    records = await read_all({"file": csv_file, "workers": 2, "chunk_size": 500})
+
+    assert without_msg_id(records) == ROWS
+    # the scan doesn't block the event loop
+    assert threads and threading.main_thread() not in threads
+
+
+@pytest.mark.asyncio
+async def test_read_csv_parallel_skip(csv_file):
+    records = await read_all({"file": csv_file, "workers": 2, "chunk_size": 500, "skip": 5})
+    assert without_msg_id(records) == ROWS[5:]
+
+
+@pytest.mark.asyncio
+async def test_read_csv_parallel_skip_spans_ranges(csv_file):
+    # the rows to skip span several ranges of 100 bytes
+    records = await read_all({"file": csv_file, "workers": 2, "chunk_size": 100, "skip": 30})
+    assert without_msg_id(records) == ROWS[30:]
+
+
+@pytest.mark.asyncio
+async def test_read_csv_types(tmp_path):
+    file = tmp_path / "types.csv"
+    file.write_text("id,price,active,name\n1,1.5,true,a\n2,,no,\n")
+    records = await read_all({"file": f"{file}", "types": {"id": "integer", "price": "number", "active": "boolean"}})
+    assert without_msg_id(records) == [
+        {"id": 1, "price": 1.5, "active": True, "name": "a"},
+        {"id": 2, "price": None, "active": False, "name": ""}
+    ]
+    assert [record[DyBlock.MSG_ID_FIELD] for record in records] == ["0", "1"]
+
+
+@pytest.mark.asyncio
+async def test_read_csv_invalid_type(tmp_path):
+    file = tmp_path / "types.csv"
+    file.write_text("id\n1\nx\n3\n")
+    # the record is skipped rather than failing the job
+    with mock.patch.object(block.logger, "error") as log_error:
+        records = await read_all({"file": f"{file}", "types": {"id": "integer"}})
+
+    assert without_msg_id(records) == [{"id": 1}, {"id": 3}]
+    assert "Skipping record 1, cannot convert field 'id'" in log_error.call_args[0][0]
+
+    records = await read_all({"file": f"{file}", "types": {"id": "integer"}, "workers": 2})
+    assert without_msg_id(records) == [{"id": 1}, {"id": 3}]
+
+
+@pytest.mark.asyncio
+async def test_read_csv_invalid_type_checkpoint(tmp_path):
+    file = tmp_path / "types.csv"
+    file.write_text("id\n1\nx\n3\n4\n")
+    store = create_store(CheckpointStoreType.FILE, f"{tmp_path / 'checkpoints.json'}")
+    properties = {"file": f"{file}", "types": {"id": "integer"}, "batch_size": 1}
+
+    block = Block(properties)
+    block.checkpoint = Checkpoint(store, "csv")
+    block.init()
+    records = [record async for records in block.produce() for record in records]
+    block.ack([record[DyBlock.MSG_ID_FIELD] for record in records if record["id"] != 4])
+    # the skipped row counts towards the checkpoint
+    assert block.checkpoint.load() == {"file": f"{file}", "records": 3}
+
+    block = Block(properties)
+    block.checkpoint = Checkpoint(store, "csv")
+    block.init()
+    assert without_msg_id([record async for records in block.produce() for record in records]) == [{"id": 4}]
+
+
+@pytest.mark.asyncio
+async def test_read_csv_irregular_rows(tmp_path):
+    file = tmp_path / "irregular.csv"
+    file.write_text("a,b\n1\n\n1,2,3\n")
+    # same as DictReader, missing values are None, extra values are under the None key and blank lines are skipped
+    assert without_msg_id(await read_all({"file": f"{file}"})) == [
+        {"a": "1", "b": None},
+        {"a": "1", "b": "2", None: ["3"]}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_read_csv_gzip(csv_file):
+    with open(csv_file, "rb") as read_obj, gzip.open(f"{csv_file}.gz", "wb") as write_obj:
+        shutil.copyfileobj(read_obj, write_obj)
+
+    # compressed files are read sequentially even with workers
+    assert without_msg_id(await read_all({"file": f"{csv_file}.gz", "workers": 2})) == ROWS
+
+
+@pytest.mark.asyncio
+async def test_read_csv_zstd(csv_file):
+    zstandard = pytest.importorskip("zstandard")
+    with open(csv_file, "rb") as read_obj, open(f"{csv_file}.zst", "wb") as write_obj:
+        zstandard.ZstdCompressor().copy_stream(read_obj, write_obj)
+
+    assert without_msg_id(await read_all({"file": f"{csv_file}.zst"})) == ROWS
+
+
+@pytest.fixture
+def csv_dir(tmp_path):
+    landing = tmp_path / "landing"
+    landing.mkdir()
+    for i in range(3):
+        (landing / f"{i}.csv").write_text(f"id\n{i}1\n{i}2\n")
+
+    return landing
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("workers", [1, 2])
+async def test_read_csv_directory(csv_dir, workers):
+    records = await read_all({"file": f"{csv_dir}", "workers": workers})
+    assert without_msg_id(records) == [{"id": f"{i}{j}"} for i in range(3) for j in (1, 2)]
+    assert len({record[DyBlock.MSG_ID_FIELD] for record in records}) == 6
+
+    records = await read_all({"file": f"{csv_dir}/[12].csv", "workers": workers})
+    assert without_msg_id(records) == [{"id": f"{i}{j}"} for i in (1, 2) for j in (1, 2)]
+
+
+@pytest.mark.asyncio
+async def test_read_csv_manifest(csv_dir, tmp_path):
+    properties = {"file": f"{csv_dir}", "manifest": f"{tmp_path / 'manifest.json'}"}
+
+    block = Block(properties)
+    block.init()
+    records = [record async for records in block.produce() for record in records]
+    # only the acknowledged files are added to the manifest
+    block.ack([record[DyBlock.MSG_ID_FIELD] for record in records if record["id"] != "22"])
+
+    # a changed file is read again
+    (csv_dir / "0.csv").write_text("id\n01\n02\n03\n")
+    assert without_msg_id(await read_all(properties)) == [{"id": f"0{j}"} for j in (1, 2, 3)] + [
+        {"id": "21"}, {"id": "22"}]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("workers", [1, 2])
+async def test_read_csv_checkpoint(csv_dir, tmp_path, workers):
+    store = create_store(CheckpointStoreType.FILE, f"{tmp_path / 'checkpoints.json'}")
+    properties = {"file": f"{csv_dir}", "workers": workers}
+
+    block = Block(properties)
+    block.checkpoint = Checkpoint(store, "csv")
+    block.init()
+    records = [record async for records in block.produce() for record in records]
+    # the first file and the first record of the second file are processed, the crash loses the rest
+    block.ack([record[DyBlock.MSG_ID_FIELD] for record in records if record["id"] in ("01", "02", "11", "22")])
+    assert block.checkpoint.load() == {"file": f"{csv_dir / '1.csv'}", "records": 1}
+
+    block = Block(properties)
+    block.checkpoint = Checkpoint(store, "csv")
+    block.init()
+    records = [record async for records in block.produce() for record in records]
+    assert without_msg_id(records) == [{"id": "12"}, {"id": "21"}, {"id": "22"}]
+
+    # the checkpoint is cleared once all of the files are done
+    block.ack([record[DyBlock.MSG_ID_FIELD] for record in records])
+    assert block.checkpoint.load() is None
@@ -0,0 +1,40 @@
+import asyncio
+import logging
+import os
+from abc import ABCMeta
+from typing import Any, Dict, List, Optional
+
+import orjson
+from datayoga_core import utils
+from datayoga_core.block import Block as DyBlock
+from datayoga_core.context import Context
+from datayoga_core.result import BlockResult
+
+logger = logging.getLogger("dy")
+
+
+class Block(DyBlock, metaclass=ABCMeta):
+    MUTATES_INPUT = False
+
+    def init(self, context: Optional[Context] = None):
+        logger.debug(f"Initializing {self.get_block_name()}")
+        file = self.properties["file"]
+
+        if os.path.isabs(file) or context is None:
+            self.file = file
+        else:
+            self.file = os.path.join(context.properties.get("data_path"), file)
+
+        logger.debug(f"file: {self.file}")
+
+    async def run(self, data: List[Dict[str, Any]]) -> BlockResult:
+        logger.debug(f"Running {self.get_block_name()}")
+        lines = b"".join(orjson.dumps(utils.remove_msg_id(record), default=str) + b"\n" for record in data)
+        # write the whole batch at once, in a thread so that the event loop isn't blocked on the disk
+        await asyncio.get_running_loop().run_in_executor(None, self.write, lines)
+
+        return utils.all_success(data)
+
+    def write(self, lines: bytes):
+        with open(self.file, "ab") as write_obj:
+            write_obj.write(lines)
@@ -5,12 +5,13 @@ from typing import Any, Dict, List, Optional
 from datayoga_core import expression
 from datayoga_core.block import Block as DyBlock
 from datayoga_core.context import Context
-from datayoga_core.result import BlockResult, Result, Status
+from datayoga_core.result import BlockResult, Result, Status, SuccessResults
 
 logger = logging.getLogger("dy")
 
 
 class Block(DyBlock, metaclass=ABCMeta):
+    MUTATES_INPUT = False
 
     def init(self, context: Optional[Context] = None):
         logger.debug(f"Initializing {self.get_block_name()}")
@@ -18,6 +19,7 @@ class Block(DyBlock, metaclass=ABCMeta):
 
     async def run(self, data: List[Dict[str, Any]]) -> BlockResult:
         result = BlockResult()
+        processed: List[Dict[str, Any]] = []
         logger.debug(f"Running {self.get_block_name()}")
         return_data = self.expression.filter(data, tombstone=True)
         # mark filtered rows
@@ -25,6 +27,7 @@ class Block(DyBlock, metaclass=ABCMeta):
             if row is None:
                 result.filtered.append(Result(Status.FILTERED, payload=data[i]))
             else:
-                result.processed.append(Result(Status.SUCCESS, payload=row))
+                processed.append(row)
 
+        result.processed = SuccessResults.from_payloads(processed)
         return result
@@ -2,12 +2,12 @@ import logging
 from typing import Any, Dict, List, Optional
 
 import aiohttp
-from datayoga_core import expression, utils
+from datayoga_core import expression, tracing, utils
 from datayoga_core.block import Block as DyBlock
 from datayoga_core.connection import Connection
 from datayoga_core.context import Context
 from datayoga_core.expression import Expression
-from datayoga_core.result import BlockResult, Result, Status
+from datayoga_core.result import BlockResult, Result, Status, SuccessResults
 
 logger = logging.getLogger("dy")
 
@@ -61,6 +61,7 @@ class Block(DyBlock):
         logger.debug(f"Running {self.get_block_name()}")
 
         block_result = BlockResult()
+        processed: List[Dict[str, Any]] = []
 
         def process_dict(input_dict, output_dict):
             for key, value in input_dict.items():
@@ -90,10 +91,15 @@ class Block(DyBlock):
                     logger.debug(
                         f"Sending HTTP {self.method} request to: {url}\nheaders:{headers}\n\tquery_params: {query_params}\n\tpayload: {payload}")
 
-                    async with session.request(self.method, url, params=query_params, headers=headers, data=payload, timeout=self.timeout) as response:
-                        response_status = response.status
-                        response_headers = dict(response.headers)
-                        response_text = await response.text()
+                    with tracing.start_span("http.write", kind=tracing.SpanKind.CLIENT, attributes={
+                            "http.method": self.method, "http.url": url}) as span:
+                        async with session.request(self.method, url, params=query_params, headers=headers, data=payload, timeout=self.timeout) as response:
+                            response_status = response.status
+                            response_headers = dict(response.headers)
+                            response_text = await response.text()
+
+                        if span is not None:
+                            span.set_attribute("http.status_code", response_status)
 
                     logger.debug(f"HTTP response code: {response_status}")
                     logger.debug(f"Response Headers: {response_headers}")
@@ -109,7 +115,7 @@ class Block(DyBlock):
                         utils.set_field(row, self.response_content_field, response_text)
 
                     if response.ok:
-                        block_result.processed.append(Result(Status.SUCCESS, payload=row))
+                        processed.append(row)
                     else:
                         error_message = response_text if response_text else "Unknown error"
                         block_result.rejected.append(
@@ -120,4 +126,5 @@ class Block(DyBlock):
                     block_result.rejected.append(
                         Result(status=Status.REJECTED, payload=row, message=f"Error making HTTP request: {f'{e}'}"))
 
+        block_result.processed = SuccessResults.from_payloads(processed)
         return block_result
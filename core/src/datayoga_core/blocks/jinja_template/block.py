@@ -6,32 +6,35 @@ import jinja2
 from datayoga_core import utils
 from datayoga_core.block import Block as DyBlock
 from datayoga_core.context import Context
-from datayoga_core.result import BlockResult, Result, Status
+from datayoga_core.result import BlockResult, Result, Status, SuccessResults
 
 logger = logging.getLogger("dy")
 
 
 class Block(DyBlock, metaclass=ABCMeta):
     field: str
+    field_path: utils.FieldPath
     template: jinja2.Template
 
     def init(self, context: Optional[Context] = None):
         logger.debug(f"Initializing {self.get_block_name()}")
 
         self.field = self.properties["field"]
+        self.field_path = utils.FieldPath(self.field)
         self.template = jinja2.Template(self.properties["template"])
 
     async def run(self, data: List[Dict[str, Any]]) -> BlockResult:
         logger.debug(f"Running {self.get_block_name()}")
 
-        block_result = BlockResult()
+        processed: List[Dict[str, Any]] = []
+        rejected: List[Result] = []
 
         for row in data:
             try:
                 # assign the new values
-                utils.set_field(row, self.field, self.template.render(**row))
-                block_result.processed.append(Result(Status.SUCCESS, payload=row))
+                self.field_path.set(row, self.template.render(**row))
+                processed.append(row)
             except Exception as e:
-                block_result.rejected.append(Result(status=Status.REJECTED, payload=row, message=f"{e}"))
+                rejected.append(Result(status=Status.REJECTED, payload=row, message=f"{e}"))
 
-        return block_result
+        return BlockResult(processed=SuccessResults.from_payloads(processed), rejected=rejected)
@@ -6,12 +6,14 @@ from datayoga_core import expression, utils
 from datayoga_core.block import Block as DyBlock
 from datayoga_core.context import Context
 from datayoga_core.expression import Expression
-from datayoga_core.result import BlockResult, Result, Status
+from datayoga_core.result import BlockResult
 
 logger = logging.getLogger("dy")
 
 
 class Block(DyBlock, metaclass=ABCMeta):
+    MUTATES_INPUT = False
+
     expression: Expression
 
     def init(self, context: Optional[Context] = None):
@@ -34,4 +36,4 @@ class Block(DyBlock, metaclass=ABCMeta):
             if original_opcode is not None:
                 mapped_row[Block.OPCODE_FIELD] = original_opcode
 
-        return BlockResult(processed=[Result(Status.SUCCESS, payload=row) for row in mapped_rows])
+        return utils.all_success(mapped_rows)
@@ -1,9 +1,14 @@
+import asyncio
 import logging
 import os
 from abc import ABCMeta
-from typing import AsyncGenerator, List, Optional
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, AsyncGenerator, Dict, Iterator, List, Optional, Tuple
 
 from datayoga_core.context import Context
+from datayoga_core.file_utils import FileManifest, FileProgress, list_files
 from datayoga_core.producer import Message
 from datayoga_core.producer import Producer as DyProducer
 from fastparquet import ParquetFile
@@ -24,13 +29,123 @@ class Block(DyProducer, metaclass=ABCMeta):
 
         logger.debug(f"file: {self.file}")
 
+        self.workers = self.properties.get("workers", 1)
+        manifest_file = self.properties.get("manifest")
+        if manifest_file is not None and not os.path.isabs(manifest_file) and context is not None:
+            manifest_file = os.path.join(context.properties.get("data_path"), manifest_file)
+
+        self.manifest = FileManifest(manifest_file) if manifest_file is not None else None
+        self.progress: Optional[FileProgress] = None
+
     async def produce(self) -> AsyncGenerator[List[Message], None]:
         logger.debug("Reading parquet")
 
-        pf = ParquetFile(self.file)
+        # the file can be a directory or a glob. files that are in the manifest and haven't changed are skipped
+        files = [file for file in list_files(self.file)
+                 if self.manifest is None or not self.manifest.is_processed(file)]
+        if not files:
+            return
+
+        self.progress = FileProgress(files, self.manifest, self.checkpoint)
+        files = self.progress.files
+        if self.workers > 1:
+            async for records in self.produce_parallel(files):
+                yield records
+
+            return
+
+        for file in files:
+            for record in read_records(file, self.progress.get_msg_id_prefix(file),
+                                       self.progress.resume_records.get(file, 0)):
+                self.progress.produced(file, [record[self.MSG_ID_FIELD]])
+                yield [record]
+
+            self.progress.done_reading(file)
+
+    async def produce_parallel(self, files: List[str]) -> AsyncGenerator[List[Message], None]:
+        """Reads the row groups of the files in worker processes and produces them in order.
+
+        Up to twice as many row groups as workers are read ahead, so the memory held depends on the size
+        of the row groups rather than the size of the files.
+        """
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pending = deque()
+            async for file, is_last, *args in self.get_tasks(files):
+                pending.append((file, is_last, loop.run_in_executor(pool, read_row_group, file, *args)))
+                if len(pending) < self.workers * 2:
+                    continue
+
+                async for records in self.produce_part(*pending.popleft()):
+                    yield records
+
+            while pending:
+                async for records in self.produce_part(*pending.popleft()):
+                    yield records
+
+    async def produce_part(self, file: str, is_last: bool,
+                           future: asyncio.Future) -> AsyncGenerator[List[Message], None]:
+        """Produces the records of a row group once a worker has read them."""
+        for record in await future:
+            self.progress.produced(file, [record[self.MSG_ID_FIELD]])
+            yield [record]
+
+        if is_last:
+            self.progress.done_reading(file)
+
+    async def get_tasks(self, files: List[str]) -> AsyncGenerator[Tuple, None]:
+        """Yields the file, whether it's the last row group of the file, and the arguments to read a row group."""
+        loop = asyncio.get_running_loop()
+        for file in files:
+            msg_id_prefix = self.progress.get_msg_id_prefix(file)
+            skip = self.progress.resume_records.get(file, 0)
+            # reading the metadata parses the footer of the file, so it runs in a thread rather than the event loop
+            row_group_sizes = await loop.run_in_executor(None, get_row_group_sizes, file)
+
+            # the index, first record and records to skip of each row group, without the row groups that are skipped
+            row_groups = []
+            start = 0
+            for index, size in enumerate(row_group_sizes):
+                if start + size > skip:
+                    row_groups.append((index, start, max(skip - start, 0)))
+
+                start += size
+
+            if not row_groups:
+                self.progress.done_reading(file)
+
+            for i, (index, start, row_group_skip) in enumerate(row_groups):
+                yield file, i == len(row_groups) - 1, index, start, msg_id_prefix, row_group_skip
+
+    def ack(self, msg_ids: List[str]):
+        if self.progress is not None:
+            self.progress.ack(msg_ids)
+
+
+def read_records(file: str, msg_id_prefix: str = "", skip: int = 0) -> Iterator[Dict[str, Any]]:
+    """Reads the records of a parquet file, skipping the first `skip` records."""
+    pf = ParquetFile(file)
+
+    start = 0
+    for index, row_group in enumerate(pf.row_groups):
+        # row groups before `skip` are skipped whole, by their metadata, without loading them
+        if start + row_group.num_rows > skip:
+            yield from get_records(pf[index].to_pandas(), start, msg_id_prefix, max(skip - start, 0))
+
+        start += row_group.num_rows
+
+
+def get_row_group_sizes(file: str) -> List[int]:
+    """Returns the number of records in each row group of a parquet file."""
+    return [row_group.num_rows for row_group in ParquetFile(file).row_groups]
+
+
+def read_row_group(file: str, index: int, start: int, msg_id_prefix: str = "", skip: int = 0) -> List[Dict[str, Any]]:
+    """Reads the records of a row group of a parquet file, runs in a worker process."""
+    return list(get_records(ParquetFile(file)[index].to_pandas(), start, msg_id_prefix, skip))
+
 
-        count = 0
-        for df in pf.iter_row_groups():
-            for _, data in df.iterrows():
-                yield [{self.MSG_ID_FIELD: str(count), **data.to_dict()}]
-                count += 1
+def get_records(df: Any, start: int, msg_id_prefix: str = "", skip: int = 0) -> Iterator[Dict[str, Any]]:
+    """Builds the records of the rows of a row group, whose first record is record number `start` of the file."""
+    for i, (_, data) in enumerate(islice(df.iterrows(), skip, None), start + skip):
+        yield {DyProducer.MSG_ID_FIELD: f"{msg_id_prefix}{i}", **data.to_dict()}
@@ -0,0 +1,79 @@
+from unittest import mock
+
+import fastparquet
+import pandas
+import pytest
+from datayoga_core.block import Block as DyBlock
+from datayoga_core.blocks.parquet.read.block import Block
+from datayoga_core.checkpoint import (Checkpoint, CheckpointStoreType,
+                                      create_store)
+
+ROWS = [{"id": i, "name": f"name {i}"} for i in range(10)]
+
+
+@pytest.fixture
+def parquet_dir(tmp_path):
+    landing = tmp_path / "landing"
+    landing.mkdir()
+    # row groups of 4, 4 and 2 records
+    fastparquet.write(f"{landing / '0.parquet'}", pandas.DataFrame(ROWS), row_group_offsets=4)
+    fastparquet.write(f"{landing / '1.parquet'}", pandas.DataFrame(ROWS[:3]), row_group_offsets=4)
+    return landing
+
+
+async def read_all(block):
+    return [record async for records in block.produce() for record in records]
+
+
+def without_msg_id(records):
+    return [{key: value for key, value in record.items() if key != DyBlock.MSG_ID_FIELD} for record in records]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("workers", [1, 2])
+async def test_read_parquet(parquet_dir, workers):
+    block = Block({"file": f"{parquet_dir}", "workers": workers})
+    block.init()
+    records = await read_all(block)
+
+    assert without_msg_id(records) == ROWS + ROWS[:3]
+    assert [record[DyBlock.MSG_ID_FIELD] for record in records] == [
+        f"{parquet_dir / '0.parquet'}#{i}" for i in range(10)] + [f"{parquet_dir / '1.parquet'}#{i}" for i in range(3)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("workers", [1, 2])
+async def test_read_parquet_checkpoint(parquet_dir, tmp_path, workers):
+    store = create_store(CheckpointStoreType.FILE, f"{tmp_path / 'checkpoints.json'}")
+    properties = {"file": f"{parquet_dir / '0.parquet'}", "workers": workers}
+
+    block = Block(properties)
+    block.checkpoint = Checkpoint(store, "parquet")
+    block.init()
+    records = await read_all(block)
+    # resuming in the middle of the second row group
+    block.ack([record[DyBlock.MSG_ID_FIELD] for record in records[:6]])
+
+    block = Block(properties)
+    block.checkpoint = Checkpoint(store, "parquet")
+    block.init()
+    records = await read_all(block)
+    assert without_msg_id(records) == ROWS[6:]
+    assert [record[DyBlock.MSG_ID_FIELD] for record in records] == [f"{i}" for i in range(6, 10)]
+
+
+@pytest.mark.asyncio
+async def test_read_parquet_skips_row_groups(parquet_dir, tmp_path):
+    store = create_store(CheckpointStoreType.FILE, f"{tmp_path / 'checkpoints.json'}")
+    store.save("parquet", {"file": f"{parquet_dir / '0.parquet'}", "records": 6})
+    block = Block({"file": f"{parquet_dir / '0.parquet'}"})
+    block.checkpoint = Checkpoint(store, "parquet")
+    block.init()
+
+    with mock.patch.object(fastparquet.ParquetFile, "__getitem__", autospec=True,
+                           side_effect=fastparquet.ParquetFile.__getitem__) as get_row_group:
+        records = await read_all(block)
+
+    assert without_msg_id(records) == ROWS[6:]
+    # the first row group is before the checkpoint and isn't loaded
+    assert [call.args[1] for call in get_row_group.call_args_list] == [1, 2]
@@ -4,11 +4,11 @@ from typing import Any, Dict, List, Optional
 
 import datayoga_core.blocks.redis.utils as redis_utils
 import redis
-from datayoga_core import expression, utils
+from datayoga_core import expression, tracing, utils
 from datayoga_core.block import Block as DyBlock
 from datayoga_core.connection import Connection
 from datayoga_core.context import Context
-from datayoga_core.result import BlockResult, Result, Status
+from datayoga_core.result import BlockResult, Result, Status, SuccessResults
 
 logger = logging.getLogger("dy")
 
@@ -38,6 +38,7 @@ class Block(DyBlock, metaclass=ABCMeta):
 
         pipeline = self.redis_client.pipeline(transaction=False)
         block_result = BlockResult()
+        processed: List[Dict[str, Any]] = []
 
         for record in data:
             params = [self.cmd]
@@ -47,7 +48,10 @@ class Block(DyBlock, metaclass=ABCMeta):
             pipeline.execute_command(*params)
 
         try:
-            results = pipeline.execute(raise_on_error=False)
+            with tracing.start_span("redis.lookup", kind=tracing.SpanKind.CLIENT, attributes={
+                    "db.system": "redis", "db.operation": self.cmd, "datayoga.records": len(data)}):
+                results = pipeline.execute(raise_on_error=False)
+
             for record, result in zip(data, results):
                 if isinstance(result, Exception):
                     block_result.rejected.append(Result(Status.REJECTED, message=f"{result}", payload=record))
@@ -59,8 +63,9 @@ class Block(DyBlock, metaclass=ABCMeta):
 
                 obj[self.field_path[-1]] = result
 
-                block_result.processed.append(Result(Status.SUCCESS, payload=record))
+                processed.append(record)
         except redis.exceptions.ConnectionError as expr:
             raise ConnectionError(expr)
 
+        block_result.processed = SuccessResults.from_payloads(processed)
         return block_result
@@ -1,8 +1,10 @@
 import logging
+import time
 from typing import AsyncGenerator, List, Optional
 
 import datayoga_core.blocks.redis.utils as redis_utils
 import orjson
+from datayoga_core import prometheus
 from datayoga_core.connection import Connection
 from datayoga_core.context import Context
 from datayoga_core.producer import Message
@@ -12,6 +14,9 @@ logger = logging.getLogger("dy")
 
 
 class Block(DyProducer):
+    # minimum time in seconds between updates of the lag metric
+    LAG_INTERVAL = 5
+
     def init(self, context: Optional[Context] = None):
         logger.debug(f"Initializing {self.get_block_name()}")
 
@@ -27,6 +32,9 @@ class Block(DyProducer):
             logger.info(f"Creating a new {self.consumer_group} consumer group associated with the {self.stream}")
             self.redis_client.xgroup_create(self.stream, self.consumer_group, 0)
 
+        self.lag_metric = prometheus.producer_lag.labels(producer=self.get_block_name(), partition=self.stream)
+        self.lag_updated_at: Optional[float] = None
+
     async def produce(self) -> AsyncGenerator[List[Message], None]:
         logger.debug(f"Running {self.get_block_name()}")
 
@@ -36,6 +44,7 @@ class Block(DyProducer):
             streams = self.redis_client.xreadgroup(self.consumer_group, self.requesting_consumer, {
                 self.stream: "0" if read_pending else ">"}, None, 100 if self.snapshot else 0)
 
+            self.update_lag()
             for stream in streams:
                 logger.debug(f"Messages in {self.stream} stream (pending: {read_pending}):\n\t{stream}")
                 for key, value in stream[1]:
@@ -49,7 +58,29 @@ class Block(DyProducer):
 
             read_pending = False
 
+    def update_lag(self):
+        """Updates the number of entries of the stream that the consumer group hasn't acknowledged yet.
+
+        These are the entries not delivered to the group yet (its lag, reported since Redis 7) and the delivered
+        entries still pending acknowledgement. Only updated while the metrics are exported.
+        """
+        if not prometheus.is_enabled():
+            return
+
+        now = time.monotonic()
+        if self.lag_updated_at is not None and now - self.lag_updated_at < self.LAG_INTERVAL:
+            return
+
+        self.lag_updated_at = now
+        group = next(filter(lambda x: x["name"] == self.consumer_group, self.redis_client.xinfo_groups(self.stream)),
+                     None)
+        if group is not None and group.get("lag") is not None:
+            self.lag_metric.set(group["lag"] + group["pending"])
+
     def ack(self, msg_ids: List[str]):
-        for msg_id in msg_ids:
-            logger.info(f"Acking {msg_id} message in {self.stream} stream of {self.consumer_group} consumer group")
-            self.redis_client.xack(self.stream, self.consumer_group, msg_id)
+        if not msg_ids:
+            return
+
+        # a single XACK for all of the message IDs
+        logger.info(f"Acking {len(msg_ids)} message(s) in {self.stream} stream of {self.consumer_group} consumer group")
+        self.redis_client.xack(self.stream, self.consumer_group, *msg_ids)
@@ -4,16 +4,17 @@ from typing import Any, Dict, List, Optional
 
 import datayoga_core.blocks.redis.utils as redis_utils
 import redis
-from datayoga_core import expression
+from datayoga_core import expression, tracing
 from datayoga_core.block import Block as DyBlock
 from datayoga_core.connection import Connection
 from datayoga_core.context import Context
-from datayoga_core.result import BlockResult, Result, Status
+from datayoga_core.result import BlockResult, Result, Status, SuccessResults
 
 logger = logging.getLogger("dy")
 
 
 class Block(DyBlock, metaclass=ABCMeta):
+    MUTATES_INPUT = False
 
     def init(self, context: Optional[Context] = None):
         logger.debug(f"Initializing {self.get_block_name()}")
@@ -31,6 +32,7 @@ class Block(DyBlock, metaclass=ABCMeta):
     async def run(self, data: List[Dict[str, Any]]) -> BlockResult:
         pipeline = self.redis_client.pipeline()
         block_result = BlockResult()
+        processed: List[Dict[str, Any]] = []
         for record in data:
             # transform to a list, filtering out None, which Redis does not support
             dict_as_list = sum(filter(
@@ -40,13 +42,17 @@ class Block(DyBlock, metaclass=ABCMeta):
             pipeline.execute_command(self.command, self.key_expression.search(record), *dict_as_list)
 
         try:
-            results = pipeline.execute(raise_on_error=False)
+            with tracing.start_span("redis.write", kind=tracing.SpanKind.CLIENT, attributes={
+                    "db.system": "redis", "db.operation": self.command, "datayoga.records": len(data)}):
+                results = pipeline.execute(raise_on_error=False)
+
             for record, result in zip(data, results):
                 if isinstance(result, Exception):
                     block_result.rejected.append(Result(Status.REJECTED, message=f"{result}", payload=record))
                 else:
-                    block_result.processed.append(Result(Status.SUCCESS, payload=record))
+                    processed.append(record)
         except redis.exceptions.ConnectionError as e:
             raise ConnectionError(e)
 
+        block_result.processed = SuccessResults.from_payloads(processed)
         return block_result
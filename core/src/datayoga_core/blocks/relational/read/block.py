@@ -1,5 +1,10 @@
+import asyncio
 import logging
-from typing import AsyncGenerator, List, Optional
+import os
+from collections import OrderedDict
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, AsyncGenerator, Dict, List, Optional
 
 import sqlalchemy as sa
 from datayoga_core import utils
@@ -10,6 +15,9 @@ from datayoga_core.producer import Producer as DyProducer
 
 logger = logging.getLogger("dy")
 
+# label of the watermark column in incremental reads, removed from the produced records
+WATERMARK_FIELD = "__$$watermark"
+
 
 class Block(DyProducer):
 
@@ -28,20 +36,296 @@ class Block(DyProducer):
         self.mapping = self.properties.get("mapping")
 
         self.tbl = sa.Table(self.table, sa.MetaData(schema=self.schema), autoload_with=self.engine)
+        self.columns = get_columns(self.tbl, self.properties.get("columns"))
+        self.where = self.properties.get("where")
+        self.batch_size = self.properties.get("batch_size", 1000)
+        self.partitioning = self.properties.get("partitioning")
+
+        self.watermark: Optional[Watermark] = None
+        self.interval = None
+        incremental = self.properties.get("incremental")
+        if incremental is not None:
+            state_file = incremental["state_file"]
+            if not os.path.isabs(state_file) and context is not None:
+                state_file = os.path.join(context.properties.get("data_path"), state_file)
+
+            if self.partitioning is not None:
+                raise ValueError("incremental reads can't be partitioned, the watermark requires reading in order")
+
+            self.watermark = Watermark(self.tbl.c[incremental["column"]], state_file)
+            self.interval = incremental.get("interval")
 
         logger.debug(f"Connecting to {self.db_type}")
         self.connection = self.engine.connect()
 
-    async def produce(self) -> AsyncGenerator[List[Message], None]:
-        result = self.connection.execution_options(stream_results=True).execute(self.tbl.select())
+    def get_query(self) -> sa.Select:
+        query = sa.select(*self.columns)
+        if self.where:
+            query = query.where(sa.text(self.where))
+
+        if self.watermark is not None:
+            query = query.add_columns(self.watermark.column.label(WATERMARK_FIELD)).order_by(self.watermark.column)
+            if self.watermark.read_value is not None:
+                query = query.where(self.watermark.column > self.watermark.read_value)
 
+        return query
+
+    async def produce(self) -> AsyncGenerator[List[Message], None]:
         while True:
-            chunk = result.fetchmany(10000)
-            if not chunk:
-                break
-            for row in chunk:
-                yield [utils.add_uid(dict(row._asdict()))]
+            logger.debug(f"Reading {self.tbl.fullname}")
+            if self.partitioning is not None:
+                async for records in self.produce_partitions():
+                    yield records
+            else:
+                result = self.connection.execution_options(stream_results=True).execute(self.get_query())
+                for rows in result.partitions(self.batch_size):
+                    yield self.get_records(rows)
+
+            # end the transaction, so that the next poll sees the new rows
+            self.connection.rollback()
+            if self.watermark is None:
+                return
+
+            self.watermark.done_reading()
+            if not self.interval:
+                return
+
+            await asyncio.sleep(self.interval)
+
+    async def produce_partitions(self) -> AsyncGenerator[List[Message], None]:
+        """Reads the partitions concurrently, each on its own connection, and produces their batches as they arrive.
+
+        Up to as many partitions are read at a time as the connection pool of the engine has connections to spare,
+        the other partitions wait for a partition to be done.
+        """
+        queries = self.get_partition_queries()
+        # the block's own connection is checked out for as long as it runs
+        capacity = get_pool_capacity(self.engine)
+        concurrency = len(queries) if capacity is None else max(min(len(queries), capacity - 1), 1)
+        logger.debug(f"Reading up to {concurrency} partitions at a time")
+        semaphore = asyncio.Semaphore(concurrency)
+        # a bounded queue, so that the partitions don't read ahead of the pipeline
+        queue = asyncio.Queue(maxsize=concurrency * 2)
+        tasks = [asyncio.create_task(self.read_partition(query, queue, semaphore)) for query in queries]
+        try:
+            remaining = len(tasks)
+            while remaining > 0:
+                rows = await queue.get()
+                if rows is None:
+                    remaining -= 1
+                elif isinstance(rows, Exception):
+                    raise rows
+                else:
+                    yield self.get_records(rows)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def read_partition(self, query: sa.Select, queue: asyncio.Queue, semaphore: asyncio.Semaphore):
+        # the blocking calls of the driver run in the default executor
+        loop = asyncio.get_running_loop()
+        try:
+            async with semaphore:
+                connection = await loop.run_in_executor(None, self.engine.connect)
+                try:
+                    result = await loop.run_in_executor(
+                        None, connection.execution_options(stream_results=True).execute, query)
+                    while True:
+                        rows = await loop.run_in_executor(None, result.fetchmany, self.batch_size)
+                        if not rows:
+                            break
+
+                        await queue.put(rows)
+                finally:
+                    await loop.run_in_executor(None, connection.close)
+
+            await queue.put(None)
+        except Exception as e:
+            await queue.put(e)
+
+    def get_partition_queries(self) -> List[sa.Select]:
+        column = self.tbl.c[self.partitioning["column"]]
+        count = self.partitioning["count"]
+        if self.partitioning.get("method", "range") == "modulo":
+            conditions = [column % count == i for i in range(count)]
+        else:
+            bounds_query = sa.select(sa.func.min(column), sa.func.max(column)).select_from(self.tbl)
+            if self.where:
+                bounds_query = bounds_query.where(sa.text(self.where))
+
+            min_value, max_value = self.connection.execute(bounds_query).one()
+            self.connection.rollback()
+            conditions = get_range_conditions(column, get_range_bounds(min_value, max_value, count))
+
+        # rows with a null partition column are read by the first partition
+        conditions[0] = sa.or_(conditions[0], column.is_(None))
+        logger.debug(f"Reading {self.tbl.fullname} in {len(conditions)} partitions")
+        query = self.get_query()
+        return [query.where(condition) for condition in conditions]
+
+    def get_records(self, rows: List[sa.Row]) -> List[Dict[str, Any]]:
+        records = [utils.add_uid(row._asdict()) for row in rows]
+        if self.watermark is not None:
+            for record in records:
+                self.watermark.produced(record[self.MSG_ID_FIELD], record.pop(WATERMARK_FIELD))
+
+        return records
+
+    def ack(self, msg_ids: List[str]):
+        if self.watermark is not None:
+            self.watermark.ack(msg_ids)
 
     def stop(self):
         self.connection.close()
         self.engine.dispose()
+
+
+def get_pool_capacity(engine: sa.engine.Engine) -> Optional[int]:
+    """Returns the maximal number of connections of the pool of the engine, None if it's unbounded."""
+    pool = engine.pool
+    if isinstance(pool, sa.pool.QueuePool) and pool._max_overflow >= 0:
+        return pool.size() + pool._max_overflow
+
+    return None
+
+
+def get_columns(tbl: sa.Table, columns: Optional[List[Any]]) -> List[sa.ColumnElement]:
+    """Returns the columns to select, all of the columns of the table by default.
+
+    Args:
+        tbl (sa.Table): Table to read.
+        columns (Optional[List[Any]]): Column names, or `{field: column}` to select a column as another field name.
+
+    Returns:
+        List[sa.ColumnElement]: Columns to select.
+    """
+    if not columns:
+        return list(tbl.columns)
+
+    return [tbl.c[next(iter(column.values()))].label(next(iter(column.keys()))) if isinstance(column, dict)
+            else tbl.c[column] for column in columns]
+
+
+def get_range_bounds(min_value: Any, max_value: Any, count: int) -> List[Any]:
+    """Splits the range of a column into up to `count` partitions of equal width.
+
+    Args:
+        min_value (Any): Minimal value of the column, a number, date or datetime.
+        max_value (Any): Maximal value of the column.
+        count (int): Number of partitions.
+
+    Returns:
+        List[Any]: Ascending bounds between the partitions.
+    """
+    if min_value is None or max_value is None:
+        return []
+
+    if isinstance(min_value, int) and isinstance(max_value, int):
+        step = -(-(max_value - min_value + 1) // count)
+    else:
+        try:
+            step = (max_value - min_value) / count
+        except TypeError as e:
+            raise ValueError(f"can't partition the range between {min_value!r} and {max_value!r}") from e
+
+    bounds = [min_value + step * i for i in range(1, count)]
+    return sorted({bound for bound in bounds if min_value < bound <= max_value})
+
+
+def get_range_conditions(column: sa.Column, bounds: List[Any]) -> List[sa.ColumnElement]:
+    """Returns the conditions of the partitions between the bounds, which together cover all of the values."""
+    if not bounds:
+        return [sa.true()]
+
+    return ([column < bounds[0]] +
+            [sa.and_(column >= lower, column < upper) for lower, upper in zip(bounds, bounds[1:])] +
+            [column >= bounds[-1]])
+
+
+class Watermark:
+    """High-water mark of an incremental read.
+
+    Rows are read in the order of the watermark column, from after the last watermark. The watermark is saved
+    once all of the records up to it have been acknowledged, so that a restart reads the unacknowledged records
+    again.
+
+    Attributes:
+        column (sa.Column): Watermark column, e.g. an `updated_at` timestamp or an increasing id.
+        state_file (str): Path of the JSON file the watermark is saved to.
+        value (Any): Saved watermark, None before the first save.
+        read_value (Any): Highest watermark that has been read.
+    """
+
+    def __init__(self, column: sa.Column, state_file: str):
+        self.column = column
+        self.state_file = state_file
+        self.value = None
+        if os.path.exists(state_file):
+            self.value = parse_watermark(utils.read_json(state_file).get("watermark"), column)
+
+        logger.debug(f"Watermark of {column}: {self.value}")
+        self.read_value = self.value
+        # count of unacknowledged records by watermark, in ascending order
+        self.pending: OrderedDict[Any, int] = OrderedDict()
+        self.msg_values: Dict[str, Any] = {}
+        self.reading = True
+
+    def produced(self, msg_id: str, value: Any):
+        self.reading = True
+        if value is None:
+            # rows without a watermark are only read by the first, full, read
+            return
+
+        self.read_value = value
+        self.msg_values[msg_id] = value
+        self.pending[value] = self.pending.get(value, 0) + 1
+
+    def done_reading(self):
+        self.reading = False
+        self.advance()
+
+    def ack(self, msg_ids: List[str]):
+        for msg_id in msg_ids:
+            value = self.msg_values.pop(msg_id, None)
+            if value is not None:
+                self.pending[value] -= 1
+
+        self.advance()
+
+    def advance(self):
+        """Saves the highest watermark whose records, and the records before it, have all been acknowledged."""
+        value = self.value
+        while self.pending:
+            first_value, count = next(iter(self.pending.items()))
+            # more records with the last watermark may still be read
+            if count > 0 or (self.reading and len(self.pending) == 1):
+                break
+
+            self.pending.popitem(last=False)
+            value = first_value
+
+        if value != self.value:
+            logger.debug(f"Saving watermark of {self.column}: {value}")
+            self.value = value
+            utils.write_json(self.state_file, {"watermark": value})
+
+
+def parse_watermark(value: Any, column: sa.Column) -> Any:
+    """Converts a watermark loaded from JSON to the Python type of its column."""
+    if value is None:
+        return None
+
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+
+    if python_type in (datetime, date, time):
+        return python_type.fromisoformat(value)
+
+    if python_type is Decimal:
+        return Decimal(value)
+
+    return value
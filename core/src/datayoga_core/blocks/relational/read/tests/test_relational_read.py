@@ -0,0 +1,133 @@
+from datetime import date, datetime
+from unittest.mock import patch
+
+import pytest
+import sqlalchemy as sa
+from datayoga_core.block import Block as DyBlock
+from datayoga_core.blocks.relational import utils as relational_utils
+from datayoga_core.blocks.relational.read.block import Block, get_range_bounds
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    metadata = sa.MetaData()
+    sa.Table(
+        "employees", metadata,
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("name", sa.String(10)),
+        sa.Column("active", sa.Boolean),
+        sa.Column("updated_at", sa.DateTime)
+    )
+    metadata.create_all(engine)
+    insert(engine, [(1, "a", True, 1), (2, "b", False, 2), (3, "c", True, 2)])
+    return engine
+
+
+def insert(engine, rows):
+    with engine.begin() as connection:
+        connection.execute(sa.text("insert into employees values (:id, :name, :active, :updated_at)"), [
+            {"id": id, "name": name, "active": active, "updated_at": datetime(2024, 1, day)}
+            for id, name, active, day in rows])
+
+
+async def read(engine, properties):
+    with patch.object(relational_utils, "get_engine", return_value=(engine, relational_utils.DbType.PSQL)):
+        block = Block({"connection": "test", "table": "employees", **properties})
+        block.init()
+
+    records = [record async for records in block.produce() for record in records]
+    block.stop()
+    return block, records
+
+
+def without_msg_id(records):
+    return [{key: value for key, value in record.items() if key != DyBlock.MSG_ID_FIELD} for record in records]
+
+
+@pytest.mark.asyncio
+async def test_read_columns_and_where(engine):
+    _, records = await read(engine, {"columns": ["id", {"full_name": "name"}], "where": "active = 1"})
+    assert without_msg_id(records) == [{"id": 1, "full_name": "a"}, {"id": 3, "full_name": "c"}]
+
+
+@pytest.mark.asyncio
+async def test_read_incremental(engine, tmp_path):
+    properties = {
+        "columns": ["id"],
+        "incremental": {"column": "updated_at", "state_file": f"{tmp_path / 'watermark.json'}"}
+    }
+
+    block, records = await read(engine, properties)
+    assert without_msg_id(records) == [{"id": 1}, {"id": 2}, {"id": 3}]
+    # the watermark only moves past the acknowledged records
+    block.ack([records[0][DyBlock.MSG_ID_FIELD], records[2][DyBlock.MSG_ID_FIELD]])
+    assert block.watermark.value == datetime(2024, 1, 1)
+
+    # the unacknowledged records are read again, together with the new rows
+    insert(engine, [(4, "d", True, 3)])
+    block, records = await read(engine, properties)
+    assert without_msg_id(records) == [{"id": 2}, {"id": 3}, {"id": 4}]
+    block.ack([record[DyBlock.MSG_ID_FIELD] for record in records])
+    assert block.watermark.value == datetime(2024, 1, 3)
+
+    _, records = await read(engine, properties)
+    assert records == []
+
+
+@pytest.mark.parametrize("min_value, max_value, count, expected", [
+    (1, 10, 3, [5, 9]),
+    (1, 2, 4, [2]),
+    (5, 5, 4, []),
+    (None, None, 4, []),
+    (0.0, 1.0, 4, [0.25, 0.5, 0.75]),
+    (date(2024, 1, 1), date(2024, 1, 5), 2, [date(2024, 1, 3)])
+])
+def test_get_range_bounds(min_value, max_value, count, expected):
+    assert get_range_bounds(min_value, max_value, count) == expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("method", ["range", "modulo"])
+async def test_read_partitioned(engine, method):
+    insert(engine, [(id, f"{id}", True, 3) for id in range(4, 100)])
+    with engine.begin() as connection:
+        connection.execute(sa.text("insert into employees (id) values (100)"))
+
+    _, records = await read(engine, {
+        "columns": ["id"],
+        "where": "name is not null",
+        "batch_size": 7,
+        "partitioning": {"column": "id", "count": 4, "method": method}
+    })
+
+    assert sorted(record["id"] for record in records) == list(range(1, 100))
+    assert len({record[DyBlock.MSG_ID_FIELD] for record in records}) == 99
+
+
+@pytest.mark.asyncio
+async def test_read_partitioned_within_pool_capacity(engine):
+    insert(engine, [(id, f"{id}", True, 3) for id in range(4, 100)])
+    # a pool of 3 connections, one of them used by the block itself
+    small_engine = sa.create_engine(engine.url, pool_size=2, max_overflow=1, pool_timeout=1)
+    checked_out = []
+    sa.event.listen(small_engine, "checkout", lambda *args: checked_out.append(small_engine.pool.checkedout()))
+
+    _, records = await read(small_engine, {
+        "columns": ["id"],
+        "batch_size": 7,
+        "partitioning": {"column": "id", "count": 8}
+    })
+
+    assert sorted(record["id"] for record in records) == list(range(1, 100))
+    assert max(checked_out) == 3
+
+
+@pytest.mark.asyncio
+async def test_read_partitioned_by_date(engine):
+    with engine.begin() as connection:
+        connection.execute(sa.text("insert into employees (id) values (4)"))
+
+    # rows with a null partition column are read too
+    _, records = await read(engine, {"columns": ["id"], "partitioning": {"column": "updated_at", "count": 3}})
+    assert sorted(record["id"] for record in records) == [1, 2, 3, 4]
@@ -4,7 +4,7 @@ from contextlib import suppress
 from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import sqlalchemy as sa
-from datayoga_core import utils, write_utils
+from datayoga_core import tracing, utils, write_utils
 from datayoga_core.block import Block as DyBlock
 from datayoga_core.blocks.relational import utils as relational_utils
 from datayoga_core.context import Context
@@ -18,6 +18,8 @@ logger = logging.getLogger("dy")
 
 
 class Block(DyBlock, metaclass=ABCMeta):
+    MUTATES_INPUT = False
+
     _engine_fields = ("business_key_columns", "mapping_columns", "columns",
                       "delete_stmt", "upsert_stmt", "tbl", "connection", "engine")
 
@@ -41,6 +43,8 @@ class Block(DyBlock, metaclass=ABCMeta):
         self.keys = self.properties.get("keys")
         self.mapping = self.properties.get("mapping")
         self.foreach = self.properties.get("foreach")
+        self.upsert_mapper = write_utils.RecordMapper(self.keys, self.mapping)
+        self.delete_mapper = write_utils.RecordMapper(self.keys)
         self.tbl = sa.Table(self.table, sa.MetaData(schema=self.schema), autoload_with=self.engine)
 
         if self.opcode_field:
@@ -214,9 +218,12 @@ class Block(DyBlock, metaclass=ABCMeta):
             with self.engine.connect() as connection:
                 connected = True
                 try:
-                    connection.execute(statement, records)
-                    if not connection._is_autocommit_isolation():
-                        connection.commit()
+                    with tracing.start_span("relational.write", kind=tracing.SpanKind.CLIENT, attributes={
+                            "db.system": self.db_type.value, "db.sql.table": self.table,
+                            "datayoga.records": len(records)}):
+                        connection.execute(statement, records)
+                        if not connection._is_autocommit_isolation():
+                            connection.commit()
                 except OperationalError as e:
                     if self.db_type == relational_utils.DbType.MYSQL:
                         mysql_conn_errors = (
@@ -243,23 +250,13 @@ class Block(DyBlock, metaclass=ABCMeta):
         """Upserts records into the table."""
         if records:
             logger.debug(f"Upserting {len(records)} record(s) to {self.table} table")
-            records_to_upsert = []
-            for record in records:
-                records_to_upsert.append(write_utils.map_record(record, self.keys, self.mapping))
-
-            if records_to_upsert:
-                self.execute(self.upsert_stmt, records_to_upsert)
+            self.execute(self.upsert_stmt, self.upsert_mapper.map_records(records))
 
     def execute_delete(self, records: List[Dict[str, Any]]):
         """Deletes records from the table."""
         if records:
             logger.debug(f"Deleting {len(records)} record(s) from {self.table} table")
-            records_to_delete = []
-            for record in records:
-                records_to_delete.append(write_utils.map_record(record, self.keys))
-
-            if records_to_delete:
-                self.execute(self.delete_stmt, records_to_delete)
+            self.execute(self.delete_stmt, self.delete_mapper.map_records(records))
 
     def stop(self):
         """Disposes of the engine and cleans up resources."""
@@ -0,0 +1,225 @@
+import logging
+import os
+import threading
+from abc import abstractmethod
+from collections import OrderedDict
+from enum import Enum, unique
+from typing import Any, Dict, List, Optional, Set
+
+import orjson
+from datayoga_core import utils
+from datayoga_core.expression import import_sqlite3
+
+logger = logging.getLogger("dy")
+
+
+@unique
+class CheckpointStoreType(str, Enum):
+    FILE = "file"
+    SQLITE = "sqlite"
+
+
+class CheckpointStore:
+    """Local store of the positions producers resume from, by key."""
+
+    @abstractmethod
+    def load(self, key: str) -> Optional[Any]:
+        """Loads a checkpoint.
+
+        Args:
+            key (str): Checkpoint key.
+
+        Returns:
+            Optional[Any]: The saved position, None if there is no checkpoint.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def save(self, key: str, value: Any):
+        """Saves a checkpoint, replacing the previous one.
+
+        Args:
+            key (str): Checkpoint key.
+            value (Any): Position, a JSON serializable value.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class FileCheckpointStore(CheckpointStore):
+    """Stores the checkpoints in a JSON file.
+
+    Saves are batched rather than rewriting the file on every save: a background thread writes the file at most
+    `flush_ms` after a save, or once `max_saves` saves are pending, and `close` writes the last checkpoints.
+    After a crash, the job resumes from the checkpoints written last and reads the records since then again.
+
+    Attributes:
+        file (str): JSON file.
+        flush_ms (int): Maximum time in milliseconds that a save waits to be written.
+        max_saves (int): Number of pending saves that triggers a write.
+    """
+
+    def __init__(self, file: str, flush_ms: int = 1000, max_saves: int = 1000):
+        self.file = file
+        self.flush_ms = flush_ms
+        self.max_saves = max_saves
+        self.checkpoints: Dict[str, Any] = utils.read_json(file) if os.path.exists(file) else {}
+        # number of saves since the file was written
+        self.saves = 0
+        self.closed = False
+        self.changed = threading.Condition()
+        self.writer: Optional[threading.Thread] = None
+
+    def load(self, key: str) -> Optional[Any]:
+        return self.checkpoints.get(key)
+
+    def save(self, key: str, value: Any):
+        with self.changed:
+            self.checkpoints[key] = value
+            self.changed_checkpoints()
+
+    def delete(self, key: str):
+        with self.changed:
+            if self.checkpoints.pop(key, None) is not None:
+                self.changed_checkpoints()
+
+    def changed_checkpoints(self):
+        self.saves += 1
+        if self.writer is None or not self.writer.is_alive():
+            self.writer = threading.Thread(target=self.write_checkpoints, name="checkpoint-writer", daemon=True)
+            self.writer.start()
+        elif self.saves >= self.max_saves:
+            self.changed.notify()
+
+    def write_checkpoints(self):
+        """Writes the checkpoints whenever they're changed, until the store is closed."""
+        while True:
+            with self.changed:
+                self.changed.wait_for(lambda: self.closed or self.saves >= self.max_saves,
+                                      timeout=self.flush_ms / 1000)
+                closed = self.closed
+                checkpoints = dict(self.checkpoints) if self.saves else None
+                self.saves = 0
+
+            if checkpoints is not None:
+                try:
+                    utils.write_json(self.file, checkpoints)
+                except Exception as e:
+                    logger.error(f"Failed to write the checkpoints to {self.file}: {e}")
+                    with self.changed:
+                        # retried with the next write
+                        self.saves = max(self.saves, 1)
+
+            if closed:
+                return
+
+    def close(self):
+        """Writes the pending saves and stops the background thread."""
+        with self.changed:
+            self.closed = True
+            self.changed.notify()
+
+        if self.writer is not None:
+            self.writer.join()
+            self.writer = None
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """Stores the checkpoints in an SQLite database, which several jobs can share."""
+
+    def __init__(self, file: str):
+        sqlite3 = import_sqlite3()
+        self.conn = sqlite3.connect(file, check_same_thread=False)
+        self.conn.execute("create table if not exists checkpoints (key text primary key, value text)")
+        self.conn.commit()
+
+    def load(self, key: str) -> Optional[Any]:
+        row = self.conn.execute("select value from checkpoints where key = ?", (key,)).fetchone()
+        return orjson.loads(row[0]) if row is not None else None
+
+    def save(self, key: str, value: Any):
+        self.conn.execute("insert or replace into checkpoints (key, value) values (?, ?)",
+                          (key, orjson.dumps(value, default=str)))
+        self.conn.commit()
+
+    def delete(self, key: str):
+        self.conn.execute("delete from checkpoints where key = ?", (key,))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def create_store(store_type: CheckpointStoreType, file: str) -> CheckpointStore:
+    logger.debug(f"Using {store_type.value} checkpoint store {file}")
+    if store_type == CheckpointStoreType.SQLITE:
+        return SQLiteCheckpointStore(file)
+
+    return FileCheckpointStore(file)
+
+
+class Checkpoint:
+    """Checkpoint of a producer in a checkpoint store.
+
+    Attributes:
+        store (CheckpointStore): Checkpoint store.
+        key (str): Key of the producer in the store.
+    """
+
+    def __init__(self, store: CheckpointStore, key: str):
+        self.store = store
+        self.key = key
+
+    def load(self) -> Optional[Any]:
+        return self.store.load(self.key)
+
+    def save(self, value: Any):
+        self.store.save(self.key, value)
+
+    def clear(self):
+        self.store.delete(self.key)
+
+
+class OffsetTracker:
+    """Tracks the offset up to which all of the produced records have been acknowledged.
+
+    Records are acknowledged in any order, while the contiguous acknowledged offset only moves forward
+    once all of the records produced before it have been acknowledged.
+
+    Attributes:
+        offset (Any): Offset of the last record of the acknowledged prefix, None until the first record is.
+    """
+
+    def __init__(self):
+        self.offset: Any = None
+        # offsets of the unacknowledged records, in the order they were produced
+        self.pending: OrderedDict[str, Any] = OrderedDict()
+        self.acked: Set[str] = set()
+
+    def produced(self, msg_id: str, offset: Any):
+        self.pending[msg_id] = offset
+
+    def ack(self, msg_ids: List[str]) -> bool:
+        """Acknowledges records.
+
+        Returns:
+            bool: Whether the contiguous acknowledged offset has moved.
+        """
+        self.acked.update(msg_id for msg_id in msg_ids if msg_id in self.pending)
+        moved = False
+        while self.pending:
+            msg_id = next(iter(self.pending))
+            if msg_id not in self.acked:
+                break
+
+            self.acked.discard(msg_id)
+            self.offset = self.pending.popitem(last=False)[1]
+            moved = True
+
+        return moved
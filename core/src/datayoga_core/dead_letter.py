@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import orjson
+from datayoga_core.block import Block
+from datayoga_core.result import Result
+
+logger = logging.getLogger("dy")
+
+
+class DeadLetterQueue:
+    """Writes the rejected records to a sink block, in batches, and acknowledges them once they're written.
+
+    Each dead letter holds the rejected record, the message of the rejection and the id of the step that
+    rejected it. Dead letters are collected and written in the background once `batch_size` of them are
+    pending, or `flush_ms` after the first of them arrived.
+
+    Dead letters that fail to be written are retried, waiting `retry_ms` after the first failure and twice as long
+    after each further failure, up to `MAX_RETRY_MS`. Their records aren't acknowledged meanwhile, so a checkpoint
+    doesn't advance past them. Once `max_retries` retries have failed, or when the job shuts down, they're
+    appended to `fallback_file` and acknowledged. Without a fallback file they're retried for as long as the job
+    runs, and the records of dead letters still unwritten on shutdown aren't acknowledged, so that they're
+    read again after a restart.
+
+    Attributes:
+        sink (Block): Block that writes the dead letters, e.g. files.write_ndjson, redis.write or relational.write.
+        ack (Callable[[List[str]], None]): Acknowledges the message IDs of the written dead letters.
+        batch_size (int): Number of pending dead letters that triggers a write.
+        flush_ms (int): Maximum time in milliseconds that a dead letter waits to be written.
+        retry_ms (int): Time in milliseconds before the first retry of dead letters that failed to be written.
+        max_retries (int): Number of retries before the dead letters are written to the fallback file.
+        fallback_file (Optional[str]): NDJSON file that the dead letters are appended to when the sink fails.
+    """
+    MAX_RETRY_MS = 60000
+
+    def __init__(self, sink: Block, ack: Callable[[List[str]], None], batch_size: int = 100, flush_ms: int = 1000,
+                 retry_ms: int = 1000, max_retries: int = 5, fallback_file: Optional[str] = None):
+        self.sink = sink
+        self.ack = ack
+        self.batch_size = batch_size
+        self.flush_ms = flush_ms
+        self.retry_ms = retry_ms
+        self.max_retries = max_retries
+        self.fallback_file = fallback_file
+        self.dead_letters: List[Dict[str, Any]] = []
+        # message IDs whose acknowledgement waits for their dead letter to be written
+        self.pending: Set[str] = set()
+        # number of consecutive writes that failed
+        self.failures = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.tasks: Set[asyncio.Task] = set()
+        self.write_lock = asyncio.Lock()
+
+    def add(self, step_id: str, results: List[Result]):
+        """Adds the rejected results of a step. Called before the results are acknowledged."""
+        rejected_at = datetime.now(timezone.utc).isoformat()
+        for result in results:
+            payload = result.payload or {}
+            msg_id = payload.get(Block.MSG_ID_FIELD)
+            if msg_id is not None:
+                self.pending.add(msg_id)
+
+            self.dead_letters.append({
+                "msg_id": msg_id,
+                "step_id": step_id,
+                "message": result.message,
+                "rejected_at": rejected_at,
+                "payload": {key: value for key, value in payload.items() if key != Block.MSG_ID_FIELD}
+            })
+
+        # while the sink fails, the dead letters wait for the retry
+        if len(self.dead_letters) >= self.batch_size and not self.failures:
+            self.schedule_write()
+        elif self.timer is None and self.dead_letters:
+            self.timer = asyncio.get_running_loop().call_later(self.flush_ms / 1000, self.schedule_write)
+
+    def defer_acks(self, msg_ids: List[str]) -> List[str]:
+        """Returns the message IDs to acknowledge now, without those that wait for their dead letter to be written."""
+        if not self.pending:
+            return msg_ids
+
+        return [msg_id for msg_id in msg_ids if msg_id not in self.pending]
+
+    def schedule_write(self):
+        """Writes the pending dead letters in the background."""
+        task = asyncio.create_task(self.write())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def write(self, final: bool = False):
+        """Writes the pending dead letters and acknowledges their records.
+
+        Args:
+            final (bool): Whether this is the last write, the dead letters that fail are not retried.
+        """
+        # one write at a time, so that the dead letters are written in order
+        async with self.write_lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+            if not self.dead_letters:
+                return
+
+            dead_letters, self.dead_letters = self.dead_letters, []
+            failed = await self.write_sink(dead_letters)
+            if failed:
+                self.failures += 1
+                if self.fallback_file is not None and (final or self.failures > self.max_retries):
+                    failed = await self.write_fallback(failed)
+
+            if failed:
+                # retried before the dead letters added meanwhile, to keep them in order
+                self.dead_letters[:0] = failed
+                if not final:
+                    retry_ms = min(self.retry_ms * 2 ** (self.failures - 1), self.MAX_RETRY_MS)
+                    logger.warning(f"Retrying to write {len(failed)} dead letter(s) in {retry_ms}ms")
+                    self.timer = asyncio.get_running_loop().call_later(retry_ms / 1000, self.schedule_write)
+            else:
+                self.failures = 0
+
+            failed_msg_ids = {dead_letter["msg_id"] for dead_letter in failed}
+            written = [dead_letter["msg_id"] for dead_letter in dead_letters
+                       if dead_letter["msg_id"] is not None and dead_letter["msg_id"] not in failed_msg_ids]
+            self.pending.difference_update(written)
+            if written:
+                self.ack(written)
+
+    async def write_sink(self, dead_letters: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Writes the dead letters to the sink and returns those that failed."""
+        try:
+            logger.debug(f"Writing {len(dead_letters)} dead letter(s)")
+            result = await self.sink.run(dead_letters)
+        except Exception as e:
+            logger.error(f"Failed to write {len(dead_letters)} dead letter(s): {e}")
+            return dead_letters
+
+        if result.rejected:
+            logger.error(f"Failed to write {len(result.rejected)} dead letter(s): {result.rejected[0].message}")
+
+        return [rejected.payload for rejected in result.rejected if rejected.payload]
+
+    async def write_fallback(self, dead_letters: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Appends the dead letters to the fallback file and returns them if that failed too."""
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, append_ndjson, self.fallback_file, dead_letters)
+        except Exception as e:
+            logger.error(f"Failed to write {len(dead_letters)} dead letter(s) to {self.fallback_file}: {e}")
+            return dead_letters
+
+        logger.warning(f"Wrote {len(dead_letters)} dead letter(s) to {self.fallback_file}")
+        return []
+
+    async def flush(self):
+        """Writes the pending dead letters and waits for the writes in progress, used on shutdown."""
+        if self.tasks:
+            await asyncio.gather(*self.tasks)
+
+        await self.write(final=True)
+
+
+def append_ndjson(file: str, records: List[Dict[str, Any]]):
+    with open(file, "ab") as output:
+        for record in records:
+            output.write(orjson.dumps(record, default=str, option=orjson.OPT_APPEND_NEWLINE))
@@ -1,20 +1,13 @@
 import logging
-
-import orjson
-import sqlglot
-
-try:
-    # older linux doesn't have adequate version
-    import pysqlite3 as sqlite3
-except ImportError:
-    import sqlite3
-
 from abc import abstractmethod
 from enum import Enum, unique
+from types import ModuleType
 from typing import Any, Dict, List, Tuple, Union
 
 import jmespath
-from datayoga_core.jmespath_custom_functions import JmespathCustomFunctions
+import orjson
+from datayoga_core.jmespath_custom_functions import (JmespathCustomFunctions,
+                                                     prepare_literal_arguments)
 
 logger = logging.getLogger("dy")
 
@@ -87,8 +80,22 @@ class Expression:
             return [row[0] for row in zip(data, self.search_bulk(data)) if row[1]]
 
 
+def import_sqlite3() -> ModuleType:
+    """Imports sqlite3 on first use of an SQL expression, to keep it and sqlglot out of the startup time."""
+    try:
+        # older linux doesn't have adequate version
+        import pysqlite3 as sqlite3
+    except ImportError:
+        import sqlite3
+
+    return sqlite3
+
+
 class SQLExpression(Expression):
     def compile(self, expression: str):
+        import sqlglot
+
+        sqlite3 = import_sqlite3()
         # check min sqlite3 version to at least support values clause
         if sqlite3.sqlite_version_info < (3, 8, 8):
             raise ValueError(
@@ -97,6 +104,7 @@ class SQLExpression(Expression):
         # we turn off `check_same_thread` to gain performance benefit by reusing the same connection object
         # safe to use since we are only creating in memory structures
         self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
         # we support both single field expressions and multiple fields
         self._is_single_field = True
         try:
@@ -147,8 +155,6 @@ class SQLExpression(Expression):
             List[Dict[str, Any]]: Query result
         """
         # builds an expression for fetching in memory data
-        self.conn.row_factory = sqlite3.Row
-
         if len(self._column_names) > 0:
             columns_clause = ",".join(f"[column{i+1}] AS `{'.'.join(col)}`" for i, col in enumerate(self._column_names))
 
@@ -185,6 +191,10 @@ class JMESPathExpression(Expression):
 
     def compile(self, expression: str):
         self.expression = jmespath.compile(expression)
+        # literal regex patterns, hash algorithms etc. are prepared once, for the functions of this expression
+        prepared_arguments = prepare_literal_arguments(self.expression.parsed)
+        self.options = (jmespath.Options(custom_functions=JmespathCustomFunctions(prepared_arguments))
+                        if prepared_arguments else JMESPathExpression.options)
 
     def search(self, data: Dict[str, Any]) -> Any:
         return self.expression.search(data, options=self.options)
@@ -0,0 +1,150 @@
+import glob
+import logging
+import os
+from typing import Dict, List, Optional
+
+from datayoga_core import utils
+from datayoga_core.checkpoint import Checkpoint, OffsetTracker
+
+logger = logging.getLogger("dy")
+
+
+def list_files(path: str) -> List[str]:
+    """Lists the files to read: a single file, the files of a directory (recursively) or the files matching a glob.
+
+    Args:
+        path (str): File, directory or glob pattern.
+
+    Returns:
+        List[str]: Files sorted by their path.
+    """
+    if os.path.isdir(path):
+        return sorted(os.path.join(root, file) for root, _, files in os.walk(path) for file in files)
+
+    if glob.has_magic(path):
+        return sorted(file for file in glob.glob(path, recursive=True) if os.path.isfile(file))
+
+    return [path]
+
+
+class FileManifest:
+    """Manifest of the files that have been processed, identified by their path, size and modification time.
+
+    A file that changes after it's been processed is processed again.
+
+    Attributes:
+        manifest_file (str): Path of the JSON manifest file.
+        files (Dict[str, Dict[str, float]]): Size and modification time of the processed files, by path.
+    """
+
+    def __init__(self, manifest_file: str):
+        self.manifest_file = manifest_file
+        self.files: Dict[str, Dict[str, float]] = (
+            utils.read_json(manifest_file) if os.path.exists(manifest_file) else {})
+
+    @staticmethod
+    def get_signature(file: str) -> Dict[str, float]:
+        stat = os.stat(file)
+        return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+    def is_processed(self, file: str) -> bool:
+        return self.files.get(os.path.abspath(file)) == self.get_signature(file)
+
+    def add(self, file: str, signature: Dict[str, float]):
+        """Adds a processed file and saves the manifest.
+
+        Args:
+            file (str): Path of the file.
+            signature (Dict[str, float]): Size and modification time of the file when it was read.
+        """
+        self.files[os.path.abspath(file)] = signature
+        utils.write_json(self.manifest_file, self.files)
+
+
+class FileProgress:
+    """Tracks the records produced out of each file and their acknowledgements.
+
+    Once all of the records of a file have been produced and acknowledged, the file is added to the manifest.
+    With a checkpoint, the file and the number of its records up to which all of the records have been
+    acknowledged are saved, and the next run resumes from them. The checkpoint is cleared once all of the
+    files are done. When reading several files, the msg_id of the records is prefixed with the path of their file.
+
+    Attributes:
+        files (List[str]): Files to read, without the files before the checkpoint.
+        manifest (Optional[FileManifest]): Manifest of processed files.
+        checkpoint (Optional[Checkpoint]): Checkpoint to resume from.
+        resume_records (Dict[str, int]): Number of records to skip at the start of the files, by file.
+    """
+    MSG_ID_SEPARATOR = "#"
+
+    def __init__(self, files: List[str], manifest: Optional[FileManifest] = None,
+                 checkpoint: Optional[Checkpoint] = None):
+        self.manifest = manifest
+        self.checkpoint = checkpoint
+        self.offsets = OffsetTracker() if checkpoint is not None else None
+        self.resume_records: Dict[str, int] = {}
+
+        position = checkpoint.load() if checkpoint is not None else None
+        if position is not None:
+            logger.info(f"Resuming after record {position['records']} of {position['file']}")
+            # the files are read in order, so the files before the checkpoint are done
+            files = [file for file in files if os.path.abspath(file) >= position["file"]]
+            self.resume_records = {file: position["records"] for file in files
+                                   if os.path.abspath(file) == position["file"]}
+
+        self.files = files
+        self.signatures = {file: FileManifest.get_signature(file) for file in files} if manifest else {}
+        self.pending: Dict[str, int] = {file: 0 for file in files}
+        self.positions: Dict[str, int] = {file: self.resume_records.get(file, 0) for file in files}
+        self.reading = set(files)
+
+    def get_msg_id_prefix(self, file: str) -> str:
+        return f"{file}{self.MSG_ID_SEPARATOR}" if len(self.files) > 1 else ""
+
+    def get_file(self, msg_id: str) -> str:
+        return msg_id.rpartition(self.MSG_ID_SEPARATOR)[0] if len(self.files) > 1 else self.files[0]
+
+    def produced(self, file: str, msg_ids: List[str], skipped: int = 0):
+        """Tracks the records produced out of a file, followed by `skipped` rows that weren't produced."""
+        self.pending[file] += len(msg_ids)
+        if self.offsets is not None:
+            position = self.positions[file]
+            for msg_id in msg_ids:
+                position += 1
+                self.offsets.produced(msg_id, (file, position))
+
+            # skipped rows still count, so that a resumed run starts after them
+            self.positions[file] = position + skipped
+
+    def done_reading(self, file: str):
+        logger.debug(f"Done reading {file}")
+        self.reading.discard(file)
+        self.complete_if_done(file)
+
+    def ack(self, msg_ids: List[str]):
+        if self.manifest is None and self.checkpoint is None:
+            return
+
+        # save the checkpoint first, so that it's cleared once the last file is done
+        if self.offsets is not None and self.offsets.ack(msg_ids):
+            file, records = self.offsets.offset
+            self.checkpoint.save({"file": os.path.abspath(file), "records": records})
+
+        for msg_id in msg_ids:
+            file = self.get_file(msg_id)
+            if file in self.pending:
+                self.pending[file] -= 1
+                self.complete_if_done(file)
+
+    def complete_if_done(self, file: str):
+        if file in self.reading or self.pending.get(file) != 0:
+            return
+
+        del self.pending[file]
+        if self.manifest is not None:
+            logger.debug(f"Adding {file} to the manifest")
+            self.manifest.add(file, self.signatures[file])
+
+        if not self.pending and self.checkpoint is not None:
+            logger.debug("Done with all of the files, clearing the checkpoint")
+            self.checkpoint.clear()
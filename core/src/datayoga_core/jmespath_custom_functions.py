@@ -2,17 +2,109 @@ import base64
 import hashlib
 import re
 import string
+from contextlib import suppress
 from datetime import datetime, timezone
-from typing import Any, Dict, Iterable, List, Optional, Union
+from functools import lru_cache, partial
+from typing import (Any, Callable, Dict, Iterable, List, Optional, Pattern,
+                    Tuple, Union)
 from uuid import uuid4
 
 import jmespath
 import orjson
 from jmespath import functions
+from jmespath.parser import ParsedResult
+
+# bounds the caches of dynamic (non literal) arguments, e.g. a pattern that comes from a field of the record
+REGEX_CACHE_SIZE = 256
+HASH_CACHE_SIZE = 32
+PREDICATE_CACHE_SIZE = 128
+
+
+@lru_cache(maxsize=REGEX_CACHE_SIZE)
+def compile_regex(pattern: str) -> Pattern:
+    """Compiles a regular expression, reusing previously compiled patterns."""
+    return re.compile(pattern)
+
+
+@lru_cache(maxsize=HASH_CACHE_SIZE)
+def get_hash_constructor(hash_name: str) -> Callable[[], Any]:
+    """Returns a constructor of hash objects for the given algorithm.
+
+    Named constructors (e.g. `hashlib.sha1`) are used when available as they skip the lookup done by `hashlib.new`.
+
+    Raises:
+        ValueError: If the algorithm is not supported.
+    """
+    # validate the algorithm once, before caching its constructor
+    hashlib.new(hash_name)
+
+    if hash_name in hashlib.algorithms_guaranteed:
+        return getattr(hashlib, hash_name)
+
+    return partial(hashlib.new, hash_name)
+
+
+@lru_cache(maxsize=PREDICATE_CACHE_SIZE)
+def compile_predicate(predicate: str) -> ParsedResult:
+    """Compiles a JMESPath predicate used by `filter_entries`, reusing previously compiled predicates."""
+    return jmespath.compile(predicate)
+
+
+# custom functions with an argument that can be prepared once when passed as a literal, by argument position
+LITERAL_ARGUMENT_LOADERS = {
+    "regex_replace": (1, compile_regex),
+    "hash": (1, get_hash_constructor),
+    "filter_entries": (1, compile_predicate)
+}
+
+
+def prepare_literal_arguments(node: Dict[str, Any],
+                              prepared: Optional[Dict[Tuple[str, Any], Any]] = None) -> Dict[Tuple[str, Any], Any]:
+    """Walks a parsed JMESPath expression and prepares the literal arguments of custom functions ahead of time.
+
+    Invalid literals are skipped here, they are reported when the expression is evaluated.
+
+    Args:
+        node (Dict[str, Any]): Parsed JMESPath expression node.
+        prepared (Optional[Dict[Tuple[str, Any], Any]]): Prepared arguments to add to, used when recursing.
+
+    Returns:
+        Dict[Tuple[str, Any], Any]: Prepared arguments by function name and literal value.
+    """
+    if prepared is None:
+        prepared = {}
+
+    if node.get("type") == "function_expression" and node.get("value") in LITERAL_ARGUMENT_LOADERS:
+        position, loader = LITERAL_ARGUMENT_LOADERS[node["value"]]
+        children = node.get("children", [])
+        if len(children) > position and children[position].get("type") == "literal":
+            value = children[position]["value"]
+            with suppress(Exception):
+                prepared[(node["value"], value)] = loader(value)
+
+    for child in node.get("children", []):
+        if isinstance(child, dict):
+            prepare_literal_arguments(child, prepared)
+
+    return prepared
 
 
 # custom functions for JMESPath
 class JmespathCustomFunctions(functions.Functions):
+    """Custom functions of JMESPath expressions.
+
+    Attributes:
+        prepared_arguments (Dict[Tuple[str, Any], Any]): Literal arguments of the functions of an expression that
+            were prepared when it was compiled, by function name and literal value.
+    """
+
+    def __init__(self, prepared_arguments: Optional[Dict[Tuple[str, Any], Any]] = None):
+        self.prepared_arguments = prepared_arguments or {}
+
+    def get_prepared(self, function_name: str, value: Any, loader: Callable[[Any], Any]) -> Any:
+        """Returns a prepared literal argument, or loads a dynamic argument through the cache of the loader."""
+        prepared = self.prepared_arguments.get((function_name, value))
+        return prepared if prepared is not None else loader(value)
 
     @functions.signature({"types": ["string", "null"]})
     def _func_capitalize(self, arg):
@@ -95,7 +187,7 @@ class JmespathCustomFunctions(functions.Functions):
 
             return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
 
-        h = hashlib.new(hash_name)
+        h = self.get_prepared("hash", hash_name, get_hash_constructor)()
         h.update(prepare())
         return h.hexdigest()
 
@@ -129,7 +221,7 @@ class JmespathCustomFunctions(functions.Functions):
     @functions.signature({"types": ["string"]}, {"types": ["string"]}, {"types": ["string"]})
     def _func_regex_replace(self, text: str, pattern: str, replacement: str) -> str:
         """Replaces matched patterns in the string by the given replacement."""
-        return re.sub(pattern, replacement, text)
+        return self.get_prepared("regex_replace", pattern, compile_regex).sub(replacement, text)
 
     @functions.signature({"types": ["number", "string", "boolean", "array", "object", "null"]}, {"types": ["array"]})
     def _func_in(self, element: Any, iterable: Iterable) -> bool:
@@ -201,11 +293,11 @@ class JmespathCustomFunctions(functions.Functions):
         if entries is None:
             return None
 
-        # Register custom functions
-        jmespath_options = jmespath.Options(custom_functions=JmespathCustomFunctions())
+        # Reuse this instance for the custom functions
+        jmespath_options = jmespath.Options(custom_functions=self)
 
         # Compile the predicate expression
-        compiled_predicate = jmespath.compile(predicate)
+        compiled_predicate = self.get_prepared("filter_entries", predicate, compile_predicate)
 
         # Apply the predicate to filter entries
         filtered_entries = {}
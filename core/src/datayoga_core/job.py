@@ -2,21 +2,32 @@ from __future__ import annotations
 
 import asyncio
 import logging
-import marshal
 import os
 import sys
+import time
 from contextlib import suppress
 from enum import Enum, unique
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
-import jsonschema
-from datayoga_core import blocks, prometheus, utils
+from datayoga_core import blocks, expression, prometheus, utils
+from datayoga_core.ack_aggregator import AckAggregator
 from datayoga_core.block import Block
 from datayoga_core.context import Context
 from datayoga_core.producer import Producer
-from datayoga_core.result import JobResult, Result, Status
-from datayoga_core.step import Step
+from datayoga_core.rate_limit import RateLimiter
+from datayoga_core.result import (JobResult, Result, Status, SuccessResults,
+                                  get_payloads)
+from datayoga_core.step import Executor, Step
+from datayoga_core.step_buffer import StepBuffer
+from jsonschema.protocols import Validator
+
+if TYPE_CHECKING:
+    # the optional features of a job are imported once they're used
+    from datayoga_core.checkpoint import Checkpoint, CheckpointStore
+    from datayoga_core.dead_letter import DeadLetterQueue
+    from datayoga_core.profiler import Profiler
 
 logger = logging.getLogger("dy")
 
@@ -25,6 +36,7 @@ logger = logging.getLogger("dy")
 class ErrorHandling(str, Enum):
     ABORT = "abort"
     IGNORE = "ignore"
+    DEAD_LETTER = "dead_letter"
 
 
 class Job:
@@ -35,19 +47,32 @@ class Job:
     """
 
     def __init__(self, steps: Optional[List[Step]] = None, producer: Optional[Producer] = None,
-                 error_handling: Optional[ErrorHandling] = None):
+                 error_handling: Optional[ErrorHandling] = None, checkpoint: Optional[Dict[str, Any]] = None,
+                 acks: Optional[Dict[str, Any]] = None, dead_letter: Optional[Dict[str, Any]] = None):
         """Constructs a job and its blocks.
 
         Args:
             steps (List[Dict[str, Any]]): Job steps.
             producer (Optional[Producer]): Block to be used as a producer.
             error_handling (Optional[ErrorHandling]): error handling strategy.
+            checkpoint (Optional[Dict[str, Any]]): Checkpoint store the producer resumes from.
+            acks (Optional[Dict[str, Any]]): Coalescing of the acknowledgements sent to the producer.
+            dead_letter (Optional[Dict[str, Any]]): Block that the rejected records are written to.
         """
         self.producer = producer
         self.steps = steps
-        self.error_handling = error_handling if error_handling else ErrorHandling.IGNORE
+        self.error_handling = ErrorHandling(error_handling) if error_handling else ErrorHandling.IGNORE
+        self.checkpoint = checkpoint
+        self.checkpoint_store: Optional[CheckpointStore] = None
+        self.acks = acks
+        self.ack_aggregator: Optional[AckAggregator] = None
+        self.dead_letter = dead_letter
+        self.dead_letter_queue: Optional[DeadLetterQueue] = None
         self.initialized = False
         self.root = None
+        # time each in-flight record was produced at, for the end-to-end latency while metrics are exported
+        self.produced_at: Dict[str, float] = {}
+        self.profiler: Optional[Profiler] = None
 
     def init(self, context: Optional[Context] = None):
         # open any connections or setup needed
@@ -67,17 +92,104 @@ class Job:
                 last_step = last_step.append(step)
 
         if self.producer:
+            if self.checkpoint is not None:
+                self.producer.checkpoint = self.create_checkpoint(context)
+
             self.producer.init(context)
+            if self.acks is not None:
+                self.ack_aggregator = AckAggregator(self.producer.ack,
+                                                    max_size=self.acks.get("max_size", 1000),
+                                                    flush_ms=self.acks.get("flush_ms", 1000))
+
+            if self.error_handling == ErrorHandling.DEAD_LETTER:
+                self.dead_letter_queue = self.create_dead_letter_queue(context)
 
         self.initialized = True
 
+    def create_dead_letter_queue(self, context: Optional[Context] = None) -> DeadLetterQueue:
+        """Creates the sink block of the rejected records and registers the queue on every step."""
+        from datayoga_core.dead_letter import DeadLetterQueue
+
+        if self.dead_letter is None:
+            raise ValueError("dead_letter error handling requires a dead_letter block")
+
+        sink = Block.create(self.dead_letter["uses"], self.dead_letter.get("with"))
+        sink.init(context)
+        fallback_file = self.dead_letter.get("fallback_file")
+        if fallback_file and not os.path.isabs(fallback_file) and context and context.properties is not None:
+            fallback_file = os.path.join(context.properties.get("data_path", ""), fallback_file)
+
+        dead_letter_queue = DeadLetterQueue(sink, self.ack,
+                                            batch_size=self.dead_letter.get("batch_size", 100),
+                                            flush_ms=self.dead_letter.get("flush_ms", 1000),
+                                            retry_ms=self.dead_letter.get("retry_ms", 1000),
+                                            max_retries=self.dead_letter.get("max_retries", 5),
+                                            fallback_file=fallback_file)
+        for step in self.steps or []:
+            step.add_reject_callback(dead_letter_queue.add)
+
+        return dead_letter_queue
+
+    def create_checkpoint(self, context: Optional[Context] = None) -> Checkpoint:
+        """Opens the checkpoint store and returns the checkpoint of the producer."""
+        from datayoga_core.checkpoint import (Checkpoint, CheckpointStoreType,
+                                              create_store)
+
+        store_type = CheckpointStoreType(self.checkpoint.get("store", CheckpointStoreType.FILE))
+        file = self.checkpoint.get("file", "checkpoints.db" if store_type == CheckpointStoreType.SQLITE
+                                   else "checkpoints.json")
+        if not os.path.isabs(file) and context is not None and context.properties is not None:
+            file = os.path.join(context.properties.get("data_path", ""), file)
+
+        self.checkpoint_store = create_store(store_type, file)
+        return Checkpoint(self.checkpoint_store, self.checkpoint.get("key", self.producer.get_block_name()))
+
+    def start_profiler(self, output: Optional[str] = None, interval: float = 0.005) -> Profiler:
+        """Starts profiling the steps of the job, until the job shuts down or `stop_profiler` is called.
+
+        Args:
+            output (Optional[str]): File the collapsed stacks are written to, for generating a flamegraph.
+            interval (float): Sampling interval in seconds.
+
+        Returns:
+            Profiler: The profiler.
+        """
+        from datayoga_core.profiler import Profiler
+
+        self.profiler = Profiler(self.steps or [], output, interval)
+        self.profiler.start()
+        return self.profiler
+
+    def stop_profiler(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """Stops profiling and writes the report.
+
+        Returns:
+            Optional[Dict[str, Dict[str, Any]]]: The measurements of each step, None if the job isn't profiled.
+        """
+        if self.profiler is None:
+            return None
+
+        summary = self.profiler.stop()
+        self.profiler = None
+        return summary
+
+    def close_dead_letter_queue(self):
+        if self.dead_letter_queue is not None:
+            self.dead_letter_queue.sink.stop()
+            self.dead_letter_queue = None
+
+    def close_checkpoint_store(self):
+        if self.checkpoint_store is not None:
+            self.checkpoint_store.close()
+            self.checkpoint_store = None
+
     def transform(self, data: List[Dict[str, Any]], deepcopy: bool = True) -> JobResult:
         """Transforms data.
 
         Args:
             data (List[Dict[str, Any]]): Data.
-            deepcopy (bool): If set to True, performs a deepcopy before modifying records;
-                             otherwise, it modifies them in place. This can affect performance.
+            deepcopy (bool): If set to True, copies the records before the first block that modifies them,
+                             so the input is left intact; otherwise, it modifies them in place.
 
         Returns:
             JobResult: Job result.
@@ -85,8 +197,9 @@ class Job:
         if not self.initialized:
             logger.debug("job has not been initialized yet, initializing...")
             self.init()
-        # use marshal. faster than deepcopy
-        transformed_data = marshal.loads(marshal.dumps(data)) if deepcopy else data
+        transformed_data = data
+        # copy on write, blocks that don't modify their input run on the original records
+        copied = not deepcopy
 
         result = JobResult()
         # create an event loop for the duration of the transformation
@@ -94,14 +207,22 @@ class Job:
 
         try:
             for step in self.steps:
+                if step.block is None:
+                    # buffers only group records of the pipeline
+                    continue
+
                 try:
                     if len(transformed_data) == 0:
                         # in case all records have been filtered, stop sending
                         break
+                    if not copied and step.block.MUTATES_INPUT:
+                        transformed_data = utils.copy_records(transformed_data)
+                        copied = True
+
                     processed, filtered, rejected = loop.run_until_complete(step.block.run(transformed_data))
                     result.filtered.extend(filtered)
                     result.rejected.extend(rejected)
-                    transformed_data = [result.payload for result in processed]
+                    transformed_data = get_payloads(processed)
                 except ConnectionError as e:
                     # connection errors are thrown back to the caller to handle
                     raise e
@@ -113,7 +234,7 @@ class Job:
                     return result
 
             # the processed records are those that make it to the end
-            result.processed = [Result(Status.SUCCESS, payload=row) for row in transformed_data]
+            result.processed = SuccessResults.from_payloads(transformed_data)
         finally:
             # close the event loop
             with suppress(NotImplementedError):
@@ -127,8 +248,8 @@ class Job:
 
         Args:
             data (List[Dict[str, Any]]): Data.
-            deepcopy (bool): If set to True, performs a deepcopy before modifying records;
-                             otherwise, it modifies them in place. This can affect performance.
+            deepcopy (bool): If set to True, copies the records before the first block that modifies them,
+                             so the input is left intact; otherwise, it modifies them in place.
 
         Returns:
             JobResult: Job result.
@@ -136,20 +257,29 @@ class Job:
         if not self.initialized:
             logger.debug("job has not been initialized yet, initializing...")
             self.init()
-        # use marshal. faster than deepcopy
-        transformed_data = marshal.loads(marshal.dumps(data)) if deepcopy else data
+        transformed_data = data
+        # copy on write, blocks that don't modify their input run on the original records
+        copied = not deepcopy
 
         result = JobResult()
 
         for step in self.steps:
+            if step.block is None:
+                # buffers only group records of the pipeline
+                continue
+
             try:
                 if len(transformed_data) == 0:
                     # in case all records have been filtered, stop sending
                     break
+                if not copied and step.block.MUTATES_INPUT:
+                    transformed_data = utils.copy_records(transformed_data)
+                    copied = True
+
                 processed, filtered, rejected = await step.block.run(transformed_data)
                 result.filtered.extend(filtered)
                 result.rejected.extend(rejected)
-                transformed_data = [result.payload for result in processed]
+                transformed_data = get_payloads(processed)
             except ConnectionError as e:
                 # connection errors are thrown back to the caller to handle
                 raise e
@@ -161,47 +291,112 @@ class Job:
                 return result
 
         # the processed records are those that make it to the end
-        result.processed = [Result(Status.SUCCESS, payload=row) for row in transformed_data]
+        result.processed = SuccessResults.from_payloads(transformed_data)
 
         return result
 
     async def run(self):
+        from datayoga_core import tracing
+
         async for records in self.producer.produce():
             prometheus.incoming_records.inc(len(records))
+            if prometheus.is_enabled():
+                produced_at = time.monotonic()
+                for record in records:
+                    self.produced_at[record[Block.MSG_ID_FIELD]] = produced_at
 
             logger.debug(f"Retrieved records:\n\t{records}")
-            await self.root.process(records)
+            # the root span of the batch, the steps continue its trace
+            with tracing.start_span("produce", kind=tracing.SpanKind.CONSUMER, attributes={
+                    "datayoga.producer": self.producer.get_block_name(), "datayoga.batch_size": len(records)}):
+                await self.root.process(records)
 
         await self.shutdown()
 
     async def shutdown(self):
+        # flush any buffered records, in order, so buffers don't wait for their flush interval
+        for step in self.steps:
+            await step.drain()
+
         # wait for in-flight records to finish
         await self.root.join()
+        if self.dead_letter_queue is not None:
+            await self.dead_letter_queue.flush()
+
+        if self.ack_aggregator is not None:
+            self.ack_aggregator.flush()
 
         # graceful shutdown
         await self.root.stop()
+        self.stop_profiler()
+        self.close_dead_letter_queue()
+        self.close_checkpoint_store()
+
+    def close(self):
+        """Stops the blocks of the job and closes their connections."""
+        for step in self.steps or []:
+            if step.block:
+                step.block.stop()
+
+        if self.producer:
+            self.producer.stop()
+
+        self.stop_profiler()
+        self.close_dead_letter_queue()
+        self.close_checkpoint_store()
+        self.initialized = False
 
     def handle_results(self, msg_ids: List[str], results: List[Result]):
-        if any(x.status == Status.REJECTED for x in results) and self.error_handling == ErrorHandling.ABORT:
+        if self.error_handling == ErrorHandling.ABORT and any(x.status == Status.REJECTED for x in results):
             logger.critical("Aborting due to rejected record(s)")
             sys.exit(1)
 
-        self.producer.ack(msg_ids)
+        if self.produced_at:
+            # including the filtered and rejected records, even if their acknowledgement is deferred
+            done_at = time.monotonic()
+            for msg_id in msg_ids:
+                produced_at = self.produced_at.pop(msg_id, None)
+                if produced_at is not None:
+                    prometheus.record_latency.observe(done_at - produced_at)
+
+        if self.dead_letter_queue is not None:
+            # the rejected records are acknowledged once they're written to the dead letter block
+            msg_ids = self.dead_letter_queue.defer_acks(msg_ids)
+
+        self.ack(msg_ids)
+
+    def ack(self, msg_ids: List[str]):
+        if not msg_ids:
+            return
+
+        if self.ack_aggregator is not None:
+            self.ack_aggregator.add(msg_ids)
+        else:
+            self.producer.ack(msg_ids)
 
     @staticmethod
     def validate(source: Dict[str, Any], whitelisted_blocks: Optional[List[str]] = None):
-        jsonschema.validate(instance=source, schema=Job.get_json_schema(whitelisted_blocks))
+        utils.validate(source, Job.get_json_schema_validator(
+            tuple(whitelisted_blocks) if whitelisted_blocks is not None else None))
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def get_json_schema_validator(whitelisted_blocks: Optional[Tuple[str, ...]] = None) -> Validator:
+        """Returns the validator of the job json schema, compiled once per set of whitelisted blocks."""
+        return utils.get_validator(
+            Job.get_json_schema(list(whitelisted_blocks) if whitelisted_blocks is not None else None))
 
     @staticmethod
     def compile(source: Dict[str, Any], whitelisted_blocks: Optional[List[str]] = None) -> Job:
         Job.validate(source, whitelisted_blocks=whitelisted_blocks)
-        steps: List[Step] = []
         # parse the steps
+        steps: List[Step] = []
         for step_definition in source.get("steps"):
-            block_type = step_definition.get("uses")
-            block: Block = Block.create(block_type, step_definition.get("with"))
-            step: Step = Step(step_definition.get("id", block_type), block)
-            steps.append(step)
+            if step_definition.get("buffer") is not None:
+                # buffer the records before the step
+                steps.append(Job.create_buffer(step_definition))
+
+            steps.append(Job.create_step(step_definition))
 
         # parse the input
         input_block = None
@@ -209,7 +404,53 @@ class Job:
             input_definition = source.get("input")
             input_block = Block.create(input_definition.get("uses"), input_definition.get("with"))
 
-        return Job(steps, input_block, source.get("error_handling"))
+        return Job(steps, input_block, source.get("error_handling"), source.get("checkpoint"), source.get("acks"),
+                   source.get("dead_letter"))
+
+    @staticmethod
+    def create_step(step_definition: Dict[str, Any]) -> Step:
+        """Creates a step and its block from the step definition of the job."""
+        block_type = step_definition.get("uses")
+        block: Block = Block.create(block_type, step_definition.get("with"))
+        step_id = step_definition.get("id", block_type)
+        concurrency = step_definition.get("concurrency", 1)
+
+        shard_by = step_definition.get("shard_by")
+        shard_by_expression = expression.compile(
+            shard_by["language"], shard_by["expression"]) if shard_by is not None else None
+
+        rate_limit = step_definition.get("rate_limit")
+        rate_limiter = None
+        if rate_limit is not None:
+            key = rate_limit.get("key")
+            rate_limiter = RateLimiter(
+                records_per_second=rate_limit.get("records_per_second"),
+                batches_per_second=rate_limit.get("batches_per_second"),
+                key=expression.compile(key["language"], key["expression"]) if key is not None else None,
+                records_per_second_per_key=rate_limit.get("records_per_second_per_key"))
+
+        if Executor(step_definition.get("executor", Executor.ASYNC)) == Executor.PROCESS:
+            # CPU-bound blocks run in worker processes, one batch in flight per worker
+            from datayoga_core.process_pool import ProcessPoolBlock
+
+            workers = step_definition.get("workers", os.cpu_count() or 1)
+            block = ProcessPoolBlock(block, workers)
+            concurrency = step_definition.get("concurrency", workers)
+
+        return Step(step_id, block, concurrency=concurrency, shard_by=shard_by_expression, rate_limiter=rate_limiter)
+
+    @staticmethod
+    def create_buffer(step_definition: Dict[str, Any]) -> StepBuffer:
+        """Creates a buffer in front of a step from the `buffer` property of the step definition."""
+        buffer = step_definition["buffer"]
+        return StepBuffer(
+            f"{step_definition.get('id', step_definition.get('uses'))}_buffer",
+            min_buffer_size=buffer.get("min_size", 1000),
+            max_buffer_size=buffer.get("max_size", buffer.get("min_size", 1000)),
+            max_buffer_bytes=buffer.get("max_bytes"),
+            flush_ms=buffer.get("flush_ms", 1000),
+            adaptive=buffer.get("adaptive", False),
+            target_latency_ms=buffer.get("target_latency_ms"))
 
     @staticmethod
     def get_json_schema(whitelisted_blocks: Optional[List[str]] = None) -> Dict[str, Any]:
@@ -230,7 +471,7 @@ class Job:
             if not (whitelisted_blocks is not None and block_type not in whitelisted_blocks):
                 block_types.append(block_type)
                 # load schema file
-                schema = utils.read_json(f"{schema_path}")
+                schema = utils.read_json_schema(f"{schema_path}")
                 # append to the array of allOf for the full schema
                 # we use allOf for better error reporting
                 block_schemas.append({
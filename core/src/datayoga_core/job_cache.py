@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import orjson
+from datayoga_core.context import Context
+from datayoga_core.job import Job
+
+logger = logging.getLogger("dy")
+
+
+class JobCache:
+    """Cache of compiled and initialized jobs, keyed by a hash of their settings.
+
+    Saves validating, compiling and initializing a job (including opening its connections) when
+    the same job is used repeatedly. A job instance is used by one caller at a time, concurrent callers
+    of the same settings get instances of their own, which are kept idle in the cache once released.
+    The least recently used settings are dropped once the cache is full, their idle jobs are closed
+    right away and the jobs in use are closed when they're released. Jobs released while `max_idle_per_key`
+    jobs of the same settings are idle are closed, as are jobs that have been idle for longer than `idle_ttl`.
+
+    Attributes:
+        max_size (int): Maximum number of cached job settings.
+        max_idle_per_key (int): Maximum number of idle jobs kept per settings.
+        idle_ttl (Optional[float]): Seconds after which an idle job is closed rather than reused, None to keep it.
+    """
+
+    def __init__(self, max_size: int = 32, max_idle_per_key: int = 4, idle_ttl: Optional[float] = 300):
+        self.max_size = max_size
+        self.max_idle_per_key = max_idle_per_key
+        self.idle_ttl = idle_ttl
+        # idle jobs and the time they were released, by the key of their settings, oldest first.
+        # the settings of jobs in use are kept with no idle jobs
+        self.jobs: Dict[str, List[Tuple[Job, float]]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_key(
+        job_settings: Dict[str, Any],
+        context: Optional[Context] = None,
+        whitelisted_blocks: Optional[List[str]] = None
+    ) -> str:
+        """Returns the hash of the job settings, the context properties and the whitelisted blocks."""
+        return hashlib.sha256(orjson.dumps(
+            [job_settings, context.properties if context else None, whitelisted_blocks],
+            option=orjson.OPT_SORT_KEYS,
+            default=str
+        )).hexdigest()
+
+    @contextmanager
+    def acquire(
+        self,
+        job_settings: Dict[str, Any],
+        context: Optional[Context] = None,
+        whitelisted_blocks: Optional[List[str]] = None
+    ) -> Iterator[Job]:
+        """Returns a cached job of the settings for use in a `with` statement, compiling one if none is idle.
+
+        The job is used only by the caller until the `with` statement exits. If it raises a `ConnectionError`,
+        the cached jobs of the settings are closed and dropped, so that the next use opens new connections.
+
+        Args:
+            job_settings (Dict[str, Any]): Job settings.
+            context (Optional[Context]): Context used to initialize the job. Defaults to None.
+            whitelisted_blocks (Optional[List[str]]): Whitelisted blocks. Defaults to None.
+
+        Returns:
+            Iterator[Job]: Compiled and initialized job.
+        """
+        key = self.get_key(job_settings, context, whitelisted_blocks)
+        job = self.pop_idle(key)
+        if job is None:
+            # compile outside of the lock, initializing the job may take a while to connect
+            logger.debug("Compiling job for the cache")
+            job = Job.compile(job_settings, whitelisted_blocks)
+            job.init(context)
+            self.add(key)
+
+        try:
+            yield job
+        except ConnectionError:
+            logger.debug("Dropping the cached job after a connection error")
+            job.close()
+            self.drop(key)
+            raise
+        except BaseException:
+            self.release(key, job)
+            raise
+        else:
+            self.release(key, job)
+
+    def pop_idle(self, key: str) -> Optional[Job]:
+        expired_jobs: List[Job] = []
+        job = None
+        with self.lock:
+            idle_jobs = self.jobs.get(key)
+            if idle_jobs is not None:
+                self.jobs.move_to_end(key)
+                if self.idle_ttl is not None:
+                    # their connections may have been closed by the server meanwhile
+                    expired_before = time.monotonic() - self.idle_ttl
+                    while idle_jobs and idle_jobs[0][1] < expired_before:
+                        expired_jobs.append(idle_jobs.pop(0)[0])
+
+                if idle_jobs:
+                    job = idle_jobs.pop()[0]
+
+        close_jobs(expired_jobs)
+        return job
+
+    def add(self, key: str):
+        evicted_jobs: List[Job] = []
+        with self.lock:
+            self.jobs.setdefault(key, [])
+            self.jobs.move_to_end(key)
+            while len(self.jobs) > self.max_size:
+                _, idle_jobs = self.jobs.popitem(last=False)
+                evicted_jobs.extend(job for job, _ in idle_jobs)
+
+        close_jobs(evicted_jobs)
+
+    def release(self, key: str, job: Job):
+        with self.lock:
+            idle_jobs = self.jobs.get(key)
+            if idle_jobs is not None and len(idle_jobs) < self.max_idle_per_key:
+                idle_jobs.append((job, time.monotonic()))
+                return
+
+        # the settings were evicted or dropped while the job was in use, or enough jobs are idle
+        job.close()
+
+    def drop(self, key: str):
+        with self.lock:
+            idle_jobs = self.jobs.pop(key, [])
+
+        close_jobs([job for job, _ in idle_jobs])
+
+    def close(self):
+        """Closes all of the idle cached jobs and clears the cache. Jobs in use are closed when they're released."""
+        with self.lock:
+            idle_jobs = [job for jobs in self.jobs.values() for job, _ in jobs]
+            self.jobs.clear()
+
+        close_jobs(idle_jobs)
+
+
+def close_jobs(jobs: List[Job]):
+    for job in jobs:
+        job.close()
@@ -0,0 +1,123 @@
+import asyncio
+import importlib
+import logging
+import marshal
+import multiprocessing
+import multiprocessing.util
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from datayoga_core.block import Block
+from datayoga_core.context import Context
+from datayoga_core.result import (BlockResult, Result, Status, SuccessResults,
+                                  get_payloads)
+
+logger = logging.getLogger("dy")
+
+# the block instance and event loop of the current worker process
+_worker_block: Optional[Block] = None
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def dumps(obj: Any) -> Tuple[bool, bytes]:
+    """Serializes an object sent between processes.
+
+    Uses marshal, which is faster and more compact than pickle for plain records,
+    and falls back to pickle for values marshal does not support (e.g. datetime or Decimal).
+
+    Returns:
+        Tuple[bool, bytes]: Whether marshal was used and the serialized object.
+    """
+    try:
+        return True, marshal.dumps(obj)
+    except ValueError:
+        return False, pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def loads(serialized: Tuple[bool, bytes]) -> Any:
+    """Deserializes an object serialized with `dumps`."""
+    is_marshal, data = serialized
+    return marshal.loads(data) if is_marshal else pickle.loads(data)
+
+
+def _init_worker(module_name: str, properties: Dict[str, Any], context: Optional[Context]):
+    global _worker_block, _worker_loop
+
+    _worker_loop = asyncio.new_event_loop()
+    # run when the worker process exits, which skips the atexit handlers
+    multiprocessing.util.Finalize(None, _close_worker, exitpriority=10)
+    _worker_block = getattr(importlib.import_module(module_name), "Block")(properties)
+    _worker_block.init(context)
+
+
+def _close_worker():
+    global _worker_block, _worker_loop
+
+    try:
+        if _worker_block is not None:
+            _worker_block.stop()
+    finally:
+        _worker_block = None
+        _worker_loop.close()
+        _worker_loop = None
+
+
+def _run_batch(serialized_data: Tuple[bool, bytes]) -> Tuple[bool, bytes]:
+    processed, filtered, rejected = _worker_loop.run_until_complete(_worker_block.run(loads(serialized_data)))
+    return dumps((
+        get_payloads(processed),
+        [result.payload for result in filtered],
+        [(result.payload, result.message) for result in rejected]
+    ))
+
+
+class ProcessPoolBlock:
+    """Runs a block in a pool of worker processes.
+
+    Each worker process creates and initializes its own instance of the block,
+    batches are serialized to the workers and the results are sent back.
+
+    Attributes:
+        block (Block): The block to run, used as a template for the workers.
+        workers (Optional[int]): Number of worker processes. Defaults to the number of CPUs.
+    """
+    # the workers get a serialized copy of the records
+    MUTATES_INPUT = False
+
+    def __init__(self, block: Block, workers: Optional[int] = None):
+        self.block = block
+        self.workers = workers
+        self.properties = block.properties
+        self.pool: Optional[ProcessPoolExecutor] = None
+
+    def init(self, context: Optional[Context] = None):
+        logger.debug(f"Starting process pool for {self.block.get_block_name()}")
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            # forking a process that runs threads (e.g. the default executor of the event loop) may deadlock
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.block.__module__, self.block.properties, context)
+        )
+
+    async def run(self, data: List[Dict[str, Any]]) -> BlockResult:
+        if self.pool is None:
+            self.init()
+
+        processed, filtered, rejected = loads(
+            await asyncio.get_running_loop().run_in_executor(self.pool, _run_batch, dumps(data)))
+
+        return BlockResult(
+            processed=SuccessResults.from_payloads(processed),
+            filtered=[Result(Status.FILTERED, payload=row) for row in filtered],
+            rejected=[Result(Status.REJECTED, payload=row, message=message) for row, message in rejected]
+        )
+
+    def get_block_name(self) -> str:
+        return self.block.get_block_name()
+
+    def stop(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
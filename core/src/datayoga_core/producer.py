@@ -1,8 +1,13 @@
+from __future__ import annotations
+
 from abc import abstractmethod
-from typing import Any, AsyncGenerator, Dict, List
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Dict, List, Optional
 
 from .block import Block
 
+if TYPE_CHECKING:
+    from .checkpoint import Checkpoint
+
 
 class Message:
     def __init__(self, msg_id: str, value: Dict[str, Any]):
@@ -11,6 +16,8 @@ class Message:
 
 
 class Producer(Block):
+    # set by the job when checkpoints are enabled, before the producer is initialized
+    checkpoint: Optional[Checkpoint] = None
 
     @abstractmethod
     async def produce(self) -> AsyncGenerator[List[Message], None]:
@@ -0,0 +1,204 @@
+import logging
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from types import CodeType, FrameType
+from typing import Any, Dict, List, Optional, Tuple
+
+from datayoga_core.block import Block
+from datayoga_core.context import Context
+from datayoga_core.result import BlockResult
+from datayoga_core.step import Step
+
+logger = logging.getLogger("dy")
+
+# top level packages whose frames are considered I/O, e.g. database drivers and network clients
+IO_PACKAGES = frozenset((
+    "aiohttp", "azure", "cassandra", "http", "oracledb", "psycopg2", "pymssql", "pymysql", "redis", "requests",
+    "select", "selectors", "socket", "sqlalchemy", "ssl", "urllib3"))
+
+
+@dataclass
+class StepProfile:
+    """Measurements of a step.
+
+    Attributes:
+        batches (int): Number of batches run by the block.
+        records (int): Number of records run by the block.
+        wall_time (float): Wall time in seconds of running the batches.
+        cpu_time (float): CPU time in seconds of the event loop thread while running the batches,
+            which includes other steps running at the same time.
+        allocated_blocks (int): Net number of memory blocks allocated while running the batches.
+        samples (Dict[str, int]): Number of stack samples in the block by category: expression, results, io or code.
+    """
+    batches: int = 0
+    records: int = 0
+    wall_time: float = 0
+    cpu_time: float = 0
+    allocated_blocks: int = 0
+    samples: Dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+
+class ProfiledBlock:
+    """Measures the wall time, CPU time and allocations of every batch run by a block.
+
+    Attributes:
+        block (Block): The profiled block.
+        profile (StepProfile): Measurements of the step.
+    """
+
+    def __init__(self, block: Block, profile: StepProfile):
+        self.block = block
+        self.profile = profile
+        self.properties = block.properties
+        self.MUTATES_INPUT = block.MUTATES_INPUT
+
+    def init(self, context: Optional[Context] = None):
+        self.block.init(context)
+
+    async def run(self, data: List[Dict[str, Any]]) -> BlockResult:
+        start_allocated_blocks = sys.getallocatedblocks()
+        start_cpu_time = time.thread_time()
+        start_wall_time = time.perf_counter()
+        try:
+            return await self.block.run(data)
+        finally:
+            self.profile.wall_time += time.perf_counter() - start_wall_time
+            self.profile.cpu_time += time.thread_time() - start_cpu_time
+            self.profile.allocated_blocks += sys.getallocatedblocks() - start_allocated_blocks
+            self.profile.batches += 1
+            self.profile.records += len(data)
+
+    def get_block_name(self) -> str:
+        return self.block.get_block_name()
+
+    def stop(self):
+        self.block.stop()
+
+
+class Profiler:
+    """Sampling profiler of a job.
+
+    A background thread samples the stacks of all threads every `interval` seconds. The samples are
+    written as collapsed stacks, the input format of flamegraph.pl, speedscope and similar tools, and
+    the samples in the blocks are counted per step by category: expression evaluation, result wrapping,
+    I/O in database drivers and network clients, or the code of the block itself.
+
+    Attributes:
+        steps (List[Step]): Steps of the job, their blocks are wrapped by a `ProfiledBlock` while profiling.
+        output (Optional[str]): File the collapsed stacks are written to when the profiler stops.
+        interval (float): Sampling interval in seconds.
+    """
+
+    def __init__(self, steps: List[Step], output: Optional[str] = None, interval: float = 0.005):
+        self.steps = [step for step in steps if step.block is not None]
+        self.output = output
+        self.interval = interval
+        self.profiles: Dict[str, StepProfile] = {step.id: StepProfile() for step in self.steps}
+        # block module to the steps that use it, to attribute the samples
+        self.block_steps: Dict[str, List[str]] = defaultdict(list)
+        self.stacks: Counter = Counter()
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self):
+        for step in self.steps:
+            block = getattr(step.block, "block", step.block)
+            self.block_steps[block.__module__].append(step.id)
+            step.block = ProfiledBlock(step.block, self.profiles[step.id])
+
+        self.thread = threading.Thread(target=self.sample, name="dy-profiler", daemon=True)
+        self.thread.start()
+        logger.info(f"Profiling every {self.interval * 1000:g}ms")
+
+    def sample(self):
+        own_thread_id = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_thread_id:
+                    self.add_sample(thread_names.get(thread_id, f"{thread_id}"), frame)
+
+    def add_sample(self, thread_name: str, frame: Optional[FrameType]):
+        frames: List[Tuple[str, CodeType]] = []
+        while frame is not None:
+            frames.append((frame.f_globals.get("__name__", ""), frame.f_code))
+            frame = frame.f_back
+
+        frames.reverse()
+        self.stacks[";".join([thread_name, *(get_frame_name(module, code) for module, code in frames)])] += 1
+
+        modules = [module for module, _ in frames]
+        block_module = next((module for module in reversed(modules) if module in self.block_steps), None)
+        if block_module is not None:
+            category = get_category(modules)
+            for step_id in self.block_steps[block_module]:
+                self.profiles[step_id].samples[category] += 1
+
+    def stop(self) -> Dict[str, Dict[str, Any]]:
+        """Stops profiling, writes the collapsed stacks and logs the measurements of the steps.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: The measurements of each step, by step ID.
+        """
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        for step in self.steps:
+            if isinstance(step.block, ProfiledBlock):
+                step.block = step.block.block
+
+        if self.output is not None:
+            self.write_stacks(self.output)
+            logger.info(f"Profile written to {self.output}")
+
+        summary = self.get_summary()
+        for step_id, profile in summary.items():
+            logger.info(f"{step_id}: {profile}")
+
+        return summary
+
+    def write_stacks(self, file: str):
+        with open(file, "w", encoding="utf8") as write_obj:
+            for stack, count in sorted(self.stacks.items()):
+                write_obj.write(f"{stack} {count}\n")
+
+    def get_summary(self) -> Dict[str, Dict[str, Any]]:
+        summary = {}
+        for step_id, profile in self.profiles.items():
+            summary[step_id] = {
+                "batches": profile.batches,
+                "records": profile.records,
+                "wall_time": round(profile.wall_time, 6),
+                "cpu_time": round(profile.cpu_time, 6),
+                "allocated_blocks_per_batch": profile.allocated_blocks // profile.batches if profile.batches else 0,
+                # sampled time spent in each category
+                "sampled_time": {category: round(count * self.interval, 6)
+                                 for category, count in sorted(profile.samples.items())}
+            }
+
+        return summary
+
+
+@lru_cache(maxsize=None)
+def get_frame_name(module: str, code: CodeType) -> str:
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def get_category(modules: List[str]) -> str:
+    """Returns the category of a sampled stack, by the modules of its frames from the outermost."""
+    if "datayoga_core.expression" in modules:
+        return "expression"
+
+    if "datayoga_core.result" in modules:
+        return "results"
+
+    if any(module.partition(".")[0] in IO_PACKAGES for module in modules):
+        return "io"
+
+    return "code"
@@ -1,12 +1,32 @@
-from prometheus_client import Counter, start_http_server
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
 
 incoming_records = Counter("incoming_records", "Number of incoming records")
 processed_entries = Counter("processed_records", "Number of processed records", ("step",))
 rejected_records = Counter("rejected_records", "Number of rejected records", ("step",))
 filtered_records = Counter("filtered_records", "Number of filtered records", ("step",))
+buffer_batch_size = Gauge("buffer_batch_size", "Current batch size of an adaptive buffer", ("step",))
+step_duration = Histogram("step_duration_seconds", "Duration of running the block of a step on a batch", ("step",))
+step_batch_size = Histogram("step_batch_size", "Number of records in the batches run by a step", ("step",),
+                            buckets=(1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf")))
+step_queue_depth = Gauge("step_queue_depth", "Number of batches waiting for a worker of a step", ("step",))
+step_active_records = Gauge("step_active_records", "Number of records in flight in a step and after it", ("step",))
+record_latency = Histogram("record_latency_seconds",
+                           "Time from producing a record until all of the steps are done with it",
+                           buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, float("inf")))
+producer_lag = Gauge("producer_lag", "Number of records of the source that haven't been acknowledged yet",
+                     ("producer", "partition"))
+
+# set by `start`, metrics that are costly to collect are only collected while they're exported
+_started = False
 
 
 def start(port: int):
     """Starts the prometheus metrics exporter on selected port."""
+    global _started
 
     start_http_server(port)
+    _started = True
+
+
+def is_enabled() -> bool:
+    return _started
@@ -0,0 +1,105 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from datayoga_core.expression import Expression
+
+
+class TokenBucket:
+    """Token bucket that refills at a fixed rate up to its capacity.
+
+    Tokens are reserved ahead of time: a reservation may take the bucket below zero,
+    and the caller waits until the debt is refilled. This allows requests larger than the capacity
+    and keeps concurrent callers in the order they reserved.
+
+    Attributes:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum number of tokens. Defaults to one second worth of tokens.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, tokens: float) -> float:
+        """Reserves tokens from the bucket.
+
+        Args:
+            tokens (float): Number of tokens to reserve.
+
+        Returns:
+            float: Number of seconds to wait before the reserved tokens are available.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= tokens
+
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateLimiter:
+    """Limits the number of records and batches processed per second.
+
+    Attributes:
+        records_per_second (Optional[float]): Maximum number of records per second.
+        batches_per_second (Optional[float]): Maximum number of batches per second.
+        key (Optional[Expression]): Expression of a key to limit separately.
+        records_per_second_per_key (Optional[float]): Maximum number of records per second for each key.
+        max_keys (int): Maximum number of keys to track. The least recently used keys are dropped.
+    """
+
+    def __init__(
+        self,
+        records_per_second: Optional[float] = None,
+        batches_per_second: Optional[float] = None,
+        key: Optional[Expression] = None,
+        records_per_second_per_key: Optional[float] = None,
+        max_keys: int = 10000
+    ):
+        self.records = TokenBucket(records_per_second) if records_per_second else None
+        self.batches = TokenBucket(batches_per_second) if batches_per_second else None
+        self.key = key
+        self.records_per_second_per_key = records_per_second_per_key
+        self.max_keys = max_keys
+        self.key_buckets: Dict[Any, TokenBucket] = OrderedDict()
+
+    async def acquire(self, records: List[Dict[str, Any]]):
+        """Waits until the batch of records can be processed within the limits.
+
+        Args:
+            records (List[Dict[str, Any]]): Batch of records.
+        """
+        delays = [0.0]
+        if self.records:
+            delays.append(self.records.reserve(len(records)))
+
+        if self.batches:
+            delays.append(self.batches.reserve(1))
+
+        if self.key is not None and self.records_per_second_per_key:
+            key_counts: Dict[Any, int] = {}
+            for key in self.key.search_bulk(records):
+                key = f"{key}"
+                key_counts[key] = key_counts.get(key, 0) + 1
+
+            for key, count in key_counts.items():
+                delays.append(self.get_key_bucket(key).reserve(count))
+
+        delay = max(delays)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def get_key_bucket(self, key: str) -> TokenBucket:
+        bucket = self.key_buckets.get(key)
+        if bucket is None:
+            bucket = self.key_buckets[key] = TokenBucket(self.records_per_second_per_key)
+            if len(self.key_buckets) > self.max_keys:
+                self.key_buckets.popitem(last=False)
+        else:
+            self.key_buckets.move_to_end(key)
+
+        return bucket
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
+import sys
 from dataclasses import dataclass, field
 from enum import Enum, unique
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
 
 @unique
@@ -12,13 +13,31 @@ class Status(str, Enum):
     FILTERED = "FILTERED"
 
 
-@dataclass
+# slots make the result created for every record smaller and faster to create, dataclasses support them from 3.10
+@dataclass(**({"slots": True} if sys.version_info >= (3, 10) else {}))
 class Result:
     status: Status
     payload: Optional[Dict[str, Any]] = None
     message: Optional[str] = None
 
 
+class SuccessResults(list):
+    """Successful results of a batch.
+
+    A list of `Result` objects, which can be created directly from the successful records.
+    """
+
+    @classmethod
+    def from_payloads(cls, payloads: Iterable[Optional[Dict[str, Any]]]) -> SuccessResults:
+        """Returns the successful results of the records."""
+        return cls(Result(Status.SUCCESS, payload) for payload in payloads)
+
+
+def get_payloads(results: Iterable[Result]) -> List[Dict[str, Any]]:
+    """Returns the payloads of the results."""
+    return [result.payload for result in results]
+
+
 @dataclass
 class BlockResult:
     processed: List[Result] = field(default_factory=list)
@@ -2,36 +2,68 @@ from __future__ import annotations
 
 import asyncio
 import logging
+import time
 from asyncio import Task
+from enum import Enum, unique
 from typing import Any, Callable, Dict, List, Optional
 
-from datayoga_core import prometheus
+import orjson
+from datayoga_core import prometheus, tracing
 from datayoga_core.block import Block
 from datayoga_core.context import Context
-from datayoga_core.result import Result, Status
+from datayoga_core.expression import Expression
+from datayoga_core.rate_limit import RateLimiter
+from datayoga_core.result import Result, Status, get_payloads
 
 logger = logging.getLogger("dy")
 
 
+@unique
+class Executor(str, Enum):
+    ASYNC = "async"
+    PROCESS = "process"
+
+
 class Step:
-    def __init__(self, step_id: str, block: Optional[Block], concurrency=1):
+    def __init__(self, step_id: str, block: Optional[Block], concurrency=1, shard_by: Optional[Expression] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
         self.id = step_id
         self.block = block
         self.next_step = None
         self.active_entries = set()
+        # set while there are no active entries, created in the event loop of the step
+        self.idle: Optional[asyncio.Event] = None
         self.concurrency = concurrency
+        self.shard_by = shard_by
+        self.rate_limiter = rate_limiter
         self.workers: List[Optional[Task]] = [None]*self.concurrency
         self.done_callback = None
+        self.run_callbacks: List[Callable[[int, float], None]] = []
+        self.reject_callbacks: List[Callable[[str, List[Result]], None]] = []
         self.initialized = False
+        # metrics of the step, labeled once rather than on every batch
+        self.duration_metric = prometheus.step_duration.labels(step=step_id)
+        self.batch_size_metric = prometheus.step_batch_size.labels(step=step_id)
+        self.queue_depth_metric = prometheus.step_queue_depth.labels(step=step_id)
+        self.active_records_metric = prometheus.step_active_records.labels(step=step_id)
 
     def init(self, context: Optional[Context] = None):
         # initialize the block
-        self.block.init(context)
+        if self.block:
+            self.block.init(context)
 
     async def start_pool(self):
         # start pool of workers for parallelization
         logger.debug("starting pool")
-        self.queue = asyncio.Queue(maxsize=1)
+        self.idle = asyncio.Event()
+        self.idle.set()
+        if self.shard_by is not None:
+            # each worker has its own queue so that records of the same key are processed in order
+            self.queues = [asyncio.Queue(maxsize=1) for _ in range(self.concurrency)]
+        else:
+            self.queues = [asyncio.Queue(maxsize=1)] * self.concurrency
+
+        self.queue = self.queues[0]
         for worker_id in range(self.concurrency):
             worker = self.workers[worker_id]
             if worker is None or not worker.done():
@@ -42,6 +74,20 @@ class Step:
     def add_done_callback(self, callback: Callable[[List[str], List[Result]], None]):
         self.done_callback = callback
 
+    def add_run_callback(self, callback: Callable[[int, float], None]):
+        """Adds a callback called with the batch size and the duration in seconds after each run of the block."""
+        self.run_callbacks.append(callback)
+
+    def add_reject_callback(self, callback: Callable[[str, List[Result]], None]):
+        """Adds a callback called with the step ID and the rejected results, before they're acknowledged."""
+        self.reject_callbacks.append(callback)
+
+    def reject(self, rejected_entries: List[Result]):
+        for callback in self.reject_callbacks:
+            callback(self.id, rejected_entries)
+
+        self.done([row.payload[Block.MSG_ID_FIELD] for row in rejected_entries], rejected_entries)
+
     def __or__(self, other: Step):
         return self.append(other)
 
@@ -54,65 +100,140 @@ class Step:
         if not self.initialized:
             await self.start_pool()
             self.initialized = True
+
+        shards = None
+        if self.shard_by is not None and self.concurrency > 1:
+            # split before the records become active, so that a failing key doesn't leave them active forever
+            try:
+                shards = self.split_by_shard(messages)
+            except Exception as e:
+                logger.exception(e)
+                self.reject([Result(Status.REJECTED, payload=x, message=f"Error in step {self.id}: {repr(e)}")
+                             for x in messages])
+                return
+
         self.active_entries.update([x[Block.MSG_ID_FIELD] for x in messages])
-        await self.queue.put(messages)
+        self.active_records_metric.set(len(self.active_entries))
+        if self.active_entries:
+            self.idle.clear()
+
+        # the batch is processed by a worker task, which continues the trace of the current task
+        trace_context = tracing.get_context()
+        if shards is not None:
+            # concurrently, so that a busy worker doesn't hold back the shards of the other workers
+            await asyncio.gather(*[self.queues[worker_id].put((shard, trace_context))
+                                   for worker_id, shard in shards.items()])
+        else:
+            await self.queue.put((messages, trace_context))
+
+        self.queue_depth_metric.set(self.get_queue_depth())
+
+    def get_queue_depth(self) -> int:
+        """Returns the number of batches waiting for a worker."""
+        if self.shard_by is not None:
+            return sum(queue.qsize() for queue in self.queues)
+
+        return self.queue.qsize()
+
+    def split_by_shard(self, messages: List[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+        """Splits a batch into sub-batches per worker by the sharding key, keeping the order of the records."""
+        shards: Dict[int, List[Dict[str, Any]]] = {}
+        for message, key in zip(messages, self.shard_by.search_bulk(messages)):
+            shards.setdefault(self.get_shard(key), []).append(message)
+
+        return shards
+
+    def get_shard(self, key: Any) -> int:
+        try:
+            return hash(key) % self.concurrency
+        except TypeError:
+            # unhashable keys such as lists or objects
+            return hash(orjson.dumps(key, option=orjson.OPT_SORT_KEYS)) % self.concurrency
 
     async def run(self, worker_id: int):
+        queue = self.queues[worker_id]
         while True:
-            entry = await self.queue.get()
+            entry, trace_context = await queue.get()
+            self.queue_depth_metric.set(self.get_queue_depth())
             logger.debug(f"{self.id}-{worker_id} processing {[i[Block.MSG_ID_FIELD] for i in entry]}")
-            try:
-                processed_entries, filtered_entries, rejected_entries = await self.block.run(entry)
-
-                prometheus.processed_entries.labels(step=self.id).inc(len(processed_entries))
-                prometheus.filtered_records.labels(step=self.id).inc(len(filtered_entries))
-                prometheus.rejected_records.labels(step=self.id).inc(len(rejected_entries))
-
-                # handle filtered. anything not processed or rejected
-                logger.debug(
-                    f"filtered entries: {filtered_entries}, processed entries: {processed_entries}, rejected entries: {rejected_entries}")
-                if filtered_entries:
-                    # ack the filtered entries
-                    self.done([row.payload[Block.MSG_ID_FIELD] for row in filtered_entries],
-                              [Result(Status.FILTERED)] * len(filtered_entries))
-
-                # handle rejected
-                if rejected_entries:
-                    # ack the rejected entries
-                    self.done([row.payload[Block.MSG_ID_FIELD] for row in rejected_entries], rejected_entries)
-
-                if processed_entries:
-                    # check if we have a next step
-                    if self.next_step:
-                        # process downstream
-                        await self.next_step.process([result.payload for result in processed_entries])
-                    else:
-                        # we are a last channel, propagate the ack upstream
-                        # TODO: verify that all entries have a msg id otherwise raise consistency error
-                        self.done([row.payload[Block.MSG_ID_FIELD] for row in processed_entries], processed_entries)
-
-            except Exception as e:
-                # we caught an exception. the entire batch is considered rejected
-                logger.exception(e)
-                # verify that all messages still have a msg_id property
-                # if next(filter(lambda x: not Block.MSG_ID_FIELD in x,entry),None) is not None
-                self.done([x[Block.MSG_ID_FIELD] for x in entry], [
-                          Result(Status.REJECTED, f"Error in step {self.id}: {repr(e)}")] * len(entry))
-            finally:
-                self.queue.task_done()
+            # continue the trace of the batch, if it's traced
+            with tracing.start_span(self.id, attributes={"datayoga.step": self.id, "datayoga.batch_size": len(entry)},
+                                    context=trace_context) as span:
+                try:
+                    if self.rate_limiter:
+                        # wait for the rate limit. meanwhile the queue is full and applies backpressure upstream
+                        await self.rate_limiter.acquire(entry)
+
+                    start = time.perf_counter()
+                    processed_entries, filtered_entries, rejected_entries = await self.block.run(entry)
+                    duration = time.perf_counter() - start
+                    self.duration_metric.observe(duration)
+                    self.batch_size_metric.observe(len(entry))
+                    for callback in self.run_callbacks:
+                        callback(len(entry), duration)
+
+                    prometheus.processed_entries.labels(step=self.id).inc(len(processed_entries))
+                    prometheus.filtered_records.labels(step=self.id).inc(len(filtered_entries))
+                    prometheus.rejected_records.labels(step=self.id).inc(len(rejected_entries))
+                    if span is not None:
+                        span.set_attribute("datayoga.rejected", len(rejected_entries))
+
+                    # handle filtered. anything not processed or rejected
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(
+                            f"filtered entries: {filtered_entries}, processed entries: {processed_entries}, rejected entries: {rejected_entries}")
+                    if filtered_entries:
+                        # ack the filtered entries
+                        self.done([row.payload[Block.MSG_ID_FIELD] for row in filtered_entries],
+                                  [Result(Status.FILTERED)] * len(filtered_entries))
+
+                    # handle rejected
+                    if rejected_entries:
+                        # ack the rejected entries
+                        self.reject(rejected_entries)
+
+                    if processed_entries:
+                        processed_payloads = get_payloads(processed_entries)
+                        # check if we have a next step
+                        if self.next_step:
+                            # process downstream
+                            await self.next_step.process(processed_payloads)
+                        else:
+                            # we are a last channel, propagate the ack upstream
+                            # TODO: verify that all entries have a msg id otherwise raise consistency error
+                            self.done([row[Block.MSG_ID_FIELD] for row in processed_payloads], processed_entries)
+
+                except Exception as e:
+                    # we caught an exception. the entire batch is considered rejected
+                    logger.exception(e)
+                    # verify that all messages still have a msg_id property
+                    # if next(filter(lambda x: not Block.MSG_ID_FIELD in x,entry),None) is not None
+                    self.reject([Result(Status.REJECTED, payload=x, message=f"Error in step {self.id}: {repr(e)}")
+                                 for x in entry])
+                    tracing.set_error(span, repr(e))
+                finally:
+                    queue.task_done()
             logger.debug(f"{self.id}-{worker_id} done processing {entry}")
 
     def done(self, msg_ids: List[str], results: List[Result]):
         logger.debug(f"{self.id} acking {msg_ids}")
         self.active_entries.difference_update(msg_ids)
+        self.active_records_metric.set(len(self.active_entries))
+        if not self.active_entries and self.idle is not None:
+            self.idle.set()
+
         if self.done_callback is not None:
             self.done_callback(msg_ids, results)
 
     async def join(self):
-        # wait for all active entries to be processed
-        while len(self.active_entries) > 0:
+        # wait for all active entries to be processed, including entries added while waiting
+        while self.idle is not None and self.active_entries:
             logger.debug(f"{self.id} waiting for dangling messages: {self.active_entries}")
-            await asyncio.sleep(0.2)
+            await self.idle.wait()
+
+    async def drain(self):
+        """Sends downstream any records held by the step, used on shutdown. Steps don't hold records by default."""
+        pass
 
     async def stop(self):
         # wait for all tasks to finish
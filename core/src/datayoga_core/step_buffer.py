@@ -1,55 +1,197 @@
 import asyncio
 import logging
+from asyncio import Task
+from typing import Any, Dict, List, Optional
 
+import orjson
+from datayoga_core import prometheus, tracing
 from datayoga_core.step import Step
 
 logger = logging.getLogger("dy")
 
 
+class BatchSizeController:
+    """Tunes the batch size within bounds based on the observed latency of the downstream step.
+
+    With a target latency, the batch size grows while full batches finish within the target and shrinks
+    when they take longer. Without a target, it hill-climbs towards the batch size with the highest records/sec.
+
+    Attributes:
+        min_size (int): Minimum batch size.
+        max_size (int): Maximum batch size.
+        target_latency_ms (Optional[float]): Target duration of processing a batch downstream.
+        size (int): Current batch size.
+    """
+    GROWTH_FACTOR = 1.25
+
+    def __init__(self, min_size: int, max_size: int, target_latency_ms: Optional[float] = None):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.target_latency_ms = target_latency_ms
+        self.size = min_size
+        self.direction = 1
+        self.last_throughput: Optional[float] = None
+
+    def observe(self, batch_size: int, duration: float):
+        """Adjusts the batch size after a batch has been processed downstream.
+
+        Args:
+            batch_size (int): Number of records in the batch.
+            duration (float): Processing time of the batch in seconds.
+        """
+        if self.target_latency_ms is not None:
+            if duration * 1000 > self.target_latency_ms:
+                self.resize(-1)
+            elif batch_size >= self.size:
+                # only grow when the current size has actually been tried
+                self.resize(1)
+        elif batch_size >= self.size:
+            # partial batches (e.g. flushed on timeout) don't tell about the throughput of the current size
+            throughput = batch_size / max(duration, 1e-6)
+            if self.last_throughput is not None and throughput < self.last_throughput:
+                self.direction = -self.direction
+
+            self.last_throughput = throughput
+            self.resize(self.direction)
+
+    def resize(self, direction: int):
+        new_size = self.size * self.GROWTH_FACTOR if direction > 0 else self.size / self.GROWTH_FACTOR
+        # move by at least one record
+        new_size = max(int(new_size), self.size + 1) if direction > 0 else min(int(new_size), self.size - 1)
+        self.size = min(max(new_size, self.min_size), self.max_size)
+
+
 class StepBuffer(Step):
-    def __init__(self, step_id: str, min_buffer_size=4, max_buffer_size=4, flush_ms=1000):
+    def __init__(self, step_id: str, min_buffer_size=4, max_buffer_size=4, flush_ms=1000, adaptive=False,
+                 target_latency_ms: Optional[float] = None, max_buffer_bytes: Optional[int] = None):
         super().__init__(step_id, None)
         self.min_buffer_size = min_buffer_size
         self.max_buffer_size = max(max_buffer_size, min_buffer_size)
-        self.buffer = []
+        self.max_buffer_bytes = max_buffer_bytes
+        self.buffer: List[Dict[str, Any]] = []
+        # serialized size of each buffered record, only tracked when flushing by bytes
+        self.record_sizes: List[int] = []
+        self.buffer_bytes = 0
         self.flush_ms = flush_ms
-        self.timer = None
+        self.timer: Optional[Task] = None
+        self.trace_context: Optional[Any] = None
+        self.draining = False
         self.concurrency_lock = asyncio.Semaphore(1)
+        # in adaptive mode, the batch size is tuned between min_buffer_size and max_buffer_size
+        self.batch_size_controller = BatchSizeController(
+            self.min_buffer_size, self.max_buffer_size, target_latency_ms) if adaptive else None
+
+    @property
+    def flush_size(self) -> int:
+        """Number of buffered records that triggers a flush."""
+        return self.batch_size_controller.size if self.batch_size_controller else self.min_buffer_size
+
+    @property
+    def batch_size(self) -> int:
+        """Maximum number of records sent downstream in a batch."""
+        return self.batch_size_controller.size if self.batch_size_controller else self.max_buffer_size
+
+    def append(self, next_step: Step):
+        if self.batch_size_controller:
+            next_step.add_run_callback(self.on_downstream_run)
+            prometheus.buffer_batch_size.labels(step=self.id).set(self.batch_size)
+
+        return super().append(next_step)
+
+    def on_downstream_run(self, batch_size: int, duration: float):
+        self.batch_size_controller.observe(batch_size, duration)
+        prometheus.buffer_batch_size.labels(step=self.id).set(self.batch_size)
+        logger.debug(f"{self.id} batch size is {self.batch_size}")
 
     async def flush_timer(self):
         await asyncio.sleep(self.flush_ms/1000)
         logger.debug("flushing on timeout")
+        # the deadline has passed, a flush in progress must not be cancelled and the next record re-arms the timer
+        self.timer = None
         await self.flush()
 
     async def run(self, worker_id: int):
         while True:
-            entry = await self.queue.get()
+            entry, trace_context = await self.queue.get()
             logger.debug(f"appending {entry}")
-            if (self.timer is None or self.timer.cancelled()) and self.flush_ms is not None:
-                # first record, we add a timer
-                logger.debug("creating timer")
-                self.timer = asyncio.create_task(self.flush_timer())
-            else:
-                logger.debug("no timer")
-            self.buffer.extend(entry)
-
-            if len(self.buffer) >= self.min_buffer_size:
-                logger.debug(f"flushing on buffer size {self.buffer} {len(self.buffer)}")
-                if self.timer:
-                    self.timer.cancel()
-                await self.flush()
+            try:
+                if not self.buffer and (self.timer is None or self.timer.done()) and self.flush_ms is not None:
+                    # first record of the buffer, the flush deadline starts now
+                    logger.debug("creating timer")
+                    self.timer = asyncio.create_task(self.flush_timer())
+
+                self.buffer.extend(entry)
+                # the flushed batches continue the trace of the last batch added to the buffer
+                self.trace_context = trace_context
+                if self.max_buffer_bytes is not None:
+                    sizes = [len(orjson.dumps(record, default=str)) for record in entry]
+                    self.record_sizes.extend(sizes)
+                    self.buffer_bytes += sum(sizes)
+
+                if self.draining or len(self.buffer) >= self.flush_size or (
+                        self.max_buffer_bytes is not None and self.buffer_bytes >= self.max_buffer_bytes):
+                    logger.debug(f"flushing on buffer size {len(self.buffer)} ({self.buffer_bytes} bytes)")
+                    self.cancel_timer()
+                    await self.flush()
+            finally:
+                self.queue.task_done()
+
+    def cancel_timer(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+
+    def take_batches(self) -> List[List[Dict[str, Any]]]:
+        """Empties the buffer, splitting it into batches of up to batch_size records and max_buffer_bytes bytes."""
+        buffer, self.buffer = self.buffer, []
+        record_sizes, self.record_sizes = self.record_sizes, []
+        self.buffer_bytes = 0
+
+        if self.max_buffer_bytes is None:
+            return [buffer[i:i + self.batch_size] for i in range(0, len(buffer), self.batch_size)]
+
+        batches = []
+        batch_start = 0
+        batch_bytes = 0
+        for i, size in enumerate(record_sizes):
+            # a batch has at least one record, even if that record alone exceeds the limit
+            if i > batch_start and (i - batch_start >= self.batch_size or batch_bytes + size > self.max_buffer_bytes):
+                batches.append(buffer[batch_start:i])
+                batch_start = i
+                batch_bytes = 0
+
+            batch_bytes += size
+
+        if batch_start < len(buffer):
+            batches.append(buffer[batch_start:])
+
+        return batches
 
     async def flush(self):
         # flush buffer
-        await self.concurrency_lock.acquire()
-        try:
-            # we may have accumulated a larger buffer while we flushed, so flush in max_buffer_size batches
-            while len(self.buffer) > 0:
-                logging.debug(f"flushing {self.buffer}")
+        async with self.concurrency_lock:
+            # we may have accumulated more records while we flushed, so flush until the buffer is empty
+            while self.buffer:
+                batches = self.take_batches()
                 # check if we have a next step
                 if self.next_step:
-                    # process downstream
-                    logging.debug(f"sending to next step")
-                    await self.next_step.process([self.buffer.pop(0) for _ in range(min(len(self.buffer), self.max_buffer_size))])
-        finally:
-            self.concurrency_lock.release()
+                    for batch in batches:
+                        # process downstream
+                        logger.debug(f"sending {len(batch)} records to next step")
+                        with tracing.use_context(self.trace_context):
+                            await self.next_step.process(batch)
+
+    async def drain(self):
+        """Flushes the buffer and stops buffering, any record that arrives from now on is sent downstream as is."""
+        if self.initialized:
+            # let the records already queued join the buffer
+            await self.queue.join()
+
+        self.draining = True
+        self.cancel_timer()
+
+        await self.flush()
+
+    async def stop(self):
+        await self.drain()
+        await super().stop()
@@ -0,0 +1,122 @@
+import logging
+from contextlib import contextmanager, nullcontext
+from enum import Enum, unique
+from typing import Any, ContextManager, Dict, Iterator, Optional
+
+logger = logging.getLogger("dy")
+
+
+@unique
+class SpanKind(str, Enum):
+    INTERNAL = "internal"
+    CLIENT = "client"
+    CONSUMER = "consumer"
+
+
+# set by `configure`, tracing is disabled while they're None
+_provider: Optional[Any] = None
+_tracer: Optional[Any] = None
+_span_kinds: Dict[SpanKind, Any] = {}
+
+
+def configure(endpoint: Optional[str] = None, sample_ratio: float = 1.0, service_name: str = "datayoga",
+              exporter: Optional[Any] = None):
+    """Enables tracing, exporting the spans to an OTLP collector over HTTP.
+
+    Requires the `tracing` extra (opentelemetry-sdk and opentelemetry-exporter-otlp-proto-http).
+
+    Args:
+        endpoint (Optional[str]): Traces endpoint of the collector, e.g. http://localhost:4318/v1/traces.
+            Defaults to the OTEL_EXPORTER_OTLP_TRACES_ENDPOINT and OTEL_EXPORTER_OTLP_ENDPOINT environment variables.
+        sample_ratio (float): Ratio of the batches traced, a batch is traced through all of the steps or not at all.
+        service_name (str): Service name of the spans.
+        exporter (Optional[Any]): Span exporter to use instead of the OTLP exporter.
+    """
+    global _provider, _tracer, _span_kinds
+
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    if exporter is None:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import \
+            OTLPSpanExporter
+        exporter = OTLPSpanExporter(endpoint=endpoint)
+
+    shutdown()
+    _provider = TracerProvider(resource=Resource.create({"service.name": service_name}),
+                               sampler=ParentBased(TraceIdRatioBased(sample_ratio)))
+    # spans are exported in the background, in batches
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    _tracer = _provider.get_tracer("datayoga_core")
+    _span_kinds = {kind: getattr(trace.SpanKind, kind.name) for kind in SpanKind}
+    logger.info(f"Tracing {sample_ratio:.0%} of the batches")
+
+
+def shutdown():
+    """Exports the remaining spans and disables tracing."""
+    global _provider, _tracer
+
+    if _provider is not None:
+        _provider.shutdown()
+
+    _provider = None
+    _tracer = None
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+def start_span(name: str, kind: SpanKind = SpanKind.INTERNAL, attributes: Optional[Dict[str, Any]] = None,
+               context: Optional[Any] = None) -> ContextManager[Optional[Any]]:
+    """Starts a span as the current span, for use in a `with` statement. Does nothing when tracing is disabled.
+
+    Args:
+        name (str): Span name.
+        kind (SpanKind): Span kind.
+        attributes (Optional[Dict[str, Any]]): Span attributes.
+        context (Optional[Any]): Context of the parent span. Defaults to the current context.
+
+    Returns:
+        ContextManager[Optional[Any]]: Context manager of the span, which is None when tracing is disabled.
+    """
+    if _tracer is None:
+        return nullcontext()
+
+    return _tracer.start_as_current_span(name, context=context, kind=_span_kinds[kind], attributes=attributes)
+
+
+def get_context() -> Optional[Any]:
+    """Returns the current context, to continue the trace in another task. None when tracing is disabled."""
+    if _tracer is None:
+        return None
+
+    from opentelemetry import context
+    return context.get_current()
+
+
+@contextmanager
+def use_context(trace_context: Optional[Any]) -> Iterator[None]:
+    """Makes a context returned by `get_context` the current context."""
+    if trace_context is None:
+        yield
+        return
+
+    from opentelemetry import context
+    token = context.attach(trace_context)
+    try:
+        yield
+    finally:
+        context.detach(token)
+
+
+def set_error(span: Optional[Any], message: str):
+    """Sets the status of a span to error. Does nothing when tracing is disabled."""
+    if span is None:
+        return
+
+    from opentelemetry.trace import Status, StatusCode
+    span.set_status(Status(StatusCode.ERROR, message))
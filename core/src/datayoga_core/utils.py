@@ -1,17 +1,23 @@
 import copy
+import marshal
 import os
 import re
 import sys
 import uuid
+from functools import lru_cache
 from os import path
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import orjson
 import yaml
 from datayoga_core import result
 from datayoga_core.block import Block
 from datayoga_core.expression import JMESPathExpression, Language
-from datayoga_core.result import BlockResult, Result, Status
+from datayoga_core.result import BlockResult, Status, SuccessResults
+from jsonschema import FormatChecker
+from jsonschema.exceptions import best_match
+from jsonschema.protocols import Validator
+from jsonschema.validators import validator_for
 
 
 def read_json(filename: str) -> Any:
@@ -27,6 +33,65 @@ def read_json(filename: str) -> Any:
         return orjson.loads(json_file.read())
 
 
+def write_json(filename: str, obj: Any):
+    """Saves an object as a JSON file.
+
+    The object is written to a temporary file that then replaces the file, so that a crash doesn't leave a partial
+    file. Values that aren't JSON serializable, such as Decimal, are saved as strings.
+
+    Args:
+        filename (str): JSON filename to save.
+        obj (Any): JSON object.
+    """
+    temp_file = f"{filename}.tmp"
+    with open(temp_file, "wb") as write_obj:
+        write_obj.write(orjson.dumps(obj, default=str, option=orjson.OPT_INDENT_2))
+
+    os.replace(temp_file, filename)
+
+
+@lru_cache(maxsize=None)
+def read_json_schema(filename: str) -> Dict[str, Any]:
+    """Loads a JSON Schema file. Schemas are cached and shared, the returned schema must not be modified.
+
+    Args:
+        filename (str): JSON Schema filename to load.
+
+    Returns:
+        Dict[str, Any]: JSON Schema.
+    """
+    return read_json(filename)
+
+
+def get_validator(schema: Dict[str, Any]) -> Validator:
+    """Checks a JSON Schema and creates a validator for it, including format checks.
+
+    Args:
+        schema (Dict[str, Any]): JSON Schema.
+
+    Returns:
+        Validator: Validator of the draft the schema declares, the latest draft by default.
+    """
+    validator_class = validator_for(schema)
+    validator_class.check_schema(schema)
+    return validator_class(schema, format_checker=FormatChecker())
+
+
+def validate(instance: Any, validator: Validator):
+    """Validates an instance, raising the most relevant error as `jsonschema.validate` does.
+
+    Args:
+        instance (Any): Instance to validate.
+        validator (Validator): Validator of the JSON Schema.
+
+    Raises:
+        ValidationError: When the instance is invalid.
+    """
+    error = best_match(validator.iter_errors(instance))
+    if error is not None:
+        raise error
+
+
 def read_yaml(filename: str) -> Dict[str, Any]:
     """Loads a filename as a YAML object.
 
@@ -128,12 +193,7 @@ def set_field(obj: Dict[str, Any], field_name: str, value: Any):
     Example:
         set_field(obj, "nested.field", 42) will set obj["nested"]["field"] = 42.
     """
-    field_path = split_field(field_name)
-    for key in field_path[:-1]:
-        key = unescape_field(key)
-        obj = obj.setdefault(key, {})  # Setdefault creates missing nested keys as dictionaries
-
-    obj[unescape_field(field_path[-1])] = value
+    get_field_path(field_name).set(obj, value)
 
 
 def split_field(field: str, *, __expression=re.compile(r"(?<!\\)\.")) -> List[str]:
@@ -149,8 +209,80 @@ def unescape_field(field: str) -> str:
     return field.replace("\\.", ".")
 
 
+class FieldPath:
+    r"""Path of a field in nested dictionaries, split and unescaped once so that it can be applied to many records.
+
+    Example:
+        FieldPath("a.b\.c") gets, sets and removes record["a"]["b.c"].
+
+    Attributes:
+        field (str): Field name representing the path to the field, e.g., "nested.field".
+        keys (Tuple[str, ...]): Unescaped keys of the path.
+    """
+    __slots__ = ("field", "keys", "parents", "key")
+
+    def __init__(self, field: str):
+        self.field = field
+        self.keys = tuple(unescape_field(key) for key in split_field(field))
+        self.parents = self.keys[:-1]
+        self.key = self.keys[-1]
+
+    def __repr__(self) -> str:
+        return f"FieldPath({self.field!r})"
+
+    def get_parent(self, obj: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        for key in self.parents:
+            obj = obj.get(key)
+            if not isinstance(obj, dict):
+                return None
+
+        return obj
+
+    def get(self, obj: Dict[str, Any], default: Any = None) -> Any:
+        """Returns the value of the field, or `default` if the field or one of its parents is missing."""
+        parent = self.get_parent(obj)
+        return parent.get(self.key, default) if parent is not None else default
+
+    def set(self, obj: Dict[str, Any], value: Any):
+        """Sets the value of the field, creating the missing parents as dictionaries."""
+        for key in self.parents:
+            obj = obj.setdefault(key, {})
+
+        obj[self.key] = value
+
+    def pop(self, obj: Dict[str, Any]) -> Tuple[bool, Any]:
+        """Removes the field.
+
+        Returns:
+            Tuple[bool, Any]: Whether the field was found and its value.
+        """
+        parent = self.get_parent(obj)
+        if parent is None or self.key not in parent:
+            return False, None
+
+        return True, parent.pop(self.key)
+
+
+@lru_cache(maxsize=1024)
+def get_field_path(field: str) -> FieldPath:
+    """Returns the (cached) FieldPath of a field name."""
+    return FieldPath(field)
+
+
+def copy_records(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Deep copies records.
+
+    Uses marshal, which is faster than deepcopy, and falls back to deepcopy for values marshal does not support
+    (e.g. datetime or Decimal).
+    """
+    try:
+        return marshal.loads(marshal.dumps(records))
+    except ValueError:
+        return copy.deepcopy(records)
+
+
 def all_success(records: List[Dict[str, Any]]) -> BlockResult:
-    return BlockResult(processed=[Result(Status.SUCCESS, payload=row) for row in records])
+    return BlockResult(processed=SuccessResults.from_payloads(records))
 
 
 def is_rejected(record: Dict[str, Any]) -> bool:
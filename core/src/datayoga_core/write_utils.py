@@ -42,36 +42,44 @@ def get_column_mapping(mapping: List[Union[Dict[str, str], str]]) -> List[Dict[s
             else {"column": item, "key": item} for item in mapping] if mapping else []
 
 
+class RecordMapper:
+    """Maps records to columns based on the keys and mapping definitions, adds nulls for missing mapping fields.
+
+    The source field paths are compiled once, when the mapper is created.
+
+    Attributes:
+        fields (List[Tuple[str, utils.FieldPath]]): Target column and source field path of each mapped field.
+    """
+
+    def __init__(
+        self,
+        keys: List[Union[Dict[str, str], str]],
+        mapping: Optional[List[Union[Dict[str, str], str]]] = None
+    ):
+        self.fields: List[Tuple[str, utils.FieldPath]] = []
+        for item in keys + (mapping or []):
+            source = next(iter(item.values())) if isinstance(item, dict) else item
+
+            # columns with spaces will be later used with underscores in the bind variables
+            target = (next(iter(item.keys())) if isinstance(item, dict) else item).replace(" ", "_")
+
+            self.fields.append((target, utils.FieldPath(source)))
+
+    def map_record(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        return {target: source.get(record) for target, source in self.fields}
+
+    def map_records(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        fields = self.fields
+        return [{target: source.get(record) for target, source in fields} for record in records]
+
+
 def map_record(
     record: Dict[str, Any],
     keys: List[Union[Dict[str, str], str]],
     mapping: Optional[List[Union[Dict[str, str], str]]] = None
-):
-    """Maps the record based on the mapping definitions, adds nulls for missing mapping fields."""
-    mapping = mapping or []
-    mapped_record = {}
-    for item in keys + mapping:
-        source = next(iter(item.values())) if isinstance(item, dict) else item
-
-        # columns with spaces will be later used with underscores in the bind variables
-        target = (next(iter(item.keys())) if isinstance(item, dict) else item).replace(" ", "_")
-
-        source_path = utils.split_field(source)
-        obj = record
-        found = True
-        for key in source_path:
-            key = utils.unescape_field(key)
-
-            if obj is None:
-                found = False
-                break
-
-            if isinstance(obj, dict) and key in obj:
-                obj = obj[key]
-            else:
-                found = False
-                break
-
-        mapped_record[target] = obj if found else None
-
-    return mapped_record
+) -> Dict[str, Any]:
+    """Maps the record based on the mapping definitions, adds nulls for missing mapping fields.
+
+    Use a `RecordMapper` to map many records with the same definitions.
+    """
+    return RecordMapper(keys, mapping).map_record(record)
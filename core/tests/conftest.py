@@ -0,0 +1,29 @@
+from unittest import mock
+
+from datayoga_core import utils
+from datayoga_core.block import Block
+
+
+class EchoBlock(Block):
+    """Block that passes all of the records through."""
+
+    def init(self, context=None):
+        pass
+
+    def validate(self):
+        return True
+
+    async def run(self, data):
+        return utils.all_success(data)
+
+
+class ListProducer(mock.Mock):
+    """Producer of the given batches of records, which records its acknowledgements like any mock."""
+
+    def __init__(self, batches=(), **kwargs):
+        super().__init__(**kwargs)
+        self.batches = batches
+
+    async def produce(self):
+        for batch in self.batches:
+            yield batch
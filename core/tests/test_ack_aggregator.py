@@ -0,0 +1,51 @@
+import asyncio
+from unittest import mock
+
+import pytest
+from datayoga_core.ack_aggregator import AckAggregator
+from datayoga_core.job import Job
+
+
+@pytest.mark.asyncio
+async def test_ack_by_size():
+    ack = mock.Mock()
+    aggregator = AckAggregator(ack, max_size=3)
+    aggregator.add(["1", "2"])
+    ack.assert_not_called()
+
+    aggregator.add(["3", "4"])
+    ack.assert_called_once_with(["1", "2", "3", "4"])
+
+
+@pytest.mark.asyncio
+async def test_ack_by_time():
+    ack = mock.Mock()
+    aggregator = AckAggregator(ack, max_size=100, flush_ms=10)
+    aggregator.add(["1"])
+    aggregator.add(["2"])
+    ack.assert_not_called()
+
+    await asyncio.sleep(0.05)
+    ack.assert_called_once_with(["1", "2"])
+
+    # the timer is armed again by the next acknowledgement
+    aggregator.add(["3"])
+    aggregator.flush()
+    assert ack.call_args_list == [mock.call(["1", "2"]), mock.call(["3"])]
+    await asyncio.sleep(0.05)
+    assert ack.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_job_coalesces_acks():
+    job = Job.compile({"steps": [{"uses": "std.write"}], "acks": {"max_size": 3}})
+    job.producer = mock.Mock()
+    job.init()
+
+    job.handle_results(["1", "2"], [])
+    job.handle_results(["3"], [])
+    job.handle_results(["4"], [])
+    job.producer.ack.assert_called_once_with(["1", "2", "3"])
+
+    await job.shutdown()
+    assert job.producer.ack.call_args_list == [mock.call(["1", "2", "3"]), mock.call(["4"])]
@@ -0,0 +1,103 @@
+import os
+import time
+from unittest import mock
+
+import pytest
+from datayoga_core import utils
+from datayoga_core.checkpoint import (Checkpoint, CheckpointStoreType,
+                                      FileCheckpointStore, OffsetTracker,
+                                      create_store)
+from datayoga_core.context import Context
+from datayoga_core.job import Job
+
+
+@pytest.mark.parametrize("store_type", list(CheckpointStoreType))
+def test_checkpoint_store(tmp_path, store_type):
+    file = f"{tmp_path / 'checkpoints'}"
+    store = create_store(store_type, file)
+    checkpoint = Checkpoint(store, "orders")
+    assert checkpoint.load() is None
+
+    checkpoint.save({"file": "a.csv", "records": 10})
+    store.close()
+
+    # the checkpoint survives a restart
+    store = create_store(store_type, file)
+    assert Checkpoint(store, "orders").load() == {"file": "a.csv", "records": 10}
+    assert Checkpoint(store, "customers").load() is None
+
+    Checkpoint(store, "orders").clear()
+    assert Checkpoint(store, "orders").load() is None
+    store.close()
+
+
+def wait_for(condition):
+    for _ in range(500):
+        if condition():
+            return
+
+        time.sleep(0.01)
+
+
+def test_file_checkpoint_store_batches_saves(tmp_path):
+    file = f"{tmp_path / 'checkpoints.json'}"
+    store = FileCheckpointStore(file, flush_ms=60000, max_saves=3)
+    with mock.patch.object(utils, "write_json", wraps=utils.write_json) as write_json:
+        def get_writes():
+            # the stores of other tests may still be writing their own files
+            return [call.args[0] for call in write_json.call_args_list].count(file)
+
+        for records in range(1, 4):
+            store.save("orders", {"file": "a.csv", "records": records})
+
+        # written by the background thread once 3 saves are pending
+        wait_for(lambda: os.path.exists(file))
+        assert utils.read_json(file) == {"orders": {"file": "a.csv", "records": 3}}
+
+        store.save("orders", {"file": "a.csv", "records": 4})
+        store.save("orders", {"file": "a.csv", "records": 5})
+        assert get_writes() == 1
+        store.close()
+        assert get_writes() == 2
+
+    assert utils.read_json(file) == {"orders": {"file": "a.csv", "records": 5}}
+
+
+def test_file_checkpoint_store_flush_interval(tmp_path):
+    file = f"{tmp_path / 'checkpoints.json'}"
+    store = FileCheckpointStore(file, flush_ms=10)
+    store.save("orders", {"file": "a.csv", "records": 1})
+    wait_for(lambda: os.path.exists(file))
+    assert utils.read_json(file) == {"orders": {"file": "a.csv", "records": 1}}
+    store.close()
+
+
+def test_offset_tracker():
+    tracker = OffsetTracker()
+    for offset in range(5):
+        tracker.produced(f"{offset}", offset)
+
+    assert not tracker.ack(["1", "2"])
+    assert tracker.offset is None
+
+    assert tracker.ack(["0"])
+    assert tracker.offset == 2
+
+    # unknown and repeated acks are ignored
+    assert not tracker.ack(["0", "x", "4"])
+    assert tracker.ack(["3"])
+    assert tracker.offset == 4
+
+
+def test_job_checkpoint(tmp_path):
+    job = Job.compile({
+        "input": {"uses": "files.read_csv", "with": {"file": "data.csv"}},
+        "steps": [{"uses": "std.write"}],
+        "checkpoint": {"store": "sqlite", "key": "data"}
+    })
+    job.init(Context({"data_path": f"{tmp_path}"}))
+
+    assert job.producer.checkpoint.key == "data"
+    job.producer.checkpoint.save({"file": "data.csv", "records": 1})
+    job.close()
+    assert (tmp_path / "checkpoints.db").exists()
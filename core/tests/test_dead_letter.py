@@ -0,0 +1,190 @@
+import asyncio
+from unittest import mock
+
+import orjson
+import pytest
+from datayoga_core import utils
+from datayoga_core.block import Block
+from datayoga_core.dead_letter import DeadLetterQueue
+from datayoga_core.job import Job
+from datayoga_core.result import BlockResult, Result, Status
+from datayoga_core.step import Step
+from jsonschema import ValidationError
+
+
+class RejectOddBlock(Block):
+    def init(self, context=None):
+        pass
+
+    def validate(self):
+        return True
+
+    async def run(self, data):
+        result = BlockResult()
+        for record in data:
+            if record["id"] % 2:
+                result.rejected.append(Result(Status.REJECTED, payload=record, message="odd"))
+            else:
+                result.processed.append(Result(Status.SUCCESS, payload=record))
+
+        return result
+
+
+class FailingBlock(Block):
+    def init(self, context=None):
+        pass
+
+    def validate(self):
+        return True
+
+    async def run(self, data):
+        raise ConnectionError("unavailable")
+
+
+def read_ndjson(file):
+    with open(file, "rb") as read_obj:
+        return [orjson.loads(line) for line in read_obj]
+
+
+@pytest.mark.asyncio
+async def test_job_writes_rejected_records_to_dead_letter(tmp_path):
+    file = tmp_path / "rejected.ndjson"
+    job = Job([Step("odd", RejectOddBlock())], mock.Mock(), "dead_letter",
+              dead_letter={"uses": "files.write_ndjson", "with": {"file": f"{file}"}, "batch_size": 2})
+    job.init()
+
+    await job.root.process([{Block.MSG_ID_FIELD: f"{id}", "id": id} for id in range(5)])
+    await job.root.join()
+    # the first batch of dead letters is being written, the processed records are acknowledged right away
+    assert job.producer.ack.call_args_list[0] == mock.call(["0", "2", "4"])
+
+    await job.shutdown()
+    dead_letters = read_ndjson(file)
+    assert [(dead_letter["msg_id"], dead_letter["step_id"], dead_letter["message"], dead_letter["payload"])
+            for dead_letter in dead_letters] == [("1", "odd", "odd", {"id": 1}), ("3", "odd", "odd", {"id": 3})]
+    assert sorted(msg_id for call in job.producer.ack.call_args_list for msg_id in call.args[0]) == [
+        "0", "1", "2", "3", "4"]
+
+
+@pytest.mark.asyncio
+async def test_job_rejects_exceptions_to_dead_letter(tmp_path):
+    file = tmp_path / "rejected.ndjson"
+    job = Job([Step("failing", FailingBlock())], mock.Mock(), "dead_letter",
+              dead_letter={"uses": "files.write_ndjson", "with": {"file": f"{file}"}})
+    job.init()
+
+    await job.root.process([{Block.MSG_ID_FIELD: "1", "id": 1}])
+    await job.shutdown()
+    assert read_ndjson(file)[0]["payload"] == {"id": 1}
+    assert read_ndjson(file)[0]["message"] == "Error in step failing: ConnectionError('unavailable')"
+    job.producer.ack.assert_called_once_with(["1"])
+
+
+class FlakyBlock(Block):
+    """Block that fails the first `failures` writes and records the written data."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.written = []
+
+    def init(self, context=None):
+        pass
+
+    def validate(self):
+        return True
+
+    async def run(self, data):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("unavailable")
+
+        self.written.extend(data)
+        return utils.all_success(data)
+
+
+def rejected(msg_id):
+    return Result(Status.REJECTED, payload={Block.MSG_ID_FIELD: msg_id}, message="error")
+
+
+@pytest.mark.asyncio
+async def test_dead_letters_retried_when_sink_fails():
+    ack = mock.Mock()
+    sink = FlakyBlock(failures=2)
+    dead_letter_queue = DeadLetterQueue(sink, ack, batch_size=1, retry_ms=10)
+    dead_letter_queue.add("step", [rejected("1")])
+    assert dead_letter_queue.defer_acks(["1", "2"]) == ["2"]
+
+    for _ in range(100):
+        if ack.called:
+            break
+
+        await asyncio.sleep(0.01)
+
+    ack.assert_called_once_with(["1"])
+    assert [dead_letter["msg_id"] for dead_letter in sink.written] == ["1"]
+    assert dead_letter_queue.failures == 0
+    assert dead_letter_queue.defer_acks(["1"]) == ["1"]
+
+
+@pytest.mark.asyncio
+async def test_dead_letters_written_to_fallback_file(tmp_path):
+    ack = mock.Mock()
+    fallback_file = tmp_path / "fallback.ndjson"
+    dead_letter_queue = DeadLetterQueue(FailingBlock(), ack, batch_size=10, retry_ms=60000, max_retries=1,
+                                        fallback_file=f"{fallback_file}")
+    dead_letter_queue.add("step", [rejected("1")])
+
+    await dead_letter_queue.write()
+    ack.assert_not_called()
+    # once the retry fails too
+    await dead_letter_queue.write()
+
+    ack.assert_called_once_with(["1"])
+    assert [dead_letter["msg_id"] for dead_letter in read_ndjson(fallback_file)] == ["1"]
+
+
+@pytest.mark.asyncio
+async def test_dead_letters_not_acked_when_sink_fails():
+    ack = mock.Mock()
+    dead_letter_queue = DeadLetterQueue(FailingBlock(), ack, batch_size=10)
+    dead_letter_queue.add("step", [rejected("1")])
+    assert dead_letter_queue.defer_acks(["1", "2"]) == ["2"]
+
+    # without a fallback file, the record is read again after a restart
+    await dead_letter_queue.flush()
+    ack.assert_not_called()
+    assert dead_letter_queue.defer_acks(["1"]) == []
+    assert dead_letter_queue.timer is None
+
+
+@pytest.mark.asyncio
+async def test_dead_letters_written_to_fallback_file_on_shutdown(tmp_path):
+    ack = mock.Mock()
+    fallback_file = tmp_path / "fallback.ndjson"
+    dead_letter_queue = DeadLetterQueue(FailingBlock(), ack, batch_size=10, fallback_file=f"{fallback_file}")
+    dead_letter_queue.add("step", [rejected("1"), rejected("2")])
+
+    await dead_letter_queue.flush()
+    ack.assert_called_once_with(["1", "2"])
+    assert [dead_letter["msg_id"] for dead_letter in read_ndjson(fallback_file)] == ["1", "2"]
+
+
+def test_dead_letter_requires_block():
+    job = Job([Step("odd", RejectOddBlock())], mock.Mock(), "dead_letter")
+    with pytest.raises(ValueError):
+        job.init()
+
+
+def test_dead_letter_schema():
+    Job.validate({
+        "steps": [{"uses": "std.write"}],
+        "error_handling": "dead_letter",
+        "dead_letter": {"uses": "files.write_ndjson", "with": {"file": "rejected.ndjson"}, "flush_ms": 100}
+    })
+
+    with pytest.raises(ValidationError):
+        Job.validate({
+            "steps": [{"uses": "std.write"}],
+            "error_handling": "dead_letter",
+            "dead_letter": {"uses": "files.write_ndjson", "with": {}}
+        })
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+import orjson
+
+# dependencies that should only be imported by the blocks or expressions that use them
+LAZY_MODULES = ["sqlglot", "sqlite3", "sqlalchemy", "pandas", "fastparquet", "cassandra", "azure", "aiohttp",
+                "jinja2", "redis"]
+LAZY_JOB_MODULES = ["datayoga_core.process_pool", "datayoga_core.profiler", "datayoga_core.dead_letter",
+                    "datayoga_core.checkpoint"]
+
+
+def run_python(code: str) -> str:
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        capture_output=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+    ).stdout.decode()
+
+
+def test_import_datayoga_core():
+    # importing the package doesn't load the SQL engine or the optional features of a job
+    loaded_modules = orjson.loads(run_python(
+        "import sys, orjson\n"
+        "import datayoga_core\n"
+        f"print(orjson.dumps([module for module in {LAZY_MODULES + LAZY_JOB_MODULES} "
+        "if module in sys.modules]).decode())\n"
+    ))
+    assert loaded_modules == []
+
+
+def test_lazy_imports():
+    # a JMESPath-only job doesn't load the SQL engine or the dependencies of the other blocks
+    loaded_modules = orjson.loads(run_python(
+        "import sys, orjson\n"
+        "import datayoga_core as dy\n"
+        "job = dy.compile({'steps': [{'uses': 'add_field', "
+        "'with': {'field': 'b', 'expression': 'a', 'language': 'jmespath'}}]})\n"
+        "job.transform([{'a': 1}])\n"
+        f"print(orjson.dumps([module for module in {LAZY_MODULES} if module in sys.modules]).decode())\n"
+    ))
+    assert loaded_modules == []
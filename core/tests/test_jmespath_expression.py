@@ -1,8 +1,11 @@
+import hashlib
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict
 
 import pytest
 from datayoga_core.expression import JMESPathExpression
+from datayoga_core.jmespath_custom_functions import (compile_regex,
+                                                     get_hash_constructor)
 
 expression = JMESPathExpression()
 
@@ -350,3 +353,26 @@ def test_jmespath_filter_entries(jmespath_expression: str, expected_result: Dict
 
     # Test with a None value
     assert expression.search(None) is None
+
+
+def test_jmespath_literal_arguments_prepared_on_compile():
+    expression.compile(r"hash(regex_replace(text, 'B\w+', 'X'), `sha256`)")
+    compile_regex.cache_clear()
+    get_hash_constructor.cache_clear()
+
+    # evaluation uses the regex and hash constructor prepared for the expression, not the caches
+    assert expression.search({"text": "Banana"}) == hashlib.sha256(b"X").hexdigest()
+    assert compile_regex.cache_info().misses == 0
+    assert get_hash_constructor.cache_info().misses == 0
+
+    # dynamic arguments go through the caches
+    expression.compile("regex_replace(text, pattern, 'X')")
+    assert expression.search({"text": "Banana", "pattern": "an"}) == "BXXa"
+    assert compile_regex.cache_info().misses == 1
+
+
+def test_jmespath_hash_unsupported_algorithm():
+    expression.compile("hash(text, `not_a_hash`)")
+
+    with pytest.raises(ValueError):
+        expression.search({"text": "abc"})
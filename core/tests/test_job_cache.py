@@ -0,0 +1,124 @@
+from contextlib import ExitStack
+
+import datayoga_core as dy
+import pytest
+from datayoga_core.job_cache import JobCache
+
+
+def get_job_settings(field: str):
+    return {
+        "steps": [{
+            "uses": "add_field",
+            "with": {"field": field, "expression": "id", "language": "jmespath"}
+        }]
+    }
+
+
+def test_job_cache_reuses_jobs():
+    cache = JobCache()
+    with cache.acquire(get_job_settings("a")) as job:
+        assert job.initialized
+
+    with cache.acquire(get_job_settings("a")) as cached_job:
+        assert cached_job is job
+
+    with cache.acquire(get_job_settings("b")) as other_job:
+        assert other_job is not job
+
+
+def test_job_cache_concurrent_use():
+    cache = JobCache()
+    with cache.acquire(get_job_settings("a")) as job_a:
+        # a job in use isn't shared
+        with cache.acquire(get_job_settings("a")) as other_job_a:
+            assert other_job_a is not job_a
+
+    # both are kept idle for later use
+    assert len(cache.jobs[cache.get_key(get_job_settings("a"))]) == 2
+
+
+def test_job_cache_limits_idle_jobs():
+    cache = JobCache(max_idle_per_key=2)
+    with ExitStack() as stack:
+        jobs = [stack.enter_context(cache.acquire(get_job_settings("a"))) for _ in range(5)]
+        assert len(set(map(id, jobs))) == 5
+
+    # the jobs released beyond the limit are closed
+    assert len(cache.jobs[cache.get_key(get_job_settings("a"))]) == 2
+    assert [job.initialized for job in jobs] == [False, False, False, True, True]
+
+
+def test_job_cache_closes_expired_idle_jobs():
+    cache = JobCache(idle_ttl=0)
+    with cache.acquire(get_job_settings("a")) as job:
+        pass
+
+    with cache.acquire(get_job_settings("a")) as other_job:
+        assert other_job is not job
+
+    assert not job.initialized
+
+
+def test_job_cache_evicts_least_recently_used():
+    cache = JobCache(max_size=2)
+    with cache.acquire(get_job_settings("a")) as job_a:
+        pass
+
+    with cache.acquire(get_job_settings("b")) as job_b:
+        pass
+
+    # a is now more recently used than b
+    with cache.acquire(get_job_settings("a")):
+        pass
+
+    with cache.acquire(get_job_settings("c")):
+        pass
+
+    assert not job_b.initialized
+    with cache.acquire(get_job_settings("a")) as job:
+        assert job is job_a
+
+    with cache.acquire(get_job_settings("b")) as job:
+        assert job is not job_b
+
+
+def test_job_cache_evicts_job_in_use():
+    cache = JobCache(max_size=1)
+    with cache.acquire(get_job_settings("a")) as job_a:
+        with cache.acquire(get_job_settings("b")):
+            pass
+
+        # closed only once released
+        assert job_a.initialized
+        assert job_a.transform([{"id": 1}]).processed[0].payload == {"id": 1, "a": 1}
+
+    assert not job_a.initialized
+
+
+def test_job_cache_drops_job_on_connection_error():
+    cache = JobCache()
+    with pytest.raises(ConnectionError):
+        with cache.acquire(get_job_settings("a")) as job:
+            raise ConnectionError("connection lost")
+
+    assert not job.initialized
+    with cache.acquire(get_job_settings("a")) as other_job:
+        assert other_job is not job
+
+
+def test_job_cache_close():
+    cache = JobCache()
+    with cache.acquire(get_job_settings("a")) as job:
+        pass
+
+    cache.close()
+
+    assert not job.initialized
+    with cache.acquire(get_job_settings("a")) as other_job:
+        assert other_job is not job
+
+
+def test_transform_cached_job():
+    assert dy.transform(get_job_settings("a"), [{"id": 1}]).processed[0].payload == {"id": 1, "a": 1}
+    assert dy.transform(get_job_settings("a"), [{"id": 2}]).processed[0].payload == {"id": 2, "a": 2}
+    dy.close()
@@ -0,0 +1,61 @@
+import re
+import time
+
+import pytest
+from conftest import ListProducer
+from datayoga_core import utils
+from datayoga_core.block import Block
+from datayoga_core.job import Job
+from datayoga_core.profiler import ProfiledBlock, get_category
+from datayoga_core.step import Step
+
+
+class BusyBlock(Block):
+    def init(self, context=None):
+        pass
+
+    def validate(self):
+        return True
+
+    async def run(self, data):
+        end = time.perf_counter() + 0.05
+        while time.perf_counter() < end:
+            pass
+
+        return utils.all_success(data)
+
+
+@pytest.mark.asyncio
+async def test_profile_job(tmp_path):
+    output = tmp_path / "profile.folded"
+    job = Job([Step("busy", BusyBlock())], ListProducer([[{Block.MSG_ID_FIELD: f"{id}"}] for id in range(3)]))
+    job.init()
+    profiler = job.start_profiler(f"{output}", interval=0.001)
+    assert isinstance(job.steps[0].block, ProfiledBlock)
+
+    await job.run()
+    assert job.profiler is None
+    assert isinstance(job.steps[0].block, BusyBlock)
+
+    summary = profiler.get_summary()["busy"]
+    assert summary["batches"] == 3
+    assert summary["records"] == 3
+    assert summary["wall_time"] >= 0.15
+    assert summary["cpu_time"] > 0
+    assert summary["sampled_time"]["code"] > 0
+
+    lines = output.read_text().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+    # frames are named by their qualified name from Python 3.11, by their name before it
+    assert any(re.search(r"test_profiler\.(BusyBlock\.)?run\b", line) for line in lines)
+
+
+def test_get_category():
+    assert get_category(["asyncio.events", "datayoga_core.blocks.map.block", "datayoga_core.expression",
+                         "sqlalchemy.engine.base"]) == "expression"
+    assert get_category(["datayoga_core.blocks.map.block", "datayoga_core.result"]) == "results"
+    assert get_category(["datayoga_core.blocks.relational.write.block", "sqlalchemy.engine.base"]) == "io"
+    assert get_category(["datayoga_core.blocks.map.block"]) == "code"
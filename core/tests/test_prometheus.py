@@ -0,0 +1,74 @@
+from unittest import mock
+
+import pytest
+from conftest import EchoBlock, ListProducer
+from datayoga_core import prometheus
+from datayoga_core.block import Block
+from datayoga_core.job import Job
+from datayoga_core.result import BlockResult, Result, Status
+from datayoga_core.step import Step
+from prometheus_client import REGISTRY
+
+
+def get_sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+@pytest.mark.asyncio
+async def test_step_metrics():
+    root = Step("metrics_a", EchoBlock())
+    root | Step("metrics_b", EchoBlock())
+    root.add_done_callback(mock.Mock())
+
+    await root.process([{Block.MSG_ID_FIELD: "1"}, {Block.MSG_ID_FIELD: "2"}])
+    await root.process([{Block.MSG_ID_FIELD: "3"}])
+    await root.stop()
+
+    for step in ("metrics_a", "metrics_b"):
+        assert get_sample("step_duration_seconds_count", step=step) == 2
+        assert get_sample("step_batch_size_sum", step=step) == 3
+        assert get_sample("step_batch_size_bucket", step=step, le="1.0") == 1
+        assert get_sample("step_active_records", step=step) == 0
+        assert get_sample("step_queue_depth", step=step) == 0
+
+
+class FilterOddBlock(EchoBlock):
+    """Block that filters the odd records and rejects the records without an ID."""
+
+    async def run(self, data):
+        return BlockResult(
+            processed=[Result(Status.SUCCESS, payload=row) for row in data if row.get("id") == 0],
+            filtered=[Result(Status.FILTERED, payload=row) for row in data if row.get("id") == 1],
+            rejected=[Result(Status.REJECTED, payload=row, message="no id") for row in data if "id" not in row])
+
+
+@pytest.mark.asyncio
+async def test_record_latency():
+    count = get_sample("record_latency_seconds_count")
+    producer = ListProducer([
+        [{Block.MSG_ID_FIELD: "1", "id": 0}, {Block.MSG_ID_FIELD: "2", "id": 1}],
+        [{Block.MSG_ID_FIELD: "3"}]])
+    job = Job([Step("latency", FilterOddBlock())], producer)
+    job.init()
+
+    with mock.patch.object(prometheus, "_started", True):
+        await job.run()
+
+    # the filtered and rejected records are measured too
+    assert get_sample("record_latency_seconds_count") == count + 3
+    assert job.produced_at == {}
+    assert job.producer.ack.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_record_latency_not_exported():
+    count = get_sample("record_latency_seconds_count")
+    job = Job([Step("latency_not_exported", EchoBlock())], ListProducer([[{Block.MSG_ID_FIELD: "1"}]]))
+    job.init()
+
+    with mock.patch.object(job, "produced_at", mock.MagicMock(wraps={})) as produced_at:
+        await job.run()
+
+    produced_at.__setitem__.assert_not_called()
+    assert get_sample("record_latency_seconds_count") == count
+    job.producer.ack.assert_called_once_with(["1"])
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from datayoga_core import expression
+from datayoga_core.rate_limit import RateLimiter, TokenBucket
+
+
+def test_token_bucket_reserve():
+    bucket = TokenBucket(rate=10)
+    # a full bucket serves up to its capacity right away
+    assert bucket.reserve(10) == 0
+    # the next reservation waits until the debt is refilled
+    assert bucket.reserve(5) == pytest.approx(0.5, abs=0.01)
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_records_per_second():
+    loop = asyncio.get_event_loop()
+    limiter = RateLimiter(records_per_second=20)
+    start = loop.time()
+    for _ in range(30):
+        await limiter.acquire([{"id": 1}])
+
+    # first 20 records come from the full bucket, the remaining 10 take half a second
+    assert round(loop.time()-start, 1) == 0.5
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_batches_per_second():
+    loop = asyncio.get_event_loop()
+    limiter = RateLimiter(batches_per_second=5)
+    start = loop.time()
+    for _ in range(7):
+        await limiter.acquire([{"id": i} for i in range(100)])
+
+    assert round(loop.time()-start, 1) == 0.4
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_per_key():
+    loop = asyncio.get_event_loop()
+    limiter = RateLimiter(key=expression.compile(expression.Language.JMESPATH, "tenant"), records_per_second_per_key=10)
+    start = loop.time()
+    # each tenant has its own budget
+    await limiter.acquire([{"tenant": "a"}] * 10 + [{"tenant": "b"}] * 10)
+    assert round(loop.time()-start, 1) == 0
+
+    await limiter.acquire([{"tenant": "a"}] * 2)
+    assert round(loop.time()-start, 1) == 0.2
@@ -0,0 +1,38 @@
+import dataclasses
+import json
+
+from datayoga_core.result import (BlockResult, Result, Status, SuccessResults,
+                                  get_payloads)
+
+RECORDS = [{"id": 1}, {"id": 2}, {"id": 3}]
+
+
+def test_success_results_from_payloads():
+    results = SuccessResults.from_payloads(RECORDS)
+    expected = [Result(Status.SUCCESS, payload=record) for record in RECORDS]
+    assert isinstance(results, list)
+    assert results == expected
+    assert results + [Result(Status.SUCCESS, payload={"id": 4})] == expected + [
+        Result(Status.SUCCESS, payload={"id": 4})]
+    assert get_payloads(results) == RECORDS
+
+
+def test_result_dataclass():
+    result = Result(Status.REJECTED, payload=RECORDS[0], message="error")
+    assert dataclasses.asdict(result) == {"status": Status.REJECTED, "payload": RECORDS[0], "message": "error"}
+    assert dataclasses.replace(result, message="other") == Result(Status.REJECTED, RECORDS[0], "other")
+    assert [field.name for field in dataclasses.fields(result)] == ["status", "payload", "message"]
+
+
+def test_block_result_serializable():
+    block_result = BlockResult(processed=SuccessResults.from_payloads(RECORDS[:1]))
+    block_result.filtered.append(Result(Status.FILTERED, payload=RECORDS[1]))
+    assert block_result == BlockResult(
+        processed=[Result(Status.SUCCESS, payload=RECORDS[0])],
+        filtered=[Result(Status.FILTERED, payload=RECORDS[1])])
+
+    assert json.loads(json.dumps(dataclasses.asdict(block_result))) == {
+        "processed": [{"status": "SUCCESS", "payload": RECORDS[0], "message": None}],
+        "filtered": [{"status": "FILTERED", "payload": RECORDS[1], "message": None}],
+        "rejected": []
+    }
@@ -3,11 +3,13 @@ import logging
 
 import mock
 import pytest
-from datayoga_core import utils
+from conftest import EchoBlock
+from datayoga_core import expression, utils
 from datayoga_core.block import Block
+from datayoga_core.rate_limit import RateLimiter
 from datayoga_core.result import Result, Status
 from datayoga_core.step import Step
-from datayoga_core.step_buffer import StepBuffer
+from datayoga_core.step_buffer import BatchSizeController, StepBuffer
 
 logger = logging.getLogger("dy")
 
@@ -38,17 +40,6 @@ class ExceptionBlock(Block):
             return utils.all_success(i)
 
 
-class EchoBlock(Block):
-    def init(self):
-        pass
-
-    def validate(self):
-        return True
-
-    async def run(self, i):
-        return utils.all_success(i)
-
-
 @pytest.mark.asyncio
 async def test_step_continuous_in_order():
     results_block = mock.Mock(wraps=EchoBlock())
@@ -116,6 +107,139 @@ async def test_step_parallel():
     assert round(loop.time()-start, 1) == 0.6+0.4
 
 
+@pytest.mark.asyncio
+async def test_step_sharded_parallel():
+    # records of the same key keep their order while different keys are processed in parallel
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+    results_block = mock.Mock(wraps=EchoBlock())
+    shard_by = expression.compile(expression.Language.JMESPATH, "key")
+    root = Step("A", SleepBlock(), concurrency=2, shard_by=shard_by)
+    root | Step("B", results_block, concurrency=1)
+    acked_at = []
+    root.add_done_callback(lambda msg_ids, results: acked_at.append(loop.time()))
+    messages = [
+        {Block.MSG_ID_FIELD: 0, "key": 0, "sleep": 0.4},
+        {Block.MSG_ID_FIELD: 1, "key": 1, "sleep": 0.1},
+        {Block.MSG_ID_FIELD: 2, "key": 0, "sleep": 0.1},
+        {Block.MSG_ID_FIELD: 3, "key": 1, "sleep": 0.1}
+    ]
+    # make sure the keys land on different workers
+    assert root.get_shard(0) != root.get_shard(1)
+
+    for i in messages:
+        await root.process([i])
+    await root.stop()
+
+    results = [call.args[0][0] for call in results_block.run.call_args_list]
+    assert [i for i in results if i["key"] == 0] == [messages[0], messages[2]]
+    assert [i for i in results if i["key"] == 1] == [messages[1], messages[3]]
+    # the slow key does not hold back the other key
+    assert results.index(messages[3]) < results.index(messages[0])
+    assert round(max(acked_at)-start, 1) == 0.4+0.1
+
+
+@pytest.mark.asyncio
+async def test_step_sharded_slow_shard_does_not_block_others():
+    loop = asyncio.get_event_loop()
+    shard_by = expression.compile(expression.Language.JMESPATH, "key")
+    root = Step("A", SleepBlock(), concurrency=2, shard_by=shard_by)
+    acked_at = {}
+    root.add_done_callback(lambda msg_ids, results: acked_at.update({msg_id: loop.time() for msg_id in msg_ids}))
+
+    start = loop.time()
+    # the worker of key 0 is busy with the first batch and the second one waits in its queue
+    await root.process([{Block.MSG_ID_FIELD: 0, "key": 0, "sleep": 0.3}])
+    await root.process([{Block.MSG_ID_FIELD: 1, "key": 0, "sleep": 0.3}])
+    await root.process([
+        {Block.MSG_ID_FIELD: 2, "key": 0, "sleep": 0.3},
+        {Block.MSG_ID_FIELD: 3, "key": 1, "sleep": 0}
+    ])
+    await root.stop()
+
+    # the record of key 1 didn't wait for the queue of key 0
+    assert acked_at[3] - start < 0.2
+    assert acked_at[0] < acked_at[1] < acked_at[2]
+
+
+def test_step_split_by_shard():
+    shard_by = expression.compile(expression.Language.JMESPATH, "key")
+    step = Step("A", EchoBlock(), concurrency=3, shard_by=shard_by)
+    messages = [{Block.MSG_ID_FIELD: i, "key": [i % 2]} for i in range(6)]
+
+    shards = step.split_by_shard(messages)
+    assert sorted(i[Block.MSG_ID_FIELD] for shard in shards.values() for i in shard) == list(range(6))
+    for shard in shards.values():
+        assert shard == sorted(shard, key=lambda x: x[Block.MSG_ID_FIELD])
+    # all records of a key are in the same shard
+    for key in (0, 1):
+        assert len([worker_id for worker_id, shard in shards.items() if any(i["key"] == [key] for i in shard)]) == 1
+
+
+@pytest.mark.asyncio
+async def test_step_rejects_batch_when_shard_by_fails():
+    shard_by = mock.Mock()
+    shard_by.search_bulk.side_effect = ValueError()
+    step = Step("A", EchoBlock(), concurrency=3, shard_by=shard_by)
+    producer = mock.MagicMock()
+    step.add_done_callback(producer.ack)
+    messages = [{Block.MSG_ID_FIELD: i} for i in range(2)]
+
+    await step.process(messages)
+    # the records are rejected rather than left active, so join doesn't wait for them
+    await asyncio.wait_for(step.join(), 1)
+    producer.ack.assert_called_once_with([0, 1], [
+        Result(Status.REJECTED, payload=message, message="Error in step A: ValueError()") for message in messages])
+    await step.stop()
+
+
+@pytest.mark.asyncio
+async def test_step_join_waits_for_entries_added_while_idle():
+    class SlowBlock(EchoBlock):
+        async def run(self, i):
+            await asyncio.sleep(0.05)
+            return utils.all_success(i)
+
+    step = Step("A", SlowBlock(), concurrency=1)
+    step.add_done_callback(mock.Mock())
+    await step.process([{Block.MSG_ID_FIELD: 1}])
+
+    async def process_on_idle():
+        await step.idle.wait()
+        # added after idle is set, before join resumes
+        await step.process([{Block.MSG_ID_FIELD: 2}])
+
+    # wakes up before join, since it waits on idle first
+    process_task = asyncio.create_task(process_on_idle())
+    await asyncio.sleep(0)
+    await step.join()
+    assert not step.active_entries
+    await process_task
+    await step.stop()
+
+
+@pytest.mark.asyncio
+async def test_step_join_wakes_on_done():
+    class SlowBlock(EchoBlock):
+        async def run(self, i):
+            await asyncio.sleep(0.05)
+            return utils.all_success(i)
+
+    loop = asyncio.get_event_loop()
+    root = Step("A", SlowBlock(), concurrency=1)
+    root | Step("B", EchoBlock(), concurrency=1)
+    # joining a step that hasn't processed anything returns right away
+    await root.join()
+
+    start = loop.time()
+    await root.process([{Block.MSG_ID_FIELD: 1}])
+    await root.join()
+    # join returns once the last entry is acked rather than on a polling interval
+    assert loop.time() - start < 0.15
+    assert not root.active_entries
+    await root.stop()
+
+
 @pytest.mark.asyncio
 async def test_acks_successful():
     # test success of a block propagates upward
@@ -145,7 +269,8 @@ async def test_acks_exception():
         await root.process([message])
     await root.stop()
     assert producer_mock.ack.call_args_list == [mock.call.ack(
-        [i[Block.MSG_ID_FIELD]], [Result(Status.REJECTED, "Error in step A: ValueError()")]) for i in messages]
+        [i[Block.MSG_ID_FIELD]], [Result(Status.REJECTED, payload=i, message="Error in step A: ValueError()")])
+        for i in messages]
 
 
 @pytest.mark.asyncio
@@ -194,3 +319,138 @@ async def test_step_buffer_by_timeout():
             [Result(status=Status.SUCCESS, payload=i) for i in messages]
         )
     ])
+
+
+@pytest.mark.asyncio
+async def test_step_buffer_timeout_rearms():
+    results_block = mock.Mock(wraps=EchoBlock())
+    root = StepBuffer("BUFFER", min_buffer_size=100, flush_ms=100)
+    root | Step("A", results_block, concurrency=1)
+    producer_mock = mock.MagicMock()
+    root.add_done_callback(producer_mock.ack)
+    # each partial buffer is flushed on its own deadline, not only the first one
+    for i in range(3):
+        await root.process([{Block.MSG_ID_FIELD: i}])
+        await asyncio.sleep(0.3)
+        assert producer_mock.ack.call_count == i + 1
+
+    await root.stop()
+
+
+@pytest.mark.asyncio
+async def test_step_buffer_large_batches():
+    results_block = mock.Mock(wraps=EchoBlock())
+    root = StepBuffer("BUFFER", min_buffer_size=3000, flush_ms=100000)
+    root | Step("A", results_block, concurrency=1)
+    producer_mock = mock.MagicMock()
+    root.add_done_callback(producer_mock.ack)
+    await root.process([{Block.MSG_ID_FIELD: i} for i in range(10000)])
+    await root.stop()
+
+    assert [len(call.args[0]) for call in results_block.run.call_args_list] == [3000, 3000, 3000, 1000]
+    assert [msg_id for call in producer_mock.ack.call_args_list for msg_id in call.args[0]] == list(range(10000))
+
+
+@pytest.mark.asyncio
+async def test_step_buffer_by_bytes():
+    results_block = mock.Mock(wraps=EchoBlock())
+    root = StepBuffer("BUFFER", min_buffer_size=100, max_buffer_size=100, flush_ms=100000, max_buffer_bytes=250)
+    root | Step("A", results_block, concurrency=1)
+    # each record is 100 bytes when serialized
+    messages = [{Block.MSG_ID_FIELD: f"{i:03}", "value": "x" * 69} for i in range(5)]
+    for message in messages:
+        await root.process([message])
+    await asyncio.sleep(0.1)
+    await root.stop()
+
+    # the buffer is flushed once it reaches the byte limit, in batches within the limit. the rest on shutdown
+    assert [call.args[0] for call in results_block.run.call_args_list] == [messages[:2], messages[2:3], messages[3:]]
+
+
+@pytest.mark.asyncio
+async def test_step_buffer_drain():
+    results_block = mock.Mock(wraps=EchoBlock())
+    root = StepBuffer("BUFFER", min_buffer_size=100, flush_ms=100000)
+    root | Step("A", results_block, concurrency=1)
+    producer_mock = mock.MagicMock()
+    root.add_done_callback(producer_mock.ack)
+    await root.process([{Block.MSG_ID_FIELD: 1}])
+    await root.drain()
+    await root.join()
+    assert producer_mock.ack.call_args_list == [mock.call([1], [Result(Status.SUCCESS, {Block.MSG_ID_FIELD: 1})])]
+
+    # once drained, records are not held back
+    await root.process([{Block.MSG_ID_FIELD: 2}])
+    await root.join()
+    assert producer_mock.ack.call_count == 2
+    await root.stop()
+
+
+@pytest.mark.asyncio
+async def test_step_rate_limit_backpressure():
+    # the rate limit slows down the producer instead of dropping records
+    loop = asyncio.get_event_loop()
+    results_block = mock.Mock(wraps=EchoBlock())
+    root = Step("A", EchoBlock(), concurrency=1, rate_limiter=RateLimiter(records_per_second=10))
+    root | Step("B", results_block, concurrency=1)
+    messages = [{Block.MSG_ID_FIELD: i, "value": True} for i in range(15)]
+
+    start = loop.time()
+    for message in messages:
+        await root.process([message])
+    # the producer is held back until the last message gets queued
+    assert loop.time()-start > 0.3
+    await root.stop()
+    assert results_block.run.call_args_list == [mock.call.run([i]) for i in messages]
+
+
+def test_batch_size_controller_target_latency():
+    controller = BatchSizeController(min_size=10, max_size=100, target_latency_ms=100)
+    # full batches within the target grow the batch size up to the maximum
+    for _ in range(20):
+        controller.observe(controller.size, 0.05)
+    assert controller.size == 100
+
+    # slow batches shrink it down to the minimum
+    for _ in range(20):
+        controller.observe(controller.size, 0.2)
+    assert controller.size == 10
+
+    # partial fast batches don't grow it
+    controller.observe(5, 0.01)
+    assert controller.size == 10
+
+
+def test_batch_size_controller_throughput():
+    # simulate a target where the per-batch overhead is fixed, and larger batches become slower beyond 50 records
+    def duration(batch_size: int) -> float:
+        return 0.01 + batch_size * (0.001 if batch_size <= 50 else 0.004)
+
+    controller = BatchSizeController(min_size=5, max_size=500)
+    for _ in range(50):
+        controller.observe(controller.size, duration(controller.size))
+
+    assert 30 <= controller.size <= 80
+
+
+@pytest.mark.asyncio
+async def test_step_buffer_adaptive():
+    class BatchLatencyBlock(EchoBlock):
+        async def run(self, i):
+            # each batch takes 10ms per record
+            await asyncio.sleep(len(i) * 0.01)
+            return utils.all_success(i)
+
+    root = StepBuffer("BUFFER", min_buffer_size=2, max_buffer_size=100, flush_ms=100000, adaptive=True,
+                      target_latency_ms=100)
+    root | Step("A", BatchLatencyBlock(), concurrency=1)
+    producer_mock = mock.MagicMock()
+    root.add_done_callback(producer_mock.ack)
+    for i in range(200):
+        await root.process([{Block.MSG_ID_FIELD: i}])
+    await root.flush()
+    await root.stop()
+
+    # the batch size converges to the number of records that fit in the target latency
+    assert 5 <= root.batch_size <= 12
+    assert sorted(msg_id for call in producer_mock.ack.call_args_list for msg_id in call.args[0]) == list(range(200))
@@ -0,0 +1,109 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+import pytest
+from conftest import EchoBlock, ListProducer
+from datayoga_core import tracing, utils
+from datayoga_core.block import Block
+from datayoga_core.job import Job
+from datayoga_core.step import Step
+
+trace_service_pb2 = pytest.importorskip("opentelemetry.proto.collector.trace.v1.trace_service_pb2")
+
+
+class ClientBlock(EchoBlock):
+    async def run(self, data):
+        with tracing.start_span("client", kind=tracing.SpanKind.CLIENT):
+            return utils.all_success(data)
+
+
+class RejectBlock(EchoBlock):
+    async def run(self, data):
+        raise ValueError("invalid")
+
+
+def get_producer():
+    return ListProducer([[{Block.MSG_ID_FIELD: f"{id}"}] for id in range(2)])
+
+
+@pytest.fixture
+def collector():
+    """Local stub of an OTLP/HTTP collector, collecting the exported spans."""
+    spans = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = trace_service_pb2.ExportTraceServiceRequest()
+            request.ParseFromString(self.rfile.read(int(self.headers["Content-Length"])))
+            spans.extend(span for resource_spans in request.resource_spans
+                         for scope_spans in resource_spans.scope_spans for span in scope_spans.spans)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-protobuf")
+            self.end_headers()
+            self.wfile.write(trace_service_pb2.ExportTraceServiceResponse().SerializeToString())
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/v1/traces", spans
+    tracing.shutdown()
+    server.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_trace_job(collector):
+    endpoint, spans = collector
+    tracing.configure(endpoint)
+    job = Job([Step("a", ClientBlock()), Step("b", ClientBlock())], get_producer())
+    job.init()
+    await job.run()
+    tracing.shutdown()
+
+    traces = {}
+    for span in spans:
+        traces.setdefault(span.trace_id, {})[span.name] = span
+
+    # a trace per batch, through all of the steps
+    assert len(traces) == 2
+    for trace in traces.values():
+        assert sorted(trace) == ["a", "b", "client", "produce"]
+        assert trace["a"].parent_span_id == trace["produce"].span_id
+        assert trace["b"].parent_span_id == trace["a"].span_id
+        assert trace["client"].parent_span_id in (trace["a"].span_id, trace["b"].span_id)
+
+
+@pytest.mark.asyncio
+async def test_trace_rejected_batch(collector):
+    endpoint, spans = collector
+    tracing.configure(endpoint)
+    step = Step("reject", RejectBlock())
+    step.add_done_callback(mock.Mock())
+    await step.process([{Block.MSG_ID_FIELD: "1"}])
+    await step.stop()
+    tracing.shutdown()
+
+    assert [span.name for span in spans] == ["reject"]
+    assert spans[0].status.message == "ValueError('invalid')"
+
+
+@pytest.mark.asyncio
+async def test_trace_sampling(collector):
+    endpoint, spans = collector
+    tracing.configure(endpoint, sample_ratio=0)
+    job = Job([Step("a", ClientBlock())], get_producer())
+    job.init()
+    await job.run()
+    tracing.shutdown()
+
+    assert spans == []
+
+
+def test_disabled():
+    assert not tracing.is_enabled()
+    with tracing.start_span("disabled") as span:
+        assert span is None
+
+    assert tracing.get_context() is None
@@ -1,11 +1,18 @@
 import logging
+import multiprocessing.util
 import os
 import textwrap
+from datetime import datetime
+from decimal import Decimal
 from os import path
+from unittest import mock
 
 import datayoga_core as dy
 import pytest
 import yaml
+from datayoga_core import process_pool
+from datayoga_core.block import Block, get_schema_validator
+from datayoga_core.job import Job
 from jsonschema import ValidationError
 
 logger = logging.getLogger("dy")
@@ -130,3 +137,110 @@ def test_reinit_invalid_job():
 def test_block_not_in_whitelisted_blocks(job_settings):
     with pytest.raises(ValidationError):
         dy.compile(job_settings, whitelisted_blocks=["add_field", "rename_field", "remove_field"])
+
+
+def test_transform_process_executor(job_settings):
+    for step in job_settings["steps"]:
+        step["executor"] = "process"
+        step["workers"] = 2
+
+    job = dy.compile(job_settings)
+    job.init()
+    # forking the threads of the parent process may deadlock the workers
+    assert job.steps[0].block.pool._mp_context.get_start_method() == "spawn"
+
+    try:
+        for data in TEST_DATA:
+            assert job.transform(data["before"]).processed[0].payload == data["after"][0]
+    finally:
+        for step in job.steps:
+            step.block.stop()
+
+
+def test_process_worker_closed_on_exit():
+    with mock.patch.object(multiprocessing.util, "Finalize") as finalize:
+        process_pool._init_worker("datayoga_core.blocks.add_field.block",
+                                  {"field": "a", "expression": "id", "language": "jmespath"}, None)
+
+    worker_loop = process_pool._worker_loop
+    with mock.patch.object(process_pool._worker_block, "stop") as stop:
+        # the finalizer runs when the worker process exits
+        finalize.call_args.args[1]()
+
+    stop.assert_called_once_with()
+    assert worker_loop.is_closed()
+    assert process_pool._worker_loop is None
+
+
+def test_validate_unknown_step_property(job_settings):
+    job_settings["steps"][0]["concurency"] = 2
+
+    with pytest.raises(ValueError):
+        dy.validate(job_settings)
+
+
+def test_validate_invalid_executor(job_settings):
+    job_settings["steps"][0]["executor"] = "thread"
+
+    with pytest.raises(ValueError):
+        dy.validate(job_settings)
+
+
+def test_transform_with_buffer(job_settings):
+    job_settings["steps"][-1]["buffer"] = {"min_size": 10, "adaptive": True}
+    job = dy.compile(job_settings)
+    assert len(job.steps) == 5
+
+    for data in TEST_DATA:
+        assert job.transform(data["before"]).processed[0].payload == data["after"][0]
+
+
+def test_transform_copy_on_write():
+    job_yaml = """
+        steps:
+          - uses: filter
+            with:
+                expression: id > 1
+                language: sql
+          - uses: add_field
+            with:
+                field: key
+                expression: id
+                language: jmespath
+    """
+    job = dy.compile(yaml.safe_load(textwrap.dedent(job_yaml)))
+    # marshal doesn't support datetime and Decimal values
+    data = [
+        {"id": 1, "amount": Decimal("1.5"), "created_at": datetime(2023, 1, 1)},
+        {"id": 2, "amount": Decimal("2.5"), "created_at": datetime(2023, 1, 2)}
+    ]
+    processed, filtered, rejected = job.transform(data)
+    assert rejected == []
+    assert [result.payload for result in processed] == [
+        {"id": 2, "amount": Decimal("2.5"), "created_at": datetime(2023, 1, 2), "key": 2}]
+    # the input is copied before the first block that modifies it, the filter runs on the original records
+    assert filtered[0].payload is data[0]
+    assert "key" not in data[1]
+
+
+def test_transform_without_mutating_blocks():
+    job_yaml = """
+        steps:
+          - uses: filter
+            with:
+                expression: id > 1
+                language: sql
+    """
+    job = dy.compile(yaml.safe_load(textwrap.dedent(job_yaml)))
+    data = [{"id": 1}, {"id": 2}]
+    # no block modifies the records, so they are not copied
+    assert job.transform(data).processed[0].payload is data[1]
+
+
+def test_validators_cached(job_settings):
+    dy.validate(job_settings)
+    assert Job.get_json_schema_validator() is Job.get_json_schema_validator()
+
+    job = dy.compile(job_settings)
+    first, second = job.steps[0].block, Block.create(job_settings["steps"][0]["uses"], job_settings["steps"][0]["with"])
+    assert get_schema_validator(first.get_json_schema_file()) is get_schema_validator(second.get_json_schema_file())
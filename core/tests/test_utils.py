@@ -45,3 +45,29 @@ def test_explode_records_missing_field():
     assert exploded_records == [
         {"id": 1, "opcode": "r", "lines": {"a": 1}},
         {"id": 1, "opcode": "r", "lines": {"a": 2}}]
+
+
+def test_field_path():
+    field_path = utils.FieldPath(r"a.b\.c")
+    assert field_path.keys == ("a", "b.c")
+
+    record = {"id": 1}
+    field_path.set(record, 1)
+    assert record == {"id": 1, "a": {"b.c": 1}}
+    assert field_path.get(record) == 1
+
+    assert field_path.pop(record) == (True, 1)
+    assert record == {"id": 1, "a": {}}
+    assert field_path.pop(record) == (False, None)
+
+
+def test_field_path_missing_parent():
+    field_path = utils.FieldPath("a.b")
+    assert field_path.get({"a": None}) is None
+    assert field_path.get({"a": "b"}) is None
+    assert field_path.get({"b": 1}, "default") == "default"
+
+    # a missing parent doesn't remove a field with the same name at another level
+    record = {"b": 1}
+    assert field_path.pop(record) == (False, None)
+    assert record == {"b": 1}
@@ -99,3 +99,14 @@ def test_map_record_nested_key(record, source, expected):
     )
 
     assert mapped == expected, f"Failed for record {record} with source {source}"
+
+
+def test_record_mapper():
+    mapper = write_utils.RecordMapper(["id"], [{"full name": "name"}, {"city": "address.city"}, "missing"])
+    assert mapper.map_records([
+        {"id": 1, "name": "a", "address": {"city": "b"}},
+        {"id": 2, "address": None}
+    ]) == [
+        {"id": 1, "full_name": "a", "city": "b", "missing": None},
+        {"id": 2, "full_name": None, "city": None, "missing": None}
+    ]